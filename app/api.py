@@ -1,14 +1,28 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import List, Optional
+import os
 
-from .gpa_calculator import compute_gpa
-from .cgpa_calculator import update_cgpa, required_gpa_for_target
+from .gpa_calculator import compute_gpa, compute_gpa_bulk
+from .cgpa_calculator import update_cgpa, update_cgpa_bulk, required_gpa_for_target, required_gpa_grid
 from .simulator import generate_grade_combinations, find_minimal_gpa_for_target
+from .grading import SCALES, get_scale
 from . import vault_manager as vault
+from . import vault_export
+from . import vault_maintenance
+from . import vault_backup
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    # Bring an existing vault up to the current schema before any request reads it.
+    vault.init_db()
+    yield
 
-app = FastAPI(title='GPA & CGPA Simulator (Offline API)')
+app = FastAPI(title='GPA & CGPA Simulator (Offline API)', lifespan=_lifespan)
 
 # Development CORS: allow browser / web builds running on localhost to call the API.
 # This is permissive on purpose for local testing only. If you expose the API,
@@ -20,6 +34,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+@app.middleware('http')
+async def vault_request_scope(request: Request, call_next):
+    # Cached vault reads check the database version once per request.
+    with vault.request_scope():
+        return await call_next(request)
+
+@app.exception_handler(vault.VaultBusyError)
+def vault_busy_handler(request: Request, exc: vault.VaultBusyError):
+    # The vault stayed locked past the operation deadline; the client may retry.
+    return JSONResponse(status_code=503, content={'detail': str(exc)}, headers={'Retry-After': '1'})
 class CourseItem(BaseModel):
     # limit credit units to 1..5 to match backend validation
     credit_units: int = Field(..., ge=1, le=5)
@@ -28,6 +53,7 @@ class CourseItem(BaseModel):
 class GPACalcRequest(BaseModel):
     # require at least one course
     courses: List[CourseItem] = Field(..., min_items=1)
+    scale: Optional[str] = None
 
 class CGPAUpdateRequest(BaseModel):
     old_cgpa: float
@@ -35,12 +61,59 @@ class CGPAUpdateRequest(BaseModel):
     new_gpa: float
     new_cu: int
 
+class BulkGPARequest(BaseModel):
+    # columnar courses; semester i covers offsets[i]:offsets[i+1]
+    credit_units: List[int]
+    grades: List[str]
+    offsets: List[int]
+    # optional student boundaries over semesters (running CGPA restarts per student)
+    groups: Optional[List[int]] = None
+    scale: Optional[str] = None
+
+class BulkCGPAUpdateRequest(BaseModel):
+    old_cgpa: List[float]
+    old_total_cu: List[int]
+    new_gpa: List[float]
+    new_cu: List[int]
+
+class SemesterCourseItem(BaseModel):
+    name: Optional[str] = None
+    credit_units: int = Field(..., ge=1, le=5)
+    grade: str
+
+class SemesterItem(BaseModel):
+    academic_year: int = Field(..., ge=1, le=5)
+    semester_num: int = Field(..., ge=1, le=2)
+    total_cu: int = Field(..., ge=1)
+    gpa: float = Field(..., ge=0.0, le=5.0)
+    cgpa: float = Field(..., ge=0.0, le=5.0)
+    courses: List[SemesterCourseItem] = []
+
+class SemestersBulkRequest(BaseModel):
+    semesters: List[SemesterItem] = Field(..., min_items=1)
+    scale: Optional[str] = None
+
+class SemesterUpdateRequest(BaseModel):
+    academic_year: Optional[int] = Field(None, ge=1, le=5)
+    semester_num: Optional[int] = Field(None, ge=1, le=2)
+    total_cu: Optional[int] = Field(None, ge=1)
+    gpa: Optional[float] = Field(None, ge=0.0, le=5.0)
+    courses: Optional[List[SemesterCourseItem]] = None
+    scale: Optional[str] = None
+
 class RequiredGPARequest(BaseModel):
     old_cgpa: float
     old_total_cu: int
     new_cu: int
     target_cgpa: float
 
+class RequiredGPAGridRequest(BaseModel):
+    old_cgpa: float
+    old_total_cu: int
+    new_cus: List[int] = Field(..., min_items=1)
+    max_semesters: int = Field(1, ge=1, le=10)
+    scale: Optional[str] = None
+
 class SimulateRequest(BaseModel):
     cus: List[int]
     target_gpa: float
@@ -49,16 +122,27 @@ class SimulateRequest(BaseModel):
     max_results: Optional[int] = 30
     allowed_letters: Optional[List[str]] = None
     allow_A_if_needed: Optional[bool] = True
+    scale: Optional[str] = None
 
 @app.post('/gpa/calculate')
 def api_calculate_gpa(req: GPACalcRequest):
     courses = [(c.credit_units, c.grade) for c in req.courses]
     try:
-        gpa = compute_gpa(courses)
+        gpa = compute_gpa(courses, req.scale)
         return {'gpa': gpa}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post('/gpa/bulk')
+def api_calculate_gpa_bulk(req: BulkGPARequest):
+    try:
+        scale = get_scale(req.scale)
+        codes = [scale.code(g) for g in req.grades]
+        gpas, cgpas = compute_gpa_bulk(req.credit_units, codes, req.offsets, scale, req.groups)
+        return {'gpa': gpas.tolist(), 'cgpa': cgpas.tolist()}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post('/cgpa/update')
 def api_update_cgpa(req: CGPAUpdateRequest):
     try:
@@ -67,6 +151,14 @@ def api_update_cgpa(req: CGPAUpdateRequest):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post('/cgpa/update_bulk')
+def api_update_cgpa_bulk(req: BulkCGPAUpdateRequest):
+    try:
+        new = update_cgpa_bulk(req.old_cgpa, req.old_total_cu, req.new_gpa, req.new_cu)
+        return {'new_cgpa': new.tolist()}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post('/cgpa/required')
 def api_required_gpa(req: RequiredGPARequest):
     try:
@@ -75,12 +167,29 @@ def api_required_gpa(req: RequiredGPARequest):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post('/cgpa/required_grid')
+def api_required_gpa_grid(req: RequiredGPAGridRequest):
+    try:
+        cells = required_gpa_grid(req.old_cgpa, req.old_total_cu, req.new_cus, req.max_semesters, req.scale)
+        return {'cells': cells}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post('/simulate/grades')
 def api_simulate(req: SimulateRequest):
     try:
         num = len(req.cus)
-        results = generate_grade_combinations(num, req.cus, req.target_gpa, req.tolerance_low, req.tolerance_high, req.max_results, req.allowed_letters, req.allow_A_if_needed)
+        params = {'simulation': 'grades', 'cus': req.cus, 'target_gpa': req.target_gpa,
+                  'tolerance_low': req.tolerance_low, 'tolerance_high': req.tolerance_high,
+                  'max_results': req.max_results, 'allowed_letters': req.allowed_letters,
+                  'allow_A_if_needed': req.allow_A_if_needed}
+        # Identical requests reuse the stored result (keyed by params hash and scale).
+        results = vault.cached_scenario_result(params, lambda: generate_grade_combinations(
+            num, req.cus, req.target_gpa, req.tolerance_low, req.tolerance_high, req.max_results,
+            req.allowed_letters, req.allow_A_if_needed, scale=req.scale), scale=req.scale)
         return {'results': [{'grades': list(r[0]), 'gpa': r[1]} for r in results]}
+    except vault.VaultBusyError:
+        raise  # 503 from vault_busy_handler, not a client error
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -94,7 +203,133 @@ def api_create_user(name: str, program: Optional[str] = None, duration: Optional
     uid = vault.create_user(name, program, duration)
     return {'user_id': uid}
 
+@app.post('/vault/users/{user_id}/semesters/bulk')
+def api_save_semesters_bulk(user_id: int, req: SemestersBulkRequest):
+    try:
+        ids = vault.save_semesters_bulk(({
+            'academic_year': s.academic_year, 'semester_num': s.semester_num, 'total_cu': s.total_cu,
+            'gpa': s.gpa, 'cgpa': s.cgpa, 'courses': [(c.name, c.credit_units, c.grade) for c in s.courses]
+        } for s in req.semesters), user_id=user_id, scale=req.scale)
+        return {'semester_ids': ids}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.put('/vault/semesters/{semester_id}')
+def api_update_semester(semester_id: int, req: SemesterUpdateRequest):
+    try:
+        courses = None if req.courses is None else [(c.name, c.credit_units, c.grade) for c in req.courses]
+        found = vault.update_semester(semester_id, req.academic_year, req.semester_num, req.total_cu, req.gpa,
+                                      courses, scale=req.scale)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not found:
+        raise HTTPException(status_code=404, detail='semester not found')
+    return {'status': 'updated'}
+
+@app.delete('/vault/semesters/{semester_id}')
+def api_delete_semester(semester_id: int):
+    if not vault.delete_semester(semester_id):
+        raise HTTPException(status_code=404, detail='semester not found')
+    return {'status': 'deleted'}
+
+@app.post('/vault/maintenance')
+def api_vault_maintenance(analyze: bool = True, checkpoint: bool = True, vacuum: str = 'auto'):
+    try:
+        return vault_maintenance.run_maintenance(analyze=analyze, checkpoint=checkpoint, vacuum=vacuum)
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post('/vault/snapshot')
+def api_vault_snapshot(keep: int = Query(vault_backup.DEFAULT_KEEP, ge=1)):
+    # Snapshots only go to the configured directory; clients can't pick server paths.
+    return vault_backup.snapshot(keep=keep)
+
+@app.get('/vault/snapshots')
+def api_vault_snapshots():
+    return {'snapshots': [os.path.basename(p) for p in vault_backup.list_snapshots()]}
+
+@app.get('/vault/pool')
+def api_vault_pool():
+    return dict(vault.pool_stats(), user_cache=vault.user_cache_stats(), write_queue=vault.write_queue_stats(),
+                retry=vault.retry_stats(), maintenance=vault_maintenance.maintenance_status())
+
+def _fields(fields: Optional[str]):
+    return [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+
+def _paged(key: str, fetch, **kwargs):
+    try:
+        page = fetch(**kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {key: page['items'], 'next_cursor': page['next_cursor']}
+
+_PAGE_LIMIT = Query(vault.DEFAULT_PAGE_SIZE, ge=1, le=vault.MAX_PAGE_SIZE)
+_FIELDS = Query(None, description='Comma-separated columns to return')
+
 @app.get('/vault/users/{user_id}/semesters')
-def api_get_semesters(user_id: int):
-    sems = vault.get_semesters_for_user(user_id)
-    return {'semesters': sems}
+def api_get_semesters(user_id: int, cursor: Optional[str] = None, limit: int = _PAGE_LIMIT,
+                      fields: Optional[str] = _FIELDS):
+    """A user's semesters in term order, one page at a time.
+
+    Returns at most `limit` semesters (default 50); follow `next_cursor` (null
+    on the last page) for the rest. Before paging this returned the whole
+    history in one response, so older clients see only the first page.
+    """
+    return _paged('semesters', vault.get_semesters_page, user_id=user_id, cursor=cursor, limit=limit,
+                  fields=_fields(fields))
+
+@app.get('/vault/scenarios/{scenario_id}')
+def api_get_scenario(scenario_id: int, scale: Optional[str] = None):
+    try:
+        scenario = vault.get_scenario(scenario_id, scale=scale)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if scenario is None:
+        raise HTTPException(status_code=404, detail='scenario not found')
+    return scenario
+
+@app.get('/vault/users/{user_id}/scenarios')
+def api_get_scenarios(user_id: int, cursor: Optional[str] = None, limit: int = _PAGE_LIMIT,
+                      fields: Optional[str] = _FIELDS):
+    return _paged('scenarios', vault.get_scenarios_page, user_id=user_id, cursor=cursor, limit=limit,
+                  fields=_fields(fields))
+
+@app.get('/vault/semesters')
+def api_get_all_semesters(cursor: Optional[str] = None, limit: int = _PAGE_LIMIT, fields: Optional[str] = _FIELDS):
+    return _paged('semesters', vault.get_semesters_page, cursor=cursor, limit=limit, fields=_fields(fields))
+
+@app.get('/vault/scenarios')
+def api_get_all_scenarios(cursor: Optional[str] = None, limit: int = _PAGE_LIMIT, fields: Optional[str] = _FIELDS):
+    return _paged('scenarios', vault.get_scenarios_page, cursor=cursor, limit=limit, fields=_fields(fields))
+
+@app.get('/vault/users/{user_id}/trajectory')
+def api_get_trajectory(user_id: int):
+    return {'trajectory': vault.get_cgpa_trajectory(user_id)}
+
+@app.get('/vault/users/{user_id}/course_gpa')
+def api_get_course_gpa(user_id: int):
+    return {'overall': vault.get_course_gpa_for_user(user_id), 'semesters': vault.get_course_gpa_by_semester(user_id)}
+
+@app.get('/vault/cohorts/gpa')
+def api_get_cohort_gpa(program: Optional[str] = None, academic_year: Optional[int] = None,
+                       semester_num: Optional[int] = None, scale: Optional[str] = None):
+    try:
+        return {'cohorts': vault.get_cohort_gpa(program, academic_year, semester_num, scale)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get('/vault/export')
+def api_vault_export(format: str = 'ndjson', table: Optional[List[str]] = Query(None), user_id: Optional[int] = None):
+    tables = table or (vault_export.EXPORT_TABLES if format == 'ndjson' else ['semesters'])
+    if format not in ('ndjson', 'csv') or any(t not in vault_export.EXPORT_TABLES for t in tables) \
+            or (format == 'csv' and len(tables) != 1):
+        raise HTTPException(status_code=400, detail='format must be ndjson (any tables) or csv (one table)')
+    if format == 'csv':
+        return StreamingResponse(vault_export.iter_csv(tables[0], user_id), media_type='text/csv')
+    return StreamingResponse(vault_export.iter_ndjson(tables, user_id), media_type='application/x-ndjson')
+
+@app.get('/grading/scales')
+def api_grading_scales():
+    return {'scales': [{'name': s.name, 'grades': s.as_dict(), 'max_points': s.max_points,
+                        'degree_classes': [{'name': n, 'min': lo, 'max': hi} for n, lo, hi in s.degree_classes]}
+                       for s in SCALES.values()]}
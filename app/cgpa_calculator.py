@@ -1,13 +1,221 @@
+from array import array
+from decimal import Decimal
+from operator import mul, truediv
+from typing import Iterable, List, Sequence, Tuple
 from .utils import truncate
 from .constants import DECIMAL_PLACES
+from .grading import get_scale, POINT_SCALE
+
+def _weighted_cgpa(old_cgpa: float, old_total_cu: int, new_gpa: float, new_cu: int) -> float:
+    # Decimal arithmetic on the entered values: float products land just below
+    # exact boundaries (2.95 * 90 + 2.35 * 30 over 120 is 2.7999...) and truncate a whole step.
+    combined = (Decimal(str(old_cgpa)) * old_total_cu + Decimal(str(new_gpa)) * new_cu) / (old_total_cu + new_cu)
+    return truncate(combined, DECIMAL_PLACES)
 
 def update_cgpa(old_cgpa: float, old_total_cu: int, new_gpa: float, new_cu: int) -> float:
     if old_total_cu < 0 or new_cu <= 0:
         raise ValueError("Credit units must be positive (old_total_cu >=0, new_cu >0)")
-    combined = ((old_cgpa * old_total_cu) + (new_gpa * new_cu)) / (old_total_cu + new_cu)
-    return truncate(combined, DECIMAL_PLACES)
+    return _weighted_cgpa(old_cgpa, old_total_cu, new_gpa, new_cu)
 
 def required_gpa_for_target(old_cgpa: float, old_total_cu: int, new_cu: int, target_cgpa: float) -> float:
     numerator = target_cgpa * (old_total_cu + new_cu) - (old_cgpa * old_total_cu)
     required = numerator / new_cu
     return truncate(required, DECIMAL_PLACES)
+
+def _truncate_column(values: Iterable[float], places: int) -> array:
+    """`truncate` over a column: toward zero on the exact binary value of each
+    float, in integer arithmetic instead of one Decimal per value."""
+    scale = 10 ** places
+    out = array('d')
+    for v in values:
+        n, d = v.as_integer_ratio()
+        q = abs(n) * scale // d
+        out.append((-q if n < 0 else q) / scale)
+    return out
+
+def required_gpa_grid(old_cgpa: float, old_total_cu: int, new_cus: Sequence[int],
+                      max_semesters: int = 1, scale=None) -> List[dict]:
+    """Required GPA for every degree-class boundary, CU load and horizon at once.
+
+    For each degree class lower bound, each per-semester CU load in `new_cus`
+    and each k in 1..max_semesters, returns the average GPA needed over the next
+    k semesters (k * load credit units), truncated like `required_gpa_for_target`.
+    Cells above the scale maximum are marked 'infeasible', cells at or below
+    zero 'secured'.
+    """
+    scale = get_scale(scale)
+    if old_total_cu < 0:
+        raise ValueError("old_total_cu must be >= 0")
+    if max_semesters < 1 or not new_cus or min(new_cus) <= 0:
+        raise ValueError("new_cus must be positive and max_semesters >= 1")
+    old_points = old_cgpa * old_total_cu
+    # Load x horizon columns are built once and shared by every degree class.
+    horizons = range(1, max_semesters + 1)
+    loads = [load for load in new_cus for _ in horizons]
+    ks = list(horizons) * len(new_cus)
+    cus = list(map(mul, loads, ks))
+    totals = [old_total_cu + cu for cu in cus]
+    max_points = scale.max_points
+    cells = []
+    for name, target, _hi in scale.degree_classes:
+        # Same expression as required_gpa_for_target, so every cell matches it exactly.
+        required = _truncate_column(map(truediv, (target * t - old_points for t in totals), cus), DECIMAL_PLACES)
+        cells.extend({'degree_class': name, 'target_cgpa': target, 'new_cu': load, 'semesters': k,
+                      'required_gpa': r,
+                      'status': 'infeasible' if r > max_points else 'secured' if r <= 0 else 'feasible'}
+                     for load, k, r in zip(loads, ks, required))
+    return cells
+
+def cgpa_from_points100(points100: int, total_cu: int) -> float:
+    """CGPA from integer-hundredths weighted points (sum of round(gpa * 100) * cu).
+
+    Truncated in integers, so it agrees with `update_cgpa` on exact boundaries
+    (6501 / 3300 is 1.97, not the float 1.9699...).
+    """
+    if not total_cu:
+        return 0.0
+    return (points100 // total_cu) / 100
+
+def update_cgpa_bulk(old_cgpas: Sequence[float], old_total_cus: Sequence[int],
+                     new_gpas: Sequence[float], new_cus: Sequence[int]) -> array:
+    """Element-wise `update_cgpa` over parallel columns (one entry per student)."""
+    n = len(old_cgpas)
+    if not (len(old_total_cus) == len(new_gpas) == len(new_cus) == n):
+        raise ValueError("all columns must have the same length")
+    if n and (min(old_total_cus) < 0 or min(new_cus) <= 0):
+        raise ValueError("Credit units must be positive (old_total_cu >=0, new_cu >0)")
+    return array('d', [_weighted_cgpa(oc, ocu, ng, ncu)
+                       for oc, ocu, ng, ncu in zip(old_cgpas, old_total_cus, new_gpas, new_cus)])
+
+
+class CGPAAccumulator:
+    """Running CGPA over semesters, kept as integer-scaled totals.
+
+    Each semester contributes round(gpa * 100) * cu weighted points (GPAs are
+    stored to two decimals, so this is exact). Adding, removing or replacing a
+    semester is O(1) and `cgpa` is `truncate` of the exact weighted mean.
+    Semesters are keyed by any hashable, usually (academic_year, semester_num).
+    """
+
+    __slots__ = ('scale', 'points100', 'total_cu', '_semesters')
+
+    def __init__(self, scale=None):
+        self.scale = get_scale(scale)
+        self.points100 = 0
+        self.total_cu = 0
+        # key -> [points100, cu, course_points2 or None]
+        self._semesters = {}
+
+    @classmethod
+    def from_semesters(cls, semesters: Iterable, scale=None) -> 'CGPAAccumulator':
+        """Build from vault semester rows (dicts with gpa and total_cu).
+
+        Rows are keyed by (academic_year, semester_num), so a re-entered term
+        can be replaced; rows repeating a term are merged into it. Rows
+        without a GPA or with non-positive credit units are skipped.
+        """
+        acc = cls(scale)
+        for s in semesters:
+            try:
+                gpa, cu = float(s['gpa']), int(s['total_cu'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if cu <= 0:
+                continue
+            key = (s.get('academic_year'), s.get('semester_num'))
+            points100 = round(gpa * 100) * cu
+            if key in acc._semesters:
+                sem = acc._semesters[key]
+                sem[0] += points100
+                sem[1] += cu
+                sem[2] = None
+                acc.points100 += points100
+                acc.total_cu += cu
+            else:
+                acc._put(key, points100, cu)
+        return acc
+
+    @classmethod
+    def from_totals(cls, points100: int, total_cu: int, scale=None) -> 'CGPAAccumulator':
+        """Seed from stored totals (e.g. a user_aggregates row) as one opaque block.
+
+        Later semesters can be added and removed as usual; the seeded block
+        itself can't be edited per semester.
+        """
+        acc = cls(scale)
+        if total_cu:
+            acc._put(None, points100, total_cu)
+        return acc
+
+    def _put(self, key, points100: int, cu: int, points2=None):
+        if cu <= 0:
+            raise ValueError("Credit units must be positive")
+        if key in self._semesters:
+            raise KeyError(f"semester {key!r} already added")
+        self._semesters[key] = [points100, cu, points2]
+        self.points100 += points100
+        self.total_cu += cu
+
+    def add(self, key, gpa: float, cu: int):
+        """Add a semester from its (two-decimal) GPA and credit units."""
+        self._put(key, round(gpa * 100) * cu, cu)
+
+    def add_courses(self, key, courses: Iterable[Tuple[int, str]]):
+        """Add a semester from (cu, letter) courses; its GPA is rounded like `compute_gpa`."""
+        scale = self.scale
+        points2 = cu_sum = 0
+        for cu, letter in courses:
+            if cu <= 0:
+                raise ValueError("Credit units must be positive integers.")
+            points2 += cu * scale.points2[scale.code(letter)]
+            cu_sum += cu
+        gpa = round(points2 / (cu_sum * POINT_SCALE), DECIMAL_PLACES) if cu_sum else 0.0
+        self._put(key, round(gpa * 100) * cu_sum, cu_sum, points2)
+
+    def remove(self, key):
+        points100, cu, _ = self._semesters.pop(key)
+        self.points100 -= points100
+        self.total_cu -= cu
+
+    def replace(self, key, gpa: float, cu: int):
+        """Replace a semester's GPA and credit units (edit)."""
+        self.remove(key)
+        self.add(key, gpa, cu)
+
+    def retake(self, key, cu: int, old_letter: str, new_letter: str):
+        """Replace the grade of a course taken in semester `key` with its retake grade.
+
+        With course detail the semester GPA is re-rounded from its course points;
+        for quick-entry semesters the point difference is applied directly.
+        """
+        sem = self._semesters[key]
+        delta2 = cu * (self.scale.points2[self.scale.code(new_letter)]
+                       - self.scale.points2[self.scale.code(old_letter)])
+        if sem[2] is not None:
+            sem[2] += delta2
+            gpa = round(sem[2] / (sem[1] * POINT_SCALE), DECIMAL_PLACES)
+            new_points100 = round(gpa * 100) * sem[1]
+        else:
+            new_points100 = sem[0] + delta2 * (100 // POINT_SCALE)
+        self.points100 += new_points100 - sem[0]
+        sem[0] = new_points100
+
+    def semester_gpa(self, key) -> float:
+        points100, cu, _ = self._semesters[key]
+        return points100 / (cu * 100)
+
+    def preview(self, gpa: float, cu: int) -> float:
+        """CGPA if one more semester with `gpa` over `cu` credit units were added."""
+        if cu <= 0:
+            raise ValueError("Credit units must be positive")
+        return cgpa_from_points100(self.points100 + round(gpa * 100) * cu, self.total_cu + cu)
+
+    @property
+    def cgpa(self) -> float:
+        return cgpa_from_points100(self.points100, self.total_cu)
+
+    def __len__(self):
+        return len(self._semesters)
+
+    def __contains__(self, key):
+        return key in self._semesters
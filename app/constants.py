@@ -2,6 +2,11 @@ GRADE_POINTS = {"A": 5.0, "B+": 4.5, "B": 4.0, "C+": 3.5, "C": 3.0, "D+": 2.5, "
 
 DEGREE_CLASSES = {"First Class": (4.40, 5.00), "Second Class Upper": (3.60, 4.39), "Second Class Lower": (2.80, 3.59), "Third Class": (2.00, 2.79)}
 
+GRADE_POINTS_4 = {"A": 4.0, "B+": 3.5, "B": 3.0, "C+": 2.5, "C": 2.0, "D+": 1.5, "D": 1.0, "F": 0.0}
+
+DEGREE_CLASSES_4 = {"First Class": (3.50, 4.00), "Second Class Upper": (3.00, 3.49), "Second Class Lower": (2.50, 2.99), "Third Class": (2.00, 2.49)}
+
+DEFAULT_SCALE = "5.0"
 DEFAULT_CREDIT_UNITS = 3
 DECIMAL_PLACES = 2
 DB_RELATIVE_PATH = "database/vault.db"
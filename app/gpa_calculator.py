@@ -1,18 +1,95 @@
-from typing import List, Tuple
-from .constants import GRADE_POINTS, DECIMAL_PLACES
-from .utils import validate_grade_letter
+from array import array
+from itertools import accumulate
+from operator import mul
+from typing import List, Sequence, Tuple, Union
+from .cgpa_calculator import cgpa_from_points100
+from .constants import DECIMAL_PLACES
+from .grading import get_scale, POINT_SCALE
+from .transcript import SemesterView
 
-def compute_gpa(courses: List[Tuple[int, str]]) -> float:
+def gpa_from_points2(points2: int, total_cu: int) -> float:
+    """Semester GPA from half-point weighted totals (sum of cu * scale.points2)."""
+    if not total_cu:
+        return 0.0
+    return round(points2 / (total_cu * POINT_SCALE), DECIMAL_PLACES)
+
+def compute_gpa(courses: Union[List[Tuple[int, str]], SemesterView], scale=None) -> float:
+    """Semester GPA of (credit_units, grade_letter) pairs under `scale`.
+
+    A `SemesterView` is graded on its transcript's scale unless a different
+    `scale` is given, in which case its letters are re-mapped onto that one.
+    """
     if len(courses) == 0:
         return 0.0
-    total_points = 0.0
+    if isinstance(courses, SemesterView) and (scale is None or get_scale(scale) == courses.scale):
+        # Columns were validated on insert; grade codes belong to the view's scale.
+        cus = courses.cus
+        total_cu = sum(cus)
+        points2 = courses.scale.points2
+        return gpa_from_points2(sum(map(mul, cus, (points2[c] for c in courses.codes))), total_cu)
+    scale = get_scale(scale)
+    points2 = scale.points2
+    total_points2 = 0
     total_cu = 0
     for cu, letter in courses:
         if cu <= 0:
             raise ValueError("Credit units must be positive integers.")
-        letter = validate_grade_letter(letter, GRADE_POINTS)
-        gp = GRADE_POINTS[letter]
-        total_points += cu * gp
+        total_points2 += cu * points2[scale.code(letter)]
         total_cu += cu
-    raw = total_points / total_cu if total_cu > 0 else 0.0
-    return round(raw, DECIMAL_PLACES)
+    return gpa_from_points2(total_points2, total_cu)
+
+
+def compute_gpa_bulk(cus: Sequence[int], codes: Sequence[int], offsets: Sequence[int],
+                     scale=None, groups: Sequence[int] = None) -> Tuple[array, array]:
+    """Per-segment GPA and running CGPA for columnar course data.
+
+    `cus` and `codes` are parallel columns (credit units and grade codes from
+    `scale.codes`). Segment i (a semester) covers courses offsets[i]:offsets[i+1],
+    so `offsets` has one more entry than there are segments. `groups` optionally
+    splits segments into students the same way; the running CGPA restarts at
+    each group. Without `groups` all segments belong to one transcript.
+
+    Each GPA equals `compute_gpa` on that segment's courses and each CGPA is the
+    CU-weighted mean of the rounded GPAs so far, truncated like `update_cgpa`.
+    Empty segments get GPA 0.0 and leave the CGPA unchanged.
+    """
+    scale = get_scale(scale)
+    n = len(cus)
+    if len(codes) != n:
+        raise ValueError("cus and codes must have the same length")
+    if len(offsets) == 0 or offsets[0] != 0 or offsets[-1] != n:
+        raise ValueError("offsets must start at 0 and end at the number of courses")
+    if n and min(cus) <= 0:
+        raise ValueError("Credit units must be positive integers.")
+    if n and (min(codes) < 0 or max(codes) >= len(scale.letters)):
+        raise ValueError("grade code out of range for this grading scale")
+    n_segments = len(offsets) - 1
+    if groups is None:
+        groups = (0, n_segments)
+    elif len(groups) == 0 or groups[0] != 0 or groups[-1] != n_segments:
+        raise ValueError("groups must start at 0 and end at the number of segments")
+
+    # Prefix sums turn every segment total into two subtractions.
+    points2 = scale.points2
+    cu_prefix = list(accumulate(cus, initial=0))
+    pts_prefix = list(accumulate(map(mul, cus, (points2[c] for c in codes)), initial=0))
+
+    gpas = array('d', bytes(8 * n_segments))
+    cgpas = array('d', bytes(8 * n_segments))
+    for g in range(len(groups) - 1):
+        run_points100 = 0
+        run_cu = 0
+        for i in range(groups[g], groups[g + 1]):
+            a, b = offsets[i], offsets[i + 1]
+            if b < a:
+                raise ValueError("offsets must be non-decreasing")
+            seg_cu = cu_prefix[b] - cu_prefix[a]
+            if seg_cu:
+                gpa = round((pts_prefix[b] - pts_prefix[a]) / (seg_cu * POINT_SCALE), DECIMAL_PLACES)
+                gpas[i] = gpa
+                # Rounded GPAs have two decimals, so hundredths keep the running sum exact.
+                run_points100 += round(gpa * 100) * seg_cu
+                run_cu += seg_cu
+            if run_cu:
+                cgpas[i] = cgpa_from_points100(run_points100, run_cu)
+    return gpas, cgpas
@@ -0,0 +1,110 @@
+"""Grading scales compiled once into integer lookup tables.
+
+A `GradingScale` maps interned letter codes to small integer codes and stores
+grade points as integer half-points, so hot loops sum ints instead of doing
+dict lookups and float multiplies per course.
+"""
+
+import hashlib
+import sys
+from array import array
+from typing import Dict, Optional, Tuple, Union
+
+from .constants import GRADE_POINTS, DEGREE_CLASSES, GRADE_POINTS_4, DEGREE_CLASSES_4, DEFAULT_SCALE
+from .utils import validate_grade_letter
+
+# Grade points are held as integers in units of 1/POINT_SCALE (half-points).
+POINT_SCALE = 2
+
+
+class GradingScale:
+    """Immutable, precomputed view of one grading scale."""
+
+    __slots__ = ('name', 'letters', 'codes', 'points', 'points2', 'ascending', 'descending',
+                 'min_points', 'max_points', 'min_points2', 'max_points2',
+                 'degree_classes', 'fingerprint')
+
+    def __init__(self, name: str, grade_points: Dict[str, float], degree_classes: Dict[str, Tuple[float, float]]):
+        if not grade_points:
+            raise ValueError("grade_points must not be empty")
+        self.name = name
+        # Letter order is kept as declared (best first) because menus rely on it.
+        self.letters = tuple(sys.intern(l.strip().upper()) for l in grade_points)
+        self.codes = {l: i for i, l in enumerate(self.letters)}
+        self.points = tuple(float(p) for p in grade_points.values())
+        scaled = []
+        for letter, p in zip(self.letters, self.points):
+            p2 = p * POINT_SCALE
+            if p2 != int(p2) or p < 0:
+                raise ValueError(f"Grade points for {letter} must be a non-negative multiple of 1/{POINT_SCALE}")
+            scaled.append(int(p2))
+        self.points2 = array('h', scaled)
+        # Codes ordered worst-to-best and best-to-worst; ties keep declared order.
+        self.ascending = tuple(sorted(range(len(self.letters)), key=lambda c: self.points[c]))
+        self.descending = tuple(sorted(range(len(self.letters)), key=lambda c: -self.points[c]))
+        self.min_points = min(self.points)
+        self.max_points = max(self.points)
+        self.min_points2 = min(scaled)
+        self.max_points2 = max(scaled)
+        self.degree_classes = tuple(sorted(((n, lo, hi) for n, (lo, hi) in degree_classes.items()),
+                                           key=lambda x: -x[1]))
+        table = repr((name, self.letters, self.points, self.degree_classes))
+        self.fingerprint = hashlib.sha1(table.encode()).hexdigest()[:16]
+
+    def code(self, letter: str) -> int:
+        """Return the integer code for `letter`, validating it like `validate_grade_letter`."""
+        try:
+            return self.codes[letter]
+        except (KeyError, TypeError):
+            return self.codes[validate_grade_letter(letter, self.codes)]
+
+    def normalize(self, letter: str) -> str:
+        """Return the canonical (interned) letter for `letter`."""
+        return self.letters[self.code(letter)]
+
+    def points_of(self, letter: str) -> float:
+        return self.points[self.code(letter)]
+
+    def as_dict(self) -> Dict[str, float]:
+        """Letter -> grade point mapping in declared order (same shape as GRADE_POINTS)."""
+        return dict(zip(self.letters, self.points))
+
+    def classify(self, cgpa: float) -> Optional[str]:
+        """Return the degree class whose lower bound `cgpa` reaches, or None."""
+        for name, lo, _hi in self.degree_classes:
+            if cgpa >= lo:
+                return name
+        return None
+
+    def __eq__(self, other):
+        return isinstance(other, GradingScale) and other.fingerprint == self.fingerprint
+
+    def __hash__(self):
+        return hash(self.fingerprint)
+
+    def __repr__(self):
+        return f'GradingScale({self.name!r}, max={self.max_points})'
+
+
+SCALES: Dict[str, GradingScale] = {}
+
+
+def register_scale(scale: GradingScale) -> GradingScale:
+    SCALES[scale.name] = scale
+    return scale
+
+
+register_scale(GradingScale("5.0", GRADE_POINTS, DEGREE_CLASSES))
+register_scale(GradingScale("4.0", GRADE_POINTS_4, DEGREE_CLASSES_4))
+
+
+def get_scale(scale: Union[str, GradingScale, None] = None) -> GradingScale:
+    """Resolve a scale name (or an existing scale) to a compiled `GradingScale`."""
+    if scale is None:
+        return SCALES[DEFAULT_SCALE]
+    if isinstance(scale, GradingScale):
+        return scale
+    try:
+        return SCALES[str(scale).strip()]
+    except KeyError:
+        raise ValueError(f"Unknown grading scale: {scale}")
@@ -6,6 +6,8 @@ Guides new users through setting up their academic history without redundant dat
 from typing import List, Tuple, Dict
 from . import vault_manager as vault
 from .constants import GRADE_POINTS
+from .gpa_calculator import compute_gpa
+from .transcript import Transcript
 
 
 def print_section(text: str):
@@ -140,7 +142,6 @@ def collect_semester_data_detailed(year: int, sem: int) -> Tuple[int, float, Lis
     
     courses = []
     total_cu = 0
-    total_gp = 0
     
     for i in range(n_courses):
         course_name = input(f'Course {i+1} name (optional, press Enter to skip): ').strip()
@@ -152,9 +153,8 @@ def collect_semester_data_detailed(year: int, sem: int) -> Tuple[int, float, Lis
         
         courses.append((course_name, cu, grade))
         total_cu += cu
-        total_gp += GRADE_POINTS[grade] * cu
     
-    gpa = round(total_gp / total_cu, 2) if total_cu > 0 else 0.0
+    gpa = compute_gpa([(cu, grade) for _name, cu, grade in courses])
     
     return (total_cu, gpa, courses)
 
@@ -194,7 +194,7 @@ def onboard_first_time_user(user_id: int, username: str) -> bool:
     print_section('Entering Semester Data')
     print_info(f'Enter data for {total_semesters} semester(s). Press Enter for defaults where shown.')
     
-    all_semesters = []
+    transcript = Transcript()
     total_cgpa_gp = 0
     total_cgpa_cu = 0
     
@@ -206,24 +206,16 @@ def onboard_first_time_user(user_id: int, username: str) -> bool:
             
             if use_detailed:
                 total_cu, gpa, courses = collect_semester_data_detailed(year_num, sem_num)
-                courses_tuples = courses
             else:
                 total_cu, gpa = collect_semester_data_quick(year_num, sem_num)
-                courses_tuples = []
+                courses = ()
             
             # Calculate running CGPA
             total_cgpa_gp += gpa * total_cu
             total_cgpa_cu += total_cu
             running_cgpa = round(total_cgpa_gp / total_cgpa_cu, 2) if total_cgpa_cu > 0 else 0.0
             
-            all_semesters.append({
-                'year': year_num,
-                'sem': sem_num,
-                'total_cu': total_cu,
-                'gpa': gpa,
-                'cgpa': running_cgpa,
-                'courses': courses_tuples
-            })
+            transcript.add_semester(year_num, sem_num, courses, total_cu=total_cu, gpa=gpa, cgpa=running_cgpa)
             
             print_success(f'Year {year_num}, Sem {sem_num}: GPA={gpa}, CU={total_cu}, CGPA={running_cgpa}')
     
@@ -232,8 +224,8 @@ def onboard_first_time_user(user_id: int, username: str) -> bool:
     print_info('Summary of your academic history:')
     print(f'\n{"Year":<6} {"Sem":<5} {"GPA":<8} {"CU":<8} {"CGPA":<8}')
     print('-' * 35)
-    for sem in all_semesters:
-        print(f'{sem["year"]:<6} {sem["sem"]:<5} {sem["gpa"]:<8.2f} {sem["total_cu"]:<8} {sem["cgpa"]:<8.2f}')
+    for sem in transcript:
+        print(f'{sem.academic_year:<6} {sem.semester_num:<5} {sem.gpa:<8.2f} {sem.total_cu:<8} {sem.cgpa:<8.2f}')
     
     # Ask for confirmation
     confirm = input('\nSave this data to your vault? (y/n): ').strip().lower()
@@ -243,19 +235,17 @@ def onboard_first_time_user(user_id: int, username: str) -> bool:
     
     # Save to vault
     try:
-        for sem in all_semesters:
-            vault.save_semester(
-                user_id=user_id,
-                academic_year=sem['year'],
-                semester_num=sem['sem'],
-                total_cu=sem['total_cu'],
-                gpa=sem['gpa'],
-                cgpa=sem['cgpa'],
-                courses=sem['courses'] if sem['courses'] else None
-            )
+        vault.save_semesters_bulk(({
+            'academic_year': sem.academic_year,
+            'semester_num': sem.semester_num,
+            'total_cu': sem.total_cu,
+            'gpa': sem.gpa,
+            'cgpa': sem.cgpa,
+            'courses': list(sem.courses())
+        } for sem in transcript), user_id=user_id)
         
-        print_success(f'✅ Academic history saved! {len(all_semesters)} semester(s) added to your vault.')
-        print_info(f'Your current CGPA: {all_semesters[-1]["cgpa"]}')
+        print_success(f'✅ Academic history saved! {len(transcript)} semester(s) added to your vault.')
+        print_info(f'Your current CGPA: {transcript.semester(-1).cgpa}')
         return True
         
     except Exception as e:
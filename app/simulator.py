@@ -1,13 +1,39 @@
+from functools import lru_cache
 from itertools import product
 from typing import List, Tuple
-from .constants import GRADE_POINTS
+from .grading import GradingScale, get_scale, POINT_SCALE
 from .utils import truncate
 
+# Bump whenever generate_grade_combinations can return different results for the
+# same inputs; results the vault stored under another version are then ignored
+# and purged (see vault_manager.cached_scenario_result).
+SIMULATOR_VERSION = 1
+
+@lru_cache(maxsize=8)
+def _scale_tables(scale: GradingScale):
+    """Per-scale lookup tables, computed once and cached by scale.
+
+    Returns (points, points2, constraint_levels) where `points`/`points2` map
+    letter -> float / integer half-points and the levels are the letter sets
+    tried by `find_worst_scenarios`, from realistic to emergency.
+    """
+    points = scale.as_dict()
+    points2 = {l: scale.points2[c] for c, l in enumerate(scale.letters)}
+    ascending = [scale.letters[c] for c in scale.ascending]
+    top = scale.letters[scale.descending[0]]
+    passing = [l for l in ascending if points[l] > scale.min_points]
+    constraint_levels = (
+        tuple(l for l in passing if l != top),  # Level 0: Realistic (no top grade)
+        tuple(passing),                         # Level 1: Add top grade if needed
+        scale.letters,                          # Level 2: All grades (emergency)
+    )
+    return points, points2, constraint_levels
+
 
 def generate_grade_combinations(num_courses: int, cus: List[int], target_gpa: float,
                                 tolerance_low: float = 0.05, tolerance_high: float = 0.001, max_results: int = 50,
                                 allowed_letters: List[str] = None, allow_A_if_needed: bool = True, exclude_F: bool = True,
-                                exact_match: bool = False):
+                                exact_match: bool = False, scale=None):
     """Generate grade combinations that hit the target_gpa within tolerance.
 
     Improvements:
@@ -30,10 +56,9 @@ def generate_grade_combinations(num_courses: int, cus: List[int], target_gpa: fl
     if allowed_letters is None:
         allowed_letters = default_allowed
 
-    letters_sorted_all = sorted(GRADE_POINTS.items(), key=lambda x: x[1])
     # Delegate to the worst-scenarios finder to produce realistic, pessimistic combos.
     # This enforces the default policy of preferring B+ down to D and only allowing A if needed.
-    return find_worst_scenarios(num_courses, cus, target_gpa, tolerance_low, tolerance_high, max_results, max_allowed_grade='B+', allow_A_if_needed=allow_A_if_needed, exclude_F=exclude_F, exact_match=exact_match)
+    return find_worst_scenarios(num_courses, cus, target_gpa, tolerance_low, tolerance_high, max_results, max_allowed_grade='B+', allow_A_if_needed=allow_A_if_needed, exclude_F=exclude_F, exact_match=exact_match, scale=scale)
 
 def find_minimal_gpa_for_target(old_cgpa: float, old_total_cu: int, remaining_semesters_cu: int, target_cgpa: float):
     numerator = target_cgpa * (old_total_cu + remaining_semesters_cu) - (old_cgpa * old_total_cu)
@@ -44,7 +69,7 @@ def find_minimal_gpa_for_target(old_cgpa: float, old_total_cu: int, remaining_se
 def find_worst_scenarios(num_courses: int, cus: List[int], target_gpa: float,
                         tolerance_low: float = 0.05, tolerance_high: float = 0.001, count: int = 3,
                         max_enumerate: int = 200000, max_allowed_grade: str = 'B+', allow_A_if_needed: bool = True,
-                        exclude_F: bool = True, exact_match: bool = False):
+                        exclude_F: bool = True, exact_match: bool = False, scale=None):
     """Return up to `count` realistic grade combinations that meet the target within tolerance.
     
     Improvements:
@@ -59,12 +84,17 @@ def find_worst_scenarios(num_courses: int, cus: List[int], target_gpa: float,
     if len(cus) != num_courses:
         raise ValueError("length of cus must equal num_courses")
 
-    letters = list(GRADE_POINTS.keys())
+    scale = get_scale(scale)
+    points, points2, constraint_levels = _scale_tables(scale)
+    letters = list(scale.letters)
     total_cu = sum(cus)
+    denom = total_cu * POINT_SCALE
+    high_grade = 0.8 * scale.max_points
+    fail = scale.letters[scale.ascending[0]]
 
     # Quick feasibility check: is target even theoretically possible?
-    min_possible_all = min(GRADE_POINTS.values())
-    max_possible_all = max(GRADE_POINTS.values())
+    min_possible_all = scale.min_points
+    max_possible_all = scale.max_points
     min_gpa_possible = sum(c * min_possible_all for c in cus) / total_cu
     max_gpa_possible = sum(c * max_possible_all for c in cus) / total_cu
     
@@ -73,12 +103,12 @@ def find_worst_scenarios(num_courses: int, cus: List[int], target_gpa: float,
 
     def calc_gpa(grade_tuple):
         """Calculate GPA for a grade tuple."""
-        total_points = sum(GRADE_POINTS[g] * cu for g, cu in zip(grade_tuple, cus))
-        return truncate(total_points / total_cu, 2)
+        total_points2 = sum(points2[g] * cu for g, cu in zip(grade_tuple, cus))
+        return truncate(total_points2 / denom, 2)
 
     def grade_variance(grade_tuple):
         """Measure variance in grades (higher = more diverse)."""
-        gps = [GRADE_POINTS[g] for g in grade_tuple]
+        gps = [points[g] for g in grade_tuple]
         mean = sum(g * cu for g, cu in zip(gps, cus)) / total_cu
         var = sum(cu * ((g - mean) ** 2) for g, cu in zip(gps, cus)) / total_cu
         return var
@@ -88,19 +118,15 @@ def find_worst_scenarios(num_courses: int, cus: List[int], target_gpa: float,
     # Strategy: Try progressively loosening constraints until we find results
     # Start with restricted letter set, then expand
     
-    constraint_levels = [
-        ['D', 'D+', 'C', 'C+', 'B', 'B+'],  # Level 0: Realistic (no A)
-        ['D', 'D+', 'C', 'C+', 'B', 'B+', 'A'],  # Level 1: Add A if needed
-        list(GRADE_POINTS.keys()),  # Level 2: All grades (emergency)
-    ]
-    
     candidates = []
     seen = set()
     
     for level, allowed_letters in enumerate(constraint_levels):
         # Filter out F if needed
         if exclude_F:
-            allowed_letters = [l for l in allowed_letters if l != 'F']
+            allowed_letters = [l for l in allowed_letters if l != fail]
+        else:
+            allowed_letters = list(allowed_letters)
         
         if not allowed_letters:
             continue
@@ -128,7 +154,7 @@ def find_worst_scenarios(num_courses: int, cus: List[int], target_gpa: float,
                 # Check if within tolerance
                 if (target_gpa - tolerance[0]) <= gpa <= (target_gpa + tolerance[1]):
                     diversity = grade_variance(combo)
-                    num_high_grades = sum(1 for g in combo if GRADE_POINTS[g] >= 4.0)
+                    num_high_grades = sum(1 for g in combo if points[g] >= high_grade)
                     candidates.append((combo, gpa, diversity, num_high_grades))
         
         # If we found candidates at this level, stop expanding
@@ -137,8 +163,8 @@ def find_worst_scenarios(num_courses: int, cus: List[int], target_gpa: float,
     
     # If still no candidates, use heuristic approach: build combination to hit target exactly
     if not candidates:
-        all_letters = [l for l in letters if l != 'F'] if exclude_F else letters
-        candidates = _build_target_combinations(num_courses, cus, target_gpa, all_letters, count, exclude_F)
+        all_letters = [l for l in letters if l != fail] if exclude_F else letters
+        candidates = _build_target_combinations(num_courses, cus, target_gpa, all_letters, count, exclude_F, scale)
     
     # Sort: closest to target, then most diverse, then fewest high grades
     candidates.sort(key=lambda x: (
@@ -151,7 +177,7 @@ def find_worst_scenarios(num_courses: int, cus: List[int], target_gpa: float,
 
 
 def _build_target_combinations(num_courses: int, cus: List[int], target_gpa: float, 
-                               available_grades: List[str], count: int, exclude_F: bool) -> List[Tuple]:
+                               available_grades: List[str], count: int, exclude_F: bool, scale=None) -> List[Tuple]:
     """Build grade combinations that hit target by systematic construction.
     
     This generates realistic, mixed-grade combinations by:
@@ -159,22 +185,26 @@ def _build_target_combinations(num_courses: int, cus: List[int], target_gpa: flo
     2. Mixing grades strategically (not all same grade)
     3. Trying multiple upgrade patterns
     """
+    scale = get_scale(scale)
+    points, points2, _levels = _scale_tables(scale)
+    top = scale.letters[scale.descending[0]]
     total_cu = sum(cus)
+    denom = total_cu * POINT_SCALE
     candidates = []
     seen = set()
     
     def calc_gpa(grade_tuple):
-        total_points = sum(GRADE_POINTS[g] * cu for g, cu in zip(grade_tuple, cus))
-        return truncate(total_points / total_cu, 2)
+        total_points2 = sum(points2[g] * cu for g, cu in zip(grade_tuple, cus))
+        return truncate(total_points2 / denom, 2)
     
     def grade_variance(grade_tuple):
-        gps = [GRADE_POINTS[g] for g in grade_tuple]
+        gps = [points[g] for g in grade_tuple]
         mean = sum(g * cu for g, cu in zip(gps, cus)) / total_cu
         var = sum(cu * ((g - mean) ** 2) for g, cu in zip(gps, cus)) / total_cu
         return var
     
     # Sort grades from worst to best
-    sorted_grades = sorted(available_grades, key=lambda x: GRADE_POINTS[x])
+    sorted_grades = sorted(available_grades, key=lambda x: points[x])
     
     from itertools import combinations, product as iter_product
     
@@ -193,7 +223,7 @@ def _build_target_combinations(num_courses: int, cus: List[int], target_gpa: flo
                 # Accept if close to target (0.15 tolerance for mixed grades)
                 if abs(gpa - target_gpa) < 0.15:
                     diversity = grade_variance(distribution)
-                    num_As = distribution.count('A')
+                    num_As = distribution.count(top)
                     candidates.append((distribution, gpa, diversity, num_As))
     
     # Strategy 2: Targeted upgrade - start with mid-range grade and adjust
@@ -222,7 +252,7 @@ def _build_target_combinations(num_courses: int, cus: List[int], target_gpa: flo
                             gpa = calc_gpa(combo)
                             if abs(gpa - target_gpa) < 0.15:
                                 diversity = grade_variance(combo)
-                                num_As = combo.count('A')
+                                num_As = combo.count(top)
                                 candidates.append((combo, gpa, diversity, num_As))
                 
                 if len(candidates) >= count * 3:
@@ -241,7 +271,7 @@ def _build_target_combinations(num_courses: int, cus: List[int], target_gpa: flo
                 if base not in seen:
                     seen.add(base)
                     diversity = grade_variance(base)
-                    candidates.append((base, base_gpa, diversity, base.count('A')))
+                    candidates.append((base, base_gpa, diversity, base.count(top)))
             
             # Try selective upgrades
             for num_upgrades in range(1, min(num_courses + 1, 4)):
@@ -260,7 +290,7 @@ def _build_target_combinations(num_courses: int, cus: List[int], target_gpa: flo
                         gpa = calc_gpa(combo)
                         if abs(gpa - target_gpa) < 0.15:
                             diversity = grade_variance(combo)
-                            candidates.append((combo, gpa, diversity, combo.count('A')))
+                            candidates.append((combo, gpa, diversity, combo.count(top)))
                 
                 if len(candidates) >= count * 2:
                     break
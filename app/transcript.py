@@ -0,0 +1,204 @@
+"""Compact, array-backed transcript records.
+
+A `Transcript` keeps one student's courses in parallel `array('b')` columns
+(credit units and grade codes of a `GradingScale`) with per-semester offsets,
+instead of lists of tuples or dicts. `SemesterView` gives a zero-copy window
+onto one semester; `Course` is a slotted record for row-at-a-time access.
+"""
+
+import sys
+from array import array
+from typing import Iterable, Iterator, Optional, Tuple
+
+from .grading import get_scale
+
+
+class Course:
+    """A single course row. Unpacks as (name, credit_units, grade_letter)."""
+
+    __slots__ = ('name', 'credit_units', 'grade_letter')
+
+    def __init__(self, name: Optional[str], credit_units: int, grade_letter: str):
+        self.name = name
+        self.credit_units = credit_units
+        self.grade_letter = grade_letter
+
+    def __iter__(self):
+        return iter((self.name, self.credit_units, self.grade_letter))
+
+    def __repr__(self):
+        return f'Course({self.name!r}, {self.credit_units}, {self.grade_letter!r})'
+
+
+class SemesterView:
+    """Read-only view of one semester inside a `Transcript`.
+
+    Iterating yields (credit_units, grade_letter) pairs, so a view can be passed
+    straight to `compute_gpa`; `cus` and `codes` are memoryview slices of the
+    transcript columns (no copy). Don't keep those slices around while adding
+    semesters: an exported buffer stops the arrays from growing.
+    """
+
+    __slots__ = ('transcript', 'index')
+
+    def __init__(self, transcript: 'Transcript', index: int):
+        self.transcript = transcript
+        self.index = index
+
+    @property
+    def _bounds(self) -> Tuple[int, int]:
+        offsets = self.transcript.offsets
+        return offsets[self.index], offsets[self.index + 1]
+
+    @property
+    def scale(self):
+        return self.transcript.scale
+
+    @property
+    def cus(self) -> memoryview:
+        a, b = self._bounds
+        return memoryview(self.transcript.cus)[a:b]
+
+    @property
+    def codes(self) -> memoryview:
+        a, b = self._bounds
+        return memoryview(self.transcript.codes)[a:b]
+
+    @property
+    def academic_year(self) -> int:
+        return self.transcript.years[self.index]
+
+    @property
+    def semester_num(self) -> int:
+        return self.transcript.sems[self.index]
+
+    @property
+    def semester_id(self) -> Optional[int]:
+        sid = self.transcript.semester_ids[self.index]
+        return sid if sid > 0 else None
+
+    @property
+    def total_cu(self) -> int:
+        return self.transcript.total_cus[self.index]
+
+    @property
+    def gpa(self) -> float:
+        return self.transcript.gpas[self.index]
+
+    @property
+    def cgpa(self) -> float:
+        return self.transcript.cgpas[self.index]
+
+    def __len__(self):
+        a, b = self._bounds
+        return b - a
+
+    def __iter__(self) -> Iterator[Tuple[int, str]]:
+        a, b = self._bounds
+        t = self.transcript
+        letters = t.scale.letters
+        for i in range(a, b):
+            yield t.cus[i], letters[t.codes[i]]
+
+    def courses(self) -> Iterator[Course]:
+        """Yield the semester's courses as `Course` records."""
+        a, b = self._bounds
+        t = self.transcript
+        letters = t.scale.letters
+        for i in range(a, b):
+            yield Course(t.names[i], t.cus[i], letters[t.codes[i]])
+
+    def __repr__(self):
+        return f'SemesterView(year={self.academic_year}, semester={self.semester_num}, courses={len(self)})'
+
+
+class Transcript:
+    """One student's semesters and courses in parallel columns.
+
+    Semester i owns courses offsets[i]:offsets[i+1]. Semesters saved without
+    course detail (quick entry) have an empty range and carry only their
+    total CU and GPA.
+    """
+
+    __slots__ = ('scale', 'cus', 'codes', 'names', 'offsets', 'years', 'sems',
+                 'semester_ids', 'total_cus', 'gpas', 'cgpas')
+
+    def __init__(self, scale=None):
+        self.scale = get_scale(scale)
+        self.cus = array('b')
+        self.codes = array('b')
+        self.names = []
+        self.offsets = array('i', [0])
+        self.years = array('h')
+        self.sems = array('b')
+        self.semester_ids = array('q')
+        self.total_cus = array('i')
+        self.gpas = array('d')
+        self.cgpas = array('d')
+
+    def add_semester(self, academic_year: int, semester_num: int,
+                     courses: Iterable[Tuple[Optional[str], int, str]] = (),
+                     total_cu: int = None, gpa: float = None, cgpa: float = None,
+                     semester_id: int = None) -> SemesterView:
+        """Append a semester from (name, credit_units, grade_letter) rows.
+
+        `total_cu` and `gpa` default to values computed from the courses;
+        `cgpa` defaults to 0.0 until the caller (or `compute`) fills it in.
+        """
+        scale = self.scale
+        start = len(self.cus)
+        course_cu = 0
+        try:
+            for name, cu, letter in courses:
+                if cu <= 0:
+                    raise ValueError("Credit units must be positive integers.")
+                self.codes.append(scale.code(letter))
+                self.cus.append(cu)
+                self.names.append(sys.intern(name) if name else None)
+                course_cu += cu
+        except Exception:
+            # Keep the columns aligned if a row was rejected half-way.
+            del self.cus[start:], self.codes[start:], self.names[start:]
+            raise
+        self.offsets.append(len(self.cus))
+        self.years.append(academic_year)
+        self.sems.append(semester_num)
+        self.semester_ids.append(semester_id or 0)
+        self.total_cus.append(course_cu if total_cu is None else total_cu)
+        view = SemesterView(self, len(self.years) - 1)
+        if gpa is None:
+            from .gpa_calculator import compute_gpa
+            gpa = compute_gpa(view)
+        self.gpas.append(gpa)
+        self.cgpas.append(0.0 if cgpa is None else cgpa)
+        return view
+
+    def compute(self) -> Tuple[array, array]:
+        """Recompute per-semester GPA and running CGPA from course columns.
+
+        Returns (gpas, cgpas) as produced by `compute_gpa_bulk`; quick-entry
+        semesters without courses come back as 0.0 GPA.
+        """
+        from .gpa_calculator import compute_gpa_bulk
+        return compute_gpa_bulk(self.cus, self.codes, self.offsets, self.scale)
+
+    @property
+    def total_cu(self) -> int:
+        return sum(self.total_cus)
+
+    def semester(self, index: int) -> SemesterView:
+        if index < 0:
+            index += len(self.years)
+        if not 0 <= index < len(self.years):
+            raise IndexError("semester index out of range")
+        return SemesterView(self, index)
+
+    def __len__(self):
+        return len(self.years)
+
+    def __iter__(self) -> Iterator[SemesterView]:
+        for i in range(len(self.years)):
+            yield SemesterView(self, i)
+
+    def __repr__(self):
+        return f'Transcript(semesters={len(self)}, courses={len(self.cus)}, scale={self.scale.name!r})'
@@ -0,0 +1,240 @@
+"""Online backups (and restores) of the vault with SQLite's backup API.
+
+Pages are copied `pages` at a time from a pooled read connection that holds
+one read transaction for the whole copy. In WAL mode writers keep going
+meanwhile (checkpoints just can't pass the copy's snapshot until it ends),
+and the copy is the vault as of its start: commits made mid-copy never
+restart it, so a busy server can't keep a backup from finishing. The copy is
+written to a temporary file and renamed into place, so a crash never leaves
+a half-written backup under the final name.
+
+For an in-memory vault (DB_PATH ':memory:' / 'memory:NAME'), reads go
+through the writer connection under its lock, so the copy hands the lock
+back between steps (`ConnectionPool.yield_writer`). Commits in those gaps go
+through the copy's own connection and are carried into the copy without a
+restart. `start_flush` loads the vault from a file and then writes it back
+there periodically and at exit.
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+from urllib.request import pathname2url
+
+from . import vault_manager as vault
+
+DEFAULT_PAGES_PER_STEP = 1024
+DEFAULT_KEEP = 7
+DEFAULT_FLUSH_INTERVAL = 300
+SNAPSHOT_PREFIX = 'vault-'
+# Default snapshot directory; None means a 'snapshots' directory next to the vault
+SNAPSHOT_DIR = os.environ.get('VAULT_SNAPSHOT_DIR')
+
+
+def _snapshot_dir(directory: str = None) -> str:
+    if directory or SNAPSHOT_DIR:
+        return os.path.abspath(directory or SNAPSHOT_DIR)
+    if vault.get_pool().memory:
+        return os.path.join(os.path.dirname(os.path.abspath(vault.__file__)), 'database', 'snapshots')
+    return os.path.join(os.path.dirname(os.path.abspath(vault.DB_PATH)), 'snapshots')
+
+
+def backup(dest: str, pages: int = DEFAULT_PAGES_PER_STEP, sleep: float = 0.0, verify: bool = True,
+           progress: Optional[Callable[[dict], None]] = None, deadline: float = None) -> dict:
+    """Copy the vault to `dest` in steps of `pages` pages, sleeping `sleep`
+    seconds between steps.
+
+    `progress` gets {'remaining', 'total'} after each step. With `verify` the
+    copy must pass PRAGMA quick_check before it replaces `dest`. Raises
+    TimeoutError (leaving `dest` untouched) if the copy takes longer than
+    `deadline` seconds. Returns the path, pages, bytes, steps, seconds and
+    pages_per_sec.
+    """
+    if pages < 1:
+        raise ValueError("pages must be >= 1")
+    if deadline is not None and deadline <= 0:
+        raise ValueError("deadline must be > 0")
+    dest = os.path.abspath(dest)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    partial = dest + '.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    report = {'path': dest, 'pages': 0, 'steps': 0}
+    pool = vault.get_pool()
+
+    def on_step(status, remaining, total):
+        report['steps'] += 1
+        report['pages'] = total
+        if progress:
+            progress({'remaining': remaining, 'total': total})
+        if deadline is not None and remaining and time.perf_counter() - start > deadline:
+            raise TimeoutError(f"backup did not finish within {deadline:g}s ({remaining} of {total} pages left)")
+        if pool.memory and remaining:
+            pool.yield_writer(max(sleep, 0.001))
+        elif sleep and remaining:
+            time.sleep(sleep)
+
+    start = time.perf_counter()
+    target = sqlite3.connect(partial)
+    try:
+        with vault.reader() as conn:
+            # Memory mode reads through the writer, which other threads use between steps.
+            snapshot = not pool.memory and not conn.in_transaction
+            if snapshot:
+                conn.execute("BEGIN")
+                conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            try:
+                conn.backup(target, pages=pages, progress=on_step, sleep=sleep)
+            finally:
+                if snapshot:
+                    conn.rollback()
+        if verify:
+            result = target.execute("PRAGMA quick_check").fetchone()[0]
+            if result != 'ok':
+                raise sqlite3.DatabaseError(f"Backup failed verification: {result}")
+        # A standalone copy: fold everything into the main file.
+        target.execute("PRAGMA journal_mode=DELETE")
+    except BaseException:
+        target.close()
+        os.remove(partial)
+        raise
+    target.close()
+    os.replace(partial, dest)
+    seconds = time.perf_counter() - start
+    report['bytes'] = os.path.getsize(dest)
+    report['seconds'] = round(seconds, 4)
+    report['pages_per_sec'] = round(report['pages'] / seconds, 1) if seconds > 0 else 0.0
+    return report
+
+
+def list_snapshots(directory: str = None) -> list:
+    """Snapshot file paths in `directory`, oldest first."""
+    directory = _snapshot_dir(directory)
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(n for n in os.listdir(directory) if n.startswith(SNAPSHOT_PREFIX) and n.endswith('.db'))
+    return [os.path.join(directory, n) for n in names]
+
+
+def snapshot(directory: str = None, keep: int = DEFAULT_KEEP, **options) -> dict:
+    """Back up into a new timestamped file in `directory` and delete all but
+    the `keep` newest snapshots. `options` are passed to `backup`; the report
+    also lists the pruned paths."""
+    if keep < 1:
+        raise ValueError("keep must be >= 1")
+    directory = _snapshot_dir(directory)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+    report = backup(os.path.join(directory, f'{SNAPSHOT_PREFIX}{stamp}.db'), **options)
+    existing = list_snapshots(directory)
+    pruned = existing[:-keep]
+    for path in pruned:
+        os.remove(path)
+    report['pruned'] = pruned
+    report['kept'] = len(existing) - len(pruned)
+    return report
+
+
+def restore(source: str, pages: int = DEFAULT_PAGES_PER_STEP) -> dict:
+    """Replace the vault's contents with the database file `source`.
+
+    Runs under the writer lock (retried while the vault is busy), then
+    migrates the restored schema and drops cached reads. Returns pages and
+    seconds.
+    """
+    if not os.path.exists(source):
+        raise FileNotFoundError(source)
+    start = time.perf_counter()
+    src = sqlite3.connect('file:' + pathname2url(os.path.abspath(source)) + '?mode=ro', uri=True)
+    try:
+        def copy():
+            with vault.writer() as conn:
+                src.backup(conn, pages=pages)
+        vault._retry.call(copy)
+        total = src.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        src.close()
+    vault.init_db()
+    vault.clear_user_cache()
+    return {'path': os.path.abspath(source), 'pages': total, 'seconds': round(time.perf_counter() - start, 4)}
+
+
+class _Flusher:
+    def __init__(self, path: str, interval: float):
+        self.path = path
+        self.interval = interval
+        self.flushes = 0
+        self.last_report = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='vault-flush', daemon=True)
+        self._thread.start()
+
+    def flush(self):
+        with self._lock:
+            try:
+                self.last_report = backup(self.path)
+                self.flushes += 1
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                pass  # kept in last_error; the next interval tries again
+
+    def stop(self, final: bool = True):
+        self._stop.set()
+        self._thread.join()
+        if final:
+            self.flush()
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def start_flush(path: str, interval: float = DEFAULT_FLUSH_INTERVAL, load: bool = True):
+    """Persist the vault to `path` every `interval` seconds and at exit.
+
+    Meant for in-memory vaults: with `load` an existing `path` is restored
+    into the vault first, so a kiosk picks up where its last flush left off.
+    """
+    global _flusher
+    if interval <= 0:
+        raise ValueError("interval must be > 0")
+    path = os.path.abspath(path)
+    with _flusher_lock:
+        if _flusher is not None:
+            _flusher.stop()
+        if load and os.path.exists(path):
+            restore(path)
+        _flusher = _Flusher(path, interval)
+
+
+def stop_flush(final: bool = True):
+    """Stop periodic flushing, writing one last copy unless `final` is False."""
+    global _flusher
+    with _flusher_lock:
+        if _flusher is not None:
+            _flusher.stop(final)
+            _flusher = None
+
+
+def flush_status() -> dict:
+    f = _flusher
+    if f is None:
+        return None
+    return {'path': f.path, 'interval': f.interval, 'flushes': f.flushes,
+            'last_error': f.last_error, 'last_report': f.last_report}
+
+
+atexit.register(stop_flush)
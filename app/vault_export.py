@@ -0,0 +1,111 @@
+"""Streaming export of vault tables as NDJSON or CSV.
+
+Rows are read in keyset pages (`WHERE id > ? ORDER BY id LIMIT ?`), each page
+in its own short read, so memory stays flat however large the vault is and no
+read transaction is held open while the output is being written or sent.
+"""
+
+import csv
+import io
+import json
+from typing import Iterable, Iterator, Optional
+
+from . import vault_manager as vault
+
+DEFAULT_PAGE_SIZE = 1000
+
+# table -> (select list, per-user filter). Passwords never leave the vault.
+_TABLES = {
+    'users': ('id, username, email, full_name, program, duration, created_at', 'id = ?'),
+    'semesters': ('id, user_id, academic_year, semester_num, total_cu, gpa, cgpa, created_at, scale', 'user_id = ?'),
+    'courses': ('id, semester_id, name, credit_units, grade_letter, grade_points2',
+                'semester_id IN (SELECT id FROM semesters WHERE user_id = ?)'),
+    'scenarios': ('id, user_id, name, params, created_at', 'user_id = ?'),
+}
+EXPORT_TABLES = tuple(_TABLES)
+
+
+def _pages(table: str, user_id: Optional[int], page_size: int):
+    """Yield (columns, rows) pages of `table` in id order."""
+    if table not in _TABLES:
+        raise ValueError(f"Unknown table: {table!r} (expected one of {', '.join(EXPORT_TABLES)})")
+    if page_size < 1:
+        raise ValueError("page_size must be >= 1")
+    select, user_filter = _TABLES[table]
+    where = 'id > ?' + (f' AND {user_filter}' if user_id is not None else '')
+    sql = f"SELECT {select} FROM {table} WHERE {where} ORDER BY id LIMIT ?"
+    last_id = 0
+    while True:
+        params = (last_id,) + ((user_id,) if user_id is not None else ()) + (page_size,)
+        with vault.reader() as conn:
+            cur = conn.execute(sql, params)
+            columns = [d[0] for d in cur.description]
+            rows = cur.fetchall()
+        yield columns, rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]['id']
+
+
+def iter_rows(table: str, user_id: int = None, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[dict]:
+    """Yield every row of `table` (optionally one user's) as a dict, page by page."""
+    decode = table == 'scenarios'
+    for _, rows in _pages(table, user_id, page_size):
+        for r in rows:
+            row = dict(r)
+            if decode:
+                row['params'] = json.loads(row['params'])
+            yield row
+
+
+def iter_ndjson(tables: Iterable[str] = EXPORT_TABLES, user_id: int = None,
+                page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[str]:
+    """Yield NDJSON lines, one per row, tagged with their table."""
+    for table in tables:
+        for row in iter_rows(table, user_id, page_size):
+            yield json.dumps({'table': table, **row}, separators=(',', ':')) + '\n'
+
+
+def iter_csv(table: str, user_id: int = None, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[str]:
+    """Yield one table as CSV text: the header, then one chunk per page."""
+    buf = io.StringIO()
+    out = csv.writer(buf)
+    header = True
+    for columns, rows in _pages(table, user_id, page_size):
+        if header:
+            out.writerow(columns)
+            header = False
+        out.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+
+
+def export(path: str, fmt: str = 'ndjson', tables: Iterable[str] = None, user_id: int = None,
+           page_size: int = DEFAULT_PAGE_SIZE) -> int:
+    """Write an export to `path` incrementally; returns the number of rows written.
+
+    NDJSON can hold several tables (all of them by default); CSV holds one.
+    """
+    if fmt not in ('ndjson', 'csv'):
+        raise ValueError(f"Unknown export format: {fmt!r} (expected 'ndjson' or 'csv')")
+    tables = list(tables or (EXPORT_TABLES if fmt == 'ndjson' else ('semesters',)))
+    for table in tables:
+        if table not in _TABLES:
+            raise ValueError(f"Unknown table: {table!r} (expected one of {', '.join(EXPORT_TABLES)})")
+    if fmt == 'csv' and len(tables) != 1:
+        raise ValueError("CSV export takes exactly one table")
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if fmt == 'ndjson':
+            for line in iter_ndjson(tables, user_id, page_size):
+                f.write(line)
+                count += 1
+            return count
+        out = csv.writer(f)
+        for i, (columns, rows) in enumerate(_pages(tables[0], user_id, page_size)):
+            if i == 0:
+                out.writerow(columns)
+            out.writerows(rows)
+            count += len(rows)
+    return count
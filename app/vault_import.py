@@ -0,0 +1,193 @@
+"""Streaming import of course-level transcripts into the vault.
+
+Input is CSV (with a header) or JSONL, one course per row with the fields
+user, academic_year, semester_num, course, credit_units, grade. Rows must be
+grouped by user, then by semester. Only the current user's semesters are
+held in memory; finished semesters are written in batches through
+`save_semesters_bulk`, and each batch commits together with its checkpoint so
+an interrupted import resumes exactly where the last commit left off.
+Semesters a user already has saved (same academic year and semester) are
+skipped rather than inserted again, so re-running a file from the start never
+duplicates them.
+"""
+
+import csv
+import json
+import os
+from typing import Callable, Iterator, Optional
+
+from . import vault_manager as vault
+from .cgpa_calculator import CGPAAccumulator
+from .grading import get_scale
+
+DEFAULT_BATCH_ROWS = 20000
+
+
+def _detect_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    return 'jsonl' if ext in ('.jsonl', '.ndjson') else 'csv'
+
+
+def _iter_rows(f, fmt: str) -> Iterator[dict]:
+    if fmt == 'csv':
+        return csv.DictReader(f)
+    if fmt == 'jsonl':
+        return (json.loads(line) for line in f if line.strip())
+    raise ValueError(f"Unknown import format: {fmt!r} (expected 'csv' or 'jsonl')")
+
+
+def get_checkpoint(source: str) -> int:
+    """Rows of `source` already committed by earlier runs."""
+    with vault.reader() as conn:
+        row = conn.execute("SELECT rows_done FROM import_checkpoints WHERE source=?", (source,)).fetchone()
+    return row[0] if row else 0
+
+
+def clear_checkpoint(source: str):
+    def clear():
+        with vault.writer() as conn:
+            conn.execute("DELETE FROM import_checkpoints WHERE source=?", (source,))
+    vault._retry.call(clear)
+
+
+def _resolve_user(cur, username: str) -> int:
+    row = cur.execute("SELECT id FROM users WHERE username=?", (username,)).fetchone()
+    if row:
+        return row[0]
+    return cur.execute("INSERT INTO users (username, full_name, password) VALUES (?, ?, ?)",
+                       (username, username, vault._hash_password('guest'))).lastrowid
+
+
+def _existing_terms(username: str) -> set:
+    """(academic_year, semester_num) of every semester the user already has saved."""
+    with vault.reader() as conn:
+        return {(r[0], r[1]) for r in conn.execute(
+            """SELECT s.academic_year, s.semester_num FROM users u
+               JOIN semesters s ON s.user_id = u.id WHERE u.username=?""",
+            (username,)
+        )}
+
+
+def import_transcripts(path: str, fmt: str = None, scale=None, batch_rows: int = DEFAULT_BATCH_ROWS,
+                       resume: bool = True, source: str = None,
+                       progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """Stream a CSV/JSONL transcript file into the vault.
+
+    Semester GPA is computed from the courses; the running CGPA of each
+    imported semester is computed in the vault over everything the user has
+    saved, so terms that fall before already-saved ones come out right. Every `batch_rows` input rows (at
+    the next semester boundary) the pending semesters are committed along with
+    the checkpoint for `source` (default: the absolute path). With `resume`,
+    rows committed by a previous run are skipped. Semesters the user already
+    has saved are not written again (nor counted twice in the CGPA); they are
+    counted in 'existing_semesters'. `progress` is called with the running
+    stats after each commit. Returns those stats.
+    """
+    scale = get_scale(scale)
+    fmt = fmt or _detect_format(path)
+    source = source or os.path.abspath(path)
+    if batch_rows < 1:
+        raise ValueError("batch_rows must be >= 1")
+    if resume:
+        skip = get_checkpoint(source)
+    else:
+        clear_checkpoint(source)
+        skip = 0
+    stats = {'source': source, 'rows': skip, 'skipped_rows': skip, 'semesters': 0, 'existing_semesters': 0,
+             'users': 0, 'batches': 0}
+
+    pending = []          # finished semesters not yet committed
+    done_rows = skip      # input rows covered by committed or pending semesters
+    user = acc = None
+    existing = skipped = None  # the current user's saved terms, and those met in the file
+    sem_key = None
+    courses = []
+    seen_users = set()
+
+    def finish_semester():
+        key = sem_key[1:]
+        if key in existing:
+            # Already saved (and already in the user's totals): keep the stored row.
+            if key in skipped:
+                raise ValueError(f"row {line_no}: semester {key} for user {user!r} appears twice; "
+                                 "rows must be grouped by user and semester")
+            skipped.add(key)
+            stats['existing_semesters'] += 1
+            return
+        try:
+            acc.add_courses(key, ((cu, letter) for _, cu, letter in courses))
+        except KeyError:
+            raise ValueError(f"row {line_no}: semester {key} for user {user!r} appears twice; "
+                             "rows must be grouped by user and semester")
+        pending.append({'username': user, 'academic_year': key[0], 'semester_num': key[1],
+                        'total_cu': sum(c[1] for c in courses), 'gpa': acc.semester_gpa(key),
+                        'cgpa': None, 'courses': courses})
+
+    def write_batch():
+        # Retried as a whole when the vault is busy; the batch and checkpoint commit together.
+        with vault.writer() as conn:
+            cur = conn.cursor()
+            if not conn.in_transaction:
+                cur.execute("BEGIN IMMEDIATE")
+            ids = {}
+            for sem in pending:
+                if sem['username'] not in ids:
+                    ids[sem['username']] = _resolve_user(cur, sem['username'])
+                sem['user_id'] = ids[sem['username']]
+            vault.save_semesters_bulk(pending, scale=scale)
+            cur.execute(
+                """INSERT INTO import_checkpoints (source, rows_done) VALUES (?, ?)
+                   ON CONFLICT(source) DO UPDATE SET rows_done=excluded.rows_done,
+                                                      updated_at=CURRENT_TIMESTAMP""",
+                (source, done_rows)
+            )
+
+    def flush():
+        vault._retry.call(write_batch)
+        stats['semesters'] += len(pending)
+        stats['rows'] = done_rows
+        stats['batches'] += 1
+        pending.clear()
+        if progress:
+            progress(dict(stats))
+
+    line_no = 0
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in _iter_rows(f, fmt):
+            line_no += 1
+            if line_no <= skip:
+                continue
+            try:
+                username = str(row.get('user') or row.get('student') or '').strip()
+                if not username:
+                    raise ValueError("user is required")
+                key = (username, int(row['academic_year']), int(row['semester_num']))
+                cu = int(row['credit_units'])
+                if cu <= 0:
+                    raise ValueError("Credit units must be positive integers.")
+                letter = scale.normalize(row['grade'])
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"row {line_no}: {e}") from None
+            if key != sem_key:
+                if sem_key is not None:
+                    finish_semester()
+                    done_rows = line_no - 1
+                    if done_rows - stats['rows'] >= batch_rows:
+                        flush()
+                if username != user:
+                    if username in seen_users:
+                        raise ValueError(f"row {line_no}: rows for user {username!r} are not contiguous")
+                    seen_users.add(username)
+                    stats['users'] += 1
+                    user = username
+                    existing, skipped = _existing_terms(username), set()
+                    acc = CGPAAccumulator(scale)
+                sem_key = key
+                courses = []
+            courses.append((str(row.get('course') or '') or None, cu, letter))
+        if sem_key is not None:
+            finish_semester()
+            done_rows = line_no
+        if pending:
+            flush()
+    return stats
@@ -0,0 +1,173 @@
+"""Housekeeping for the vault: statistics, WAL checkpoints and VACUUM.
+
+`run_maintenance` runs the steps once on the pool's writer connection and
+reports the database and WAL file sizes before and after, recording when it
+last ran in the vault itself; `start_maintenance` repeats it on a background
+thread, starting with an immediate run if the last one is already overdue (so
+an app restarted every day still gets its housekeeping). VACUUM rewrites the whole file and blocks
+writers while it runs, so by default it only runs when enough of the file is
+free pages to be worth it.
+"""
+
+import os
+import threading
+import time
+
+from . import vault_manager as vault
+
+DEFAULT_INTERVAL = 24 * 3600
+# Fraction of free pages above which vacuum='auto' rebuilds the file.
+DEFAULT_VACUUM_THRESHOLD = 0.2
+# Rows sampled per index by ANALYZE; bounds its cost on large vaults.
+ANALYSIS_LIMIT = 1000
+
+VACUUM_MODES = ('auto', 'always', 'never')
+
+LAST_RUN_KEY = 'maintenance_last_run'
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def vault_sizes() -> dict:
+    """Current database/WAL file sizes and page counts."""
+    with vault.reader() as conn:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    path = vault.get_pool().path
+    return {'db_bytes': _file_size(path), 'wal_bytes': _file_size(path + '-wal'),
+            'page_size': page_size, 'page_count': page_count, 'freelist_count': freelist}
+
+
+def last_run() -> float:
+    """Unix time the last successful `run_maintenance` finished (None if never)."""
+    with vault.reader() as conn:
+        row = conn.execute("SELECT value FROM vault_meta WHERE key = ?", (LAST_RUN_KEY,)).fetchone()
+    return float(row[0]) if row else None
+
+
+def _record_run(conn, when: float):
+    conn.execute("""INSERT INTO vault_meta (key, value) VALUES (?, ?)
+                    ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP""",
+                 (LAST_RUN_KEY, repr(when)))
+    conn.commit()
+
+
+def run_maintenance(analyze: bool = True, checkpoint: bool = True, vacuum: str = 'auto',
+                    vacuum_threshold: float = DEFAULT_VACUUM_THRESHOLD) -> dict:
+    """Run PRAGMA optimize (after ANALYZE if `analyze`), a truncating WAL
+    checkpoint and VACUUM per `vacuum` ('auto': when at least
+    `vacuum_threshold` of the pages are free).
+
+    Returns {'before', 'after', 'steps'} where steps maps each step run to its
+    duration in seconds (the checkpoint also records SQLite's busy/log/
+    checkpointed page counts).
+    """
+    if vacuum not in VACUUM_MODES:
+        raise ValueError(f"Unknown vacuum mode: {vacuum!r} (expected one of {', '.join(VACUUM_MODES)})")
+    if vault.get_pool().immutable:
+        raise RuntimeError("Maintenance needs a writable vault (current profile is immutable)")
+    before = vault_sizes()
+    steps = {}
+
+    free_ratio = before['freelist_count'] / before['page_count'] if before['page_count'] else 0.0
+    run_vacuum = vacuum == 'always' or (vacuum == 'auto' and free_ratio >= vacuum_threshold)
+
+    def timed(conn, name, sql):
+        start = time.perf_counter()
+        row = conn.execute(sql).fetchone()
+        steps[name] = {'seconds': round(time.perf_counter() - start, 4)}
+        return row
+
+    def housekeeping():
+        steps.clear()
+        # No transaction is opened: ANALYZE, VACUUM and checkpoints run in autocommit.
+        with vault.writer() as conn:
+            if analyze:
+                conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+                timed(conn, 'analyze', "ANALYZE")
+            timed(conn, 'optimize', "PRAGMA optimize")
+            if run_vacuum:
+                timed(conn, 'vacuum', "VACUUM")
+            # Committed before the checkpoint, so the checkpoint folds this write in too.
+            _record_run(conn, time.time())
+            if checkpoint:
+                busy, log, done = timed(conn, 'checkpoint', "PRAGMA wal_checkpoint(TRUNCATE)")
+                steps['checkpoint'].update(busy=busy, log_pages=log, checkpointed_pages=done)
+
+    vault._retry.call(housekeeping)
+    return {'before': before, 'after': vault_sizes(), 'steps': steps}
+
+
+class _Scheduler:
+    def __init__(self, interval: float, options: dict):
+        self.interval = interval
+        self.options = options
+        self.last_run = last_run()
+        self.last_report = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='vault-maintenance', daemon=True)
+        self._thread.start()
+
+    def _first_delay(self) -> float:
+        if self.last_run is None:
+            return 0.0
+        return min(self.interval, max(0.0, self.last_run + self.interval - time.time()))
+
+    def _run(self):
+        delay = self._first_delay()
+        while not self._stop.wait(delay):
+            delay = self.interval
+            try:
+                self.last_report = run_maintenance(**self.options)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            self.last_run = time.time()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_maintenance(interval: float = DEFAULT_INTERVAL, **options):
+    """Run `run_maintenance(**options)` every `interval` seconds in the background.
+
+    The first run happens right away if maintenance has never run on this
+    vault or last ran more than `interval` seconds ago, otherwise when that
+    interval is up.
+    """
+    global _scheduler
+    if interval <= 0:
+        raise ValueError("interval must be > 0")
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.stop()
+        _scheduler = _Scheduler(interval, options)
+
+
+def stop_maintenance():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.stop()
+            _scheduler = None
+
+
+def maintenance_status() -> dict:
+    """Schedule and outcome of the background task (None when not running)."""
+    s = _scheduler
+    if s is None:
+        return None
+    return {'interval': s.interval, 'last_run': s.last_run, 'last_error': s.last_error,
+            'last_report': s.last_report}
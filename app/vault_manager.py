@@ -1,32 +1,526 @@
-import sqlite3, os, json
-from typing import List, Tuple
+import sqlite3, os, json, threading
+import base64
+from typing import Iterable, List, Tuple
+import contextlib
+import contextvars
+import copy
+import functools
 import hashlib
+from collections import OrderedDict
+from concurrent.futures import Future
+from itertools import groupby
+from .cgpa_calculator import CGPAAccumulator, cgpa_from_points100
+from .constants import DEFAULT_SCALE
+from .gpa_calculator import compute_gpa, gpa_from_points2
+from .grading import SCALES, get_scale
+from .simulator import SIMULATOR_VERSION
+from .vault_pool import ConnectionPool
+from .vault_queue import WriteQueue
+from .vault_retry import RetryPolicy, VaultBusyError
 
-DB_PATH = os.path.join(os.path.dirname(__file__), 'database', 'vault.db')
+# Vault location: a file path, or ':memory:' / 'memory:NAME' for a shared-cache
+# in-memory vault (see vault_backup.start_flush to persist it periodically)
+DB_PATH = os.environ.get('VAULT_DB_PATH') or os.path.join(os.path.dirname(__file__), 'database', 'vault.db')
+
+# Read-only connections kept per process alongside the single writer
+POOL_READERS = 4
+
+# Per-user read results kept in process (LRU entries; 0 disables the cache)
+USER_CACHE_SIZE = 256
+
+# Stored simulation results: at most this many rows (oldest inserts go first),
+# none older than this many days
+SCENARIO_RESULTS_MAX_ROWS = 10000
+SCENARIO_RESULTS_MAX_AGE_DAYS = 90
+
+# Keyset pagination: rows per page by default and at most
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Seconds a connection waits on a lock before SQLite reports it busy; write
+# operations are then retried with backoff until RETRY_DEADLINE seconds pass.
+# Reads aren't retried: read-only connections wait up to RETRY_DEADLINE instead
+# (in WAL mode they only block on recovery or a truncating checkpoint).
+BUSY_TIMEOUT = 0.25
+RETRY_DEADLINE = 5.0
+# Seconds a save waits on the write queue: its own batch plus one ahead of it,
+# each retried for up to RETRY_DEADLINE
+QUEUE_WAIT = 2 * RETRY_DEADLINE + 1.0
+
+# Per-connection PRAGMA sets, applied whenever the pool opens a connection.
+# cache_size is negative KiB; synchronous=NORMAL is durable across app
+# crashes in WAL mode (a power cut may lose the last commits, never corrupt).
+PROFILES = {
+    # Single user on a laptop: modest memory, frequent small checkpoints.
+    'desktop': {'synchronous': 'NORMAL', 'cache_size': -16000, 'mmap_size': 64 * 2**20,
+                'temp_store': 'MEMORY', 'wal_autocheckpoint': 1000, 'journal_size_limit': 32 * 2**20},
+    # API server: larger cache and map, fewer checkpoints stalling writers.
+    'server': {'synchronous': 'NORMAL', 'cache_size': -64000, 'mmap_size': 256 * 2**20,
+               'temp_store': 'MEMORY', 'wal_autocheckpoint': 4000, 'journal_size_limit': 128 * 2**20},
+    # Lab kiosk showing a vault copy nothing writes to: immutable=1 readers, no writer.
+    'kiosk': {'cache_size': -16000, 'mmap_size': 64 * 2**20, 'temp_store': 'MEMORY', 'query_only': 1},
+}
+IMMUTABLE_PROFILES = {'kiosk'}
+PROFILE = os.environ.get('VAULT_PROFILE', 'desktop')
 
 # Store current logged-in user in memory
 _current_user = None
 
+# One pool per process, shared by the Flask UI, the FastAPI app and the CLI
+_pool = None
+_pool_profile = None
+_pool_ready = False      # schema checked (and migrated if behind) since the pool opened
+_pool_migrating = False  # only ever True for the thread holding _pool_lock
+_pool_lock = threading.RLock()
+
+def _init_connection(conn: sqlite3.Connection, profile: str = None):
+    """Per-connection setup: the tuning profile's PRAGMAs and the SQL functions
+    shared by the vault queries."""
+    for name, value in PROFILES[profile or PROFILE].items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    # cgpa_trunc(points100, total_cu) quantizes exactly like CGPAAccumulator.cgpa,
+    # so CGPAs computed inside SQL match the ones computed in Python.
+    conn.create_function('cgpa_trunc', 2, cgpa_from_points100, deterministic=True)
+    # gpa_round(points2, total_cu) rounds like compute_gpa (SQLite's ROUND differs on ties).
+    conn.create_function('gpa_round', 2, gpa_from_points2, deterministic=True)
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, reopening it if DB_PATH or PROFILE changed or after fork.
+
+    A newly opened pool first brings a writable vault up to SCHEMA_VERSION,
+    so entry points that never call `init_db` still read a migrated schema.
+    """
+    global _pool, _pool_profile, _pool_ready, _pool_migrating
+    pool = _pool
+    if (pool is not None and _pool_ready and pool.path == DB_PATH and pool.pid == os.getpid()
+            and _pool_profile == PROFILE):
+        return pool
+    with _pool_lock:
+        if _pool is not None and (_pool.path != DB_PATH or _pool.pid != os.getpid() or _pool_profile != PROFILE):
+            if _pool.pid == os.getpid():
+                _pool.close()
+            _pool = None
+        if _pool is None:
+            _user_cache.clear()
+            profile = PROFILE
+            if profile not in PROFILES:
+                raise ValueError(f"Unknown vault profile: {profile!r} (expected one of {', '.join(PROFILES)})")
+            _pool = ConnectionPool(DB_PATH, readers=POOL_READERS, timeout=BUSY_TIMEOUT,
+                                   read_timeout=RETRY_DEADLINE,
+                                   init=functools.partial(_init_connection, profile=profile),
+                                   immutable=profile in IMMUTABLE_PROFILES)
+            _pool_profile = profile
+            _pool_ready = False
+        if not _pool_ready and not _pool_migrating:
+            # Other threads wait on the lock; this one re-enters get_pool while migrating.
+            _pool_migrating = True
+            try:
+                _ensure_schema(_pool)
+            finally:
+                _pool_migrating = False
+            _pool_ready = True
+        return _pool
+
+def set_profile(name: str):
+    """Switch the tuning profile; pooled connections reopen with its PRAGMAs."""
+    global PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown vault profile: {name!r} (expected one of {', '.join(PROFILES)})")
+    PROFILE = name
+    close_pool()
+
+def close_pool():
+    """Close all pooled connections (they reopen lazily on next use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.close()
+        _pool = None
+        _user_cache.clear()
+
+def reader():
+    """Context manager yielding a pooled read-only connection."""
+    return get_pool().reader()
+
+def writer():
+    """Context manager yielding the pooled writer connection in a transaction."""
+    _forget_request_version()  # reads after this write must look again
+    return get_pool().writer()
+
+# Per-request view of the database version; see request_scope
+_request_version = contextvars.ContextVar('vault_request_version', default=None)
+
+@contextlib.contextmanager
+def request_scope():
+    """Check the database version once for this block (one web request).
+
+    Cached per-user reads inside the block reuse the first `data_version`
+    they see instead of asking SQLite on every hit, so repeat reads in a
+    request run no SQL at all. Writes made from inside the block reset it;
+    commits by other connections show up in the next request.
+    """
+    token = _request_version.set({})
+    try:
+        yield
+    finally:
+        _request_version.reset(token)
+
+def _forget_request_version():
+    scope = _request_version.get()
+    if scope:
+        scope.clear()
+
+def _data_version(pool: ConnectionPool) -> int:
+    scope = _request_version.get()
+    if scope is None:
+        return pool.data_version()
+    if scope.get('pool') is not pool:
+        scope['pool'], scope['version'] = pool, pool.data_version()
+    return scope['version']
+
+def pool_stats() -> dict:
+    pool = get_pool()
+    return dict(pool.stats(), profile=_pool_profile, immutable=pool.immutable)
+
+_retry = RetryPolicy(deadline=RETRY_DEADLINE)
+
+def _retrying(fn):
+    """Retry `fn` as a whole when the vault is busy (see `vault_retry`).
+
+    Calls nested in an open write transaction (including write-queue batches,
+    which the queue retries as a unit) run once: only the outermost
+    operation can be rolled back and re-run safely.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if get_pool().in_writer():
+            return fn(*args, **kwargs)
+        return _retry.call(fn, *args, **kwargs)
+    return wrapper
+
+def operation_deadline(seconds: float):
+    """Context manager bounding each vault write in this thread to `seconds`
+    (including retries); raises VaultBusyError when exceeded."""
+    return _retry.deadline(seconds)
+
+def retry_stats() -> dict:
+    """Busy retries and total/max lock-wait seconds of retried vault writes."""
+    return _retry.stats()
+
+class _UserCache:
+    """Size-bounded LRU of per-user read results.
+
+    Each entry remembers the pool's `data_version` and the user's
+    user_aggregates.data_version when it was filled. While the database hasn't
+    changed at all (no commit from any connection or process) a hit costs one
+    `PRAGMA data_version` on the watcher connection and no table reads; inside
+    `request_scope` only the first hit of the request pays even that. After a
+    commit the entry is revalidated with one primary-key read of the user's
+    version, which every semester write bumps.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'evictions': 0}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), max_entries=USER_CACHE_SIZE)
+
+    def _user_version(self, user_id: int) -> int:
+        with reader() as conn:
+            row = conn.execute("SELECT data_version FROM user_aggregates WHERE user_id=?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def get(self, kind: str, user_id: int, load):
+        pool = get_pool()
+        # Inside a write transaction reads may see uncommitted rows; never cache them.
+        if USER_CACHE_SIZE <= 0 or pool.in_writer():
+            return load(user_id)
+        key = (kind, user_id)
+        db_version = _data_version(pool)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry[0] == db_version:
+                    self._stats['hits'] += 1
+                    return copy.deepcopy(entry[2])
+        # Read the user's version before the data: a write in between makes it stale, not wrong.
+        user_version = self._user_version(user_id)
+        if entry is not None and entry[1] == user_version:
+            with self._lock:
+                entry[0] = db_version
+                self._stats['hits'] += 1
+                self._stats['revalidated'] += 1
+            return copy.deepcopy(entry[2])
+        value = load(user_id)
+        with self._lock:
+            self._stats['misses'] += 1
+            self._entries[key] = [db_version, user_version, value]
+            self._entries.move_to_end(key)
+            while len(self._entries) > USER_CACHE_SIZE:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return copy.deepcopy(value)
+
+_user_cache = _UserCache()
+
+def _user_cached(fn):
+    """Serve `fn(user_id)` through the per-user cache; `fn.uncached` bypasses it."""
+    @functools.wraps(fn)
+    def wrapper(user_id: int):
+        return _user_cache.get(fn.__name__, user_id, fn)
+    wrapper.uncached = fn
+    return wrapper
+
+def user_cache_stats() -> dict:
+    return _user_cache.stats()
+
+def clear_user_cache():
+    _user_cache.clear()
+
+# Optional group-commit mode: saves are batched by one writer thread
+_write_queue = None
+
+def start_write_queue(max_batch: int = 64, max_delay: float = 0.005) -> WriteQueue:
+    """Route save_semester/save_scenario through a batching writer thread.
+
+    Operations arriving within `max_delay` seconds share one transaction (and
+    one WAL commit); each caller still gets its own id or exception. Off
+    unless started: it trades up to `max_delay` of latency per save for
+    fewer commits, which only pays off where commits are fsync-bound (slow
+    or network disks); on fast local storage throughput is unchanged.
+    """
+    global _write_queue
+    with _pool_lock:
+        if _write_queue is None or _write_queue.pid != os.getpid():
+            _write_queue = WriteQueue(writer, max_batch=max_batch, max_delay=max_delay, retry=_retry.call)
+        return _write_queue
+
+def stop_write_queue():
+    """Finish queued writes and return to direct (one commit per save) mode."""
+    global _write_queue
+    with _pool_lock:
+        q, _write_queue = _write_queue, None
+    if q is not None and q.pid == os.getpid():
+        q.stop()
+
+def write_queue_stats() -> dict:
+    q = _write_queue
+    return q.stats() if q is not None else None
+
+def _queued(fn, *args, **kwargs) -> Future:
+    """Submit `fn` to the write queue, or run it now when the queue is off or
+    its worker has died (or when called from the worker or inside an open
+    write transaction)."""
+    q = _write_queue
+    if q is None or q.pid != os.getpid() or not q.alive() or q.in_worker() or get_pool().in_writer():
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    return q.submit(fn, *args, **kwargs)
+
+def _queued_result(future: Future):
+    """Wait for a `_queued` write: at most QUEUE_WAIT seconds, and not at all
+    once the queue's worker is gone; both raise VaultBusyError."""
+    # The write commits on the queue's thread, outside this request's scope.
+    _forget_request_version()
+    if future.done():
+        return future.result()
+    q = _write_queue
+    try:
+        if q is None:
+            return future.result(timeout=QUEUE_WAIT)
+        return q.wait(future, QUEUE_WAIT)
+    except (TimeoutError, RuntimeError) as e:
+        if future.done():
+            raise  # the operation's own error
+        raise VaultBusyError(str(e)) from e
+
 def get_connection():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH, timeout=30.0, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    # Set WAL mode and timeout at connection level
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute("PRAGMA busy_timeout = 30000;")
-    return conn
+    """Open a standalone connection (prefer `reader()`/`writer()`; caller must close it)."""
+    return get_pool().connect()
+
+def _migration_1_indexes(cur):
+    """Index the per-user semester and per-semester course lookups."""
+    # Covers ordering plus the columns CGPA/summary reads need, so those skip the table.
+    cur.execute("""CREATE INDEX IF NOT EXISTS idx_semesters_user_term
+                   ON semesters(user_id, academic_year, semester_num, total_cu, gpa, cgpa)""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_courses_semester ON courses(semester_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_scenarios_user ON scenarios(user_id)")
+
+def _migration_2_user_aggregates(cur):
+    """Materialized per-user totals, kept in step with semesters on every write."""
+    cur.execute('''CREATE TABLE IF NOT EXISTS user_aggregates (
+        user_id INTEGER PRIMARY KEY,
+        total_cu INTEGER NOT NULL DEFAULT 0,
+        points100 INTEGER NOT NULL DEFAULT 0,
+        semester_count INTEGER NOT NULL DEFAULT 0,
+        latest_semester_id INTEGER,
+        latest_year INTEGER,
+        latest_semester INTEGER,
+        data_version INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+    )''')
+    for (user_id,) in cur.execute("SELECT DISTINCT user_id FROM semesters").fetchall():
+        _refresh_user_aggregate(cur, user_id)
+
+def _migration_3_import_checkpoints(cur):
+    """Progress of streaming imports, committed in the same transaction as each batch."""
+    cur.execute('''CREATE TABLE IF NOT EXISTS import_checkpoints (
+        source TEXT PRIMARY KEY,
+        rows_done INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+
+def _grade_points2_case(scale, column: str = 'grade_letter') -> str:
+    """SQL expression mapping a grade letter column to half-points (NULL if unknown)."""
+    whens = ' '.join(f"WHEN '{letter}' THEN {scale.points2[code]}" for letter, code in scale.codes.items())
+    return f"CASE UPPER(TRIM({column})) {whens} END"
+
+def _sql_text(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+def _scaled_points2_case(column: str, scale_column: str, scales=None) -> str:
+    """Like `_grade_points2_case`, but each row's letter is mapped under the
+    scale named in `scale_column` (NULL for scales not in `scales`, default
+    every registered scale)."""
+    scales = SCALES.values() if scales is None else scales
+    whens = ' '.join(f"WHEN {_sql_text(s.name)} THEN ({_grade_points2_case(s, column)})" for s in scales)
+    return f"CASE {scale_column} {whens} END"
+
+def _migration_4_course_grade_points(cur):
+    """Integer half-point grade column so GPA sums can run inside SQLite.
+
+    Backfilled from the default grading scale; the covering index replaces
+    idx_courses_semester (same prefix) for per-semester sums.
+    """
+    columns = {r[1] for r in cur.execute("PRAGMA table_info(courses)")}
+    if 'grade_points2' not in columns:
+        cur.execute("ALTER TABLE courses ADD COLUMN grade_points2 INTEGER")
+    if 'scale' in {r[1] for r in cur.execute("PRAGMA table_info(semesters)")}:
+        # Re-run on a vault whose semesters already record their scale (migration 9).
+        points2 = (f"(SELECT {_scaled_points2_case('courses.grade_letter', 's.scale')} "
+                   "FROM semesters s WHERE s.id = courses.semester_id)")
+    else:
+        points2 = _grade_points2_case(get_scale())
+    cur.execute(f"UPDATE courses SET grade_points2 = {points2}")
+    cur.execute("""CREATE INDEX IF NOT EXISTS idx_courses_semester_points
+                   ON courses(semester_id, credit_units, grade_points2)""")
+    cur.execute("DROP INDEX IF EXISTS idx_courses_semester")
+
+def _migration_5_scenario_results(cur):
+    """Simulation results keyed by canonical params hash and grading scale fingerprint."""
+    cur.execute('''CREATE TABLE IF NOT EXISTS scenario_results (
+        id INTEGER PRIMARY KEY,
+        params_hash TEXT NOT NULL,
+        scale_fingerprint TEXT NOT NULL,
+        result TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    cur.execute("""CREATE UNIQUE INDEX IF NOT EXISTS idx_scenario_results_key
+                   ON scenario_results(params_hash, scale_fingerprint)""")
+    columns = {r[1] for r in cur.execute("PRAGMA table_info(scenarios)")}
+    if 'params_hash' not in columns:
+        cur.execute("ALTER TABLE scenarios ADD COLUMN params_hash TEXT")
+    rows = cur.execute("SELECT id, params FROM scenarios").fetchall()
+    cur.executemany("UPDATE scenarios SET params_hash=? WHERE id=?",
+                    ((scenario_params_hash(json.loads(params or 'null')), sid) for sid, params in rows))
+
+def _migration_6_scenario_result_versions(cur):
+    """Key stored results by simulator version too; rows from before get version 0."""
+    columns = {r[1] for r in cur.execute("PRAGMA table_info(scenario_results)")}
+    if 'simulator_version' not in columns:
+        cur.execute("ALTER TABLE scenario_results ADD COLUMN simulator_version INTEGER NOT NULL DEFAULT 0")
+    cur.execute("DROP INDEX IF EXISTS idx_scenario_results_key")
+    cur.execute("""CREATE UNIQUE INDEX idx_scenario_results_key
+                   ON scenario_results(params_hash, scale_fingerprint, simulator_version)""")
+
+def _migration_7_vault_meta(cur):
+    """Small key/value store for vault-wide state (e.g. when maintenance last ran)."""
+    cur.execute('''CREATE TABLE IF NOT EXISTS vault_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+
+def _migration_8_semester_page_index(cur):
+    """Index in exact page order (id breaks term ties) so keyset pages of
+    semesters are a range seek with no sort step."""
+    cur.execute("""CREATE INDEX IF NOT EXISTS idx_semesters_user_term_id
+                   ON semesters(user_id, academic_year, semester_num, id)""")
+
+def _migration_9_semester_scale(cur):
+    """Record the grading scale each semester's GPA and course grade points
+    were computed on; rows from before were all on the default scale."""
+    columns = {r[1] for r in cur.execute("PRAGMA table_info(semesters)")}
+    if 'scale' not in columns:
+        cur.execute(f"ALTER TABLE semesters ADD COLUMN scale TEXT NOT NULL DEFAULT {_sql_text(DEFAULT_SCALE)}")
+
+# Schema migrations, applied in order. The database's PRAGMA user_version records
+# how many have run; append new steps, never edit or reorder existing ones.
+MIGRATIONS = [
+    _migration_1_indexes,
+    _migration_2_user_aggregates,
+    _migration_3_import_checkpoints,
+    _migration_4_course_grade_points,
+    _migration_5_scenario_results,
+    _migration_6_scenario_result_versions,
+    _migration_7_vault_meta,
+    _migration_8_semester_page_index,
+    _migration_9_semester_scale,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version() -> int:
+    with reader() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def _migrate(cur) -> int:
+    """Run pending migrations inside the caller's transaction; returns the new version."""
+    version = cur.execute("PRAGMA user_version").fetchone()[0]
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Vault schema version {version} is newer than this app supports ({SCHEMA_VERSION})")
+    for number in range(version + 1, SCHEMA_VERSION + 1):
+        MIGRATIONS[number - 1](cur)
+        cur.execute(f"PRAGMA user_version = {number}")
+    return SCHEMA_VERSION
+
+def _ensure_schema(pool: ConnectionPool):
+    """Create or migrate the schema if the vault is behind this app (immutable vaults are left alone)."""
+    if pool.immutable:
+        return
+    with pool.reader() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < SCHEMA_VERSION:
+        _create_schema()
 
 def init_db():
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    try:
-        # Enable WAL mode for better concurrency and reduce lock contention
-        cur.execute("PRAGMA journal_mode=WAL;")
-        # Set busy timeout to 30 seconds in milliseconds
-        cur.execute("PRAGMA busy_timeout = 30000;")
-        # Increase cache size for better performance
-        cur.execute("PRAGMA cache_size = 10000;")
+    if get_pool().immutable:
+        # Read-only profile: nothing to create, but the schema must be current.
+        version = get_schema_version()
+        if version != SCHEMA_VERSION:
+            raise RuntimeError(f"Immutable vault has schema version {version}, expected {SCHEMA_VERSION}")
+        return
+    _create_schema()
+
+@_retrying
+def _create_schema():
+    with writer() as conn:
+        cur = conn.cursor()
+        # DDL doesn't open a transaction implicitly; take the write lock up front so
+        # table creation and migrations commit together and concurrent inits serialize.
+        if not conn.in_transaction:
+            cur.execute("BEGIN IMMEDIATE")
         
         cur.execute('''CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -69,40 +563,37 @@ def init_db():
             FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
         )''')
 
-        conn.commit()
-    finally:
-        conn.close()
+        _migrate(cur)
+        # Results computed under a changed scale or simulator can never be hit again.
+        _purge_scenario_results(cur)
+    # Migrations may rewrite rows without bumping per-user versions.
+    _user_cache.clear()
 
 def _hash_password(password: str) -> str:
     """Hash password using SHA256."""
     return hashlib.sha256(password.encode()).hexdigest()
 
+@_retrying
 def register_user(username: str, password: str, full_name: str = None, email: str = None, 
                   program: str = None, duration: int = None) -> dict:
     """Register a new user. Returns user dict on success, None on failure."""
     try:
-        conn = get_connection()
-        cur = conn.cursor()
         hashed_pwd = _hash_password(password)
-        cur.execute(
-            "INSERT INTO users (username, password, full_name, email, program, duration) VALUES (?, ?, ?, ?, ?, ?)",
-            (username, hashed_pwd, full_name, email, program, duration)
-        )
-        user_id = cur.lastrowid
-        conn.commit()
-        conn.close()
+        with writer() as conn:
+            cur = conn.execute(
+                "INSERT INTO users (username, password, full_name, email, program, duration) VALUES (?, ?, ?, ?, ?, ?)",
+                (username, hashed_pwd, full_name, email, program, duration)
+            )
+            user_id = cur.lastrowid
         return {'id': user_id, 'username': username, 'full_name': full_name, 'email': email, 'program': program, 'duration': duration}
     except sqlite3.IntegrityError:
         return None  # Username already exists
 
 def login_user(username: str, password: str) -> dict:
     """Login user. Returns user dict on success, None on failure."""
-    conn = get_connection()
-    cur = conn.cursor()
     hashed_pwd = _hash_password(password)
-    cur.execute("SELECT * FROM users WHERE username=? AND password=?", (username, hashed_pwd))
-    row = cur.fetchone()
-    conn.close()
+    with reader() as conn:
+        row = conn.execute("SELECT * FROM users WHERE username=? AND password=?", (username, hashed_pwd)).fetchone()
     return dict(row) if row else None
 
 def get_current_user() -> dict:
@@ -120,51 +611,292 @@ def logout_user():
     global _current_user
     _current_user = None
 
+@_retrying
 def create_user(name: str, program: str = None, duration: int = None) -> int:
     """Legacy function for creating user without auth."""
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO users (username, full_name, password, program, duration) VALUES (?, ?, ?, ?, ?)", 
-                (name, name, _hash_password('guest'), program, duration))
-    uid = cur.lastrowid
-    conn.commit()
-    conn.close()
-    return uid
+    with writer() as conn:
+        cur = conn.execute("INSERT INTO users (username, full_name, password, program, duration) VALUES (?, ?, ?, ?, ?)", 
+                           (name, name, _hash_password('guest'), program, duration))
+        return cur.lastrowid
 
 def get_user(user_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, username, full_name, email, program, duration FROM users WHERE id=?", (user_id,))
-    row = cur.fetchone()
-    conn.close()
+    with reader() as conn:
+        row = conn.execute("SELECT id, username, full_name, email, program, duration FROM users WHERE id=?", (user_id,)).fetchone()
     return dict(row) if row else None
 
+def _course_rows(courses, scale) -> List[Tuple[str, int, str, int]]:
+    """Validate (name, cu, letter) rows into (name, cu, normalized letter, grade_points2)."""
+    rows = []
+    for name, cu, letter in courses:
+        code = scale.code(letter)
+        rows.append((name, cu, scale.letters[code], scale.points2[code]))
+    return rows
+
 def save_semester(user_id: int, academic_year: int, semester_num: int, total_cu: int, 
-                  gpa: float, cgpa: float, courses: List[Tuple[str,int,str]] = None) -> int:
-    """Save semester data with courses."""
-    conn = get_connection()
-    try:
+                  gpa: float, cgpa: float = None, courses: List[Tuple[str,int,str]] = None, scale=None) -> int:
+    """Save semester data with courses; returns the new semester id.
+
+    Goes through the write queue when `start_write_queue` is active.
+    """
+    return _queued_result(save_semester_async(user_id, academic_year, semester_num, total_cu, gpa, cgpa,
+                                              courses, scale))
+
+def save_semester_async(user_id: int, academic_year: int, semester_num: int, total_cu: int,
+                        gpa: float, cgpa: float = None, courses: List[Tuple[str,int,str]] = None,
+                        scale=None) -> Future:
+    """Like `save_semester` but returns a Future resolving to the new id."""
+    return _queued(_save_semester, user_id, academic_year, semester_num, total_cu, gpa, cgpa, courses, scale)
+
+@_retrying
+def _save_semester(user_id: int, academic_year: int, semester_num: int, total_cu: int,
+                   gpa: float, cgpa: float = None, courses: List[Tuple[str,int,str]] = None, scale=None) -> int:
+    """Save semester data with courses.
+
+    Course grade letters are validated and normalized against `scale`
+    (default grading scale when omitted), which is recorded on the semester
+    so repairs and aggregates grade it the same way. `cgpa` is stored as given (or
+    computed from the semesters before it when None); the running CGPA of
+    every later semester is then recomputed, so saving an earlier term after
+    later ones leaves the sequence consistent.
+    """
+    scale = get_scale(scale)
+    if courses:
+        courses = _course_rows(courses, scale)
+    with writer() as conn:
         cur = conn.cursor()
         cur.execute(
-            "INSERT INTO semesters (user_id, academic_year, semester_num, total_cu, gpa, cgpa) VALUES (?, ?, ?, ?, ?, ?)",
-            (user_id, academic_year, semester_num, total_cu, gpa, cgpa)
+            """INSERT INTO semesters (user_id, academic_year, semester_num, total_cu, gpa, cgpa, scale)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (user_id, academic_year, semester_num, total_cu, gpa, cgpa, scale.name)
         )
         sem_id = cur.lastrowid
         if courses:
-            for name, cu, letter in courses:
+            for name, cu, letter, points2 in courses:
                 cur.execute(
-                    "INSERT INTO courses (semester_id, name, credit_units, grade_letter) VALUES (?, ?, ?, ?)",
-                    (sem_id, name, cu, letter)
+                    "INSERT INTO courses (semester_id, name, credit_units, grade_letter, grade_points2) VALUES (?, ?, ?, ?, ?)",
+                    (sem_id, name, cu, letter, points2)
                 )
-        conn.commit()
+        _recompute_cgpa(cur, user_id, after=(academic_year, semester_num, sem_id if cgpa is not None else sem_id - 1))
+        _refresh_user_aggregate(cur, user_id)
         return sem_id
-    finally:
-        conn.close()
 
+@_retrying
+def update_semester(semester_id: int, academic_year: int = None, semester_num: int = None,
+                    total_cu: int = None, gpa: float = None,
+                    courses: List[Tuple[str, int, str]] = None, scale=None) -> bool:
+    """Edit a saved semester; returns False if it doesn't exist.
+
+    Passing `courses` replaces the semester's course rows, graded on `scale`
+    (default: the scale the semester was saved with), which is then recorded;
+    `gpa` and `total_cu` default to values computed from them. `scale` is
+    ignored without `courses`. The stored CGPA of every semester from the
+    earlier of the old and new term onward is recomputed.
+    """
+    with writer() as conn:
+        cur = conn.cursor()
+        row = cur.execute("SELECT user_id, academic_year, semester_num, scale FROM semesters WHERE id=?",
+                          (semester_id,)).fetchone()
+        if row is None:
+            return False
+        user_id, old_term = row[0], (row[1], row[2])
+        scale_name = None
+        if courses is not None:
+            scale = get_scale(scale if scale is not None else row[3])
+            scale_name = scale.name
+            courses = _course_rows(courses, scale)
+            if courses:
+                if gpa is None:
+                    gpa = compute_gpa([(cu, letter) for _, cu, letter, _ in courses], scale)
+                if total_cu is None:
+                    total_cu = sum(c[1] for c in courses)
+        cur.execute(
+            """UPDATE semesters SET academic_year=COALESCE(?, academic_year), semester_num=COALESCE(?, semester_num),
+                                    total_cu=COALESCE(?, total_cu), gpa=COALESCE(?, gpa), scale=COALESCE(?, scale)
+               WHERE id=?""",
+            (academic_year, semester_num, total_cu, gpa, scale_name, semester_id)
+        )
+        if courses is not None:
+            cur.execute("DELETE FROM courses WHERE semester_id=?", (semester_id,))
+            cur.executemany(
+                "INSERT INTO courses (semester_id, name, credit_units, grade_letter, grade_points2) VALUES (?, ?, ?, ?, ?)",
+                ((semester_id,) + c for c in courses)
+            )
+        new_term = (academic_year or old_term[0], semester_num or old_term[1])
+        _recompute_cgpa(cur, user_id, after=min(old_term, new_term) + (0,))
+        _refresh_user_aggregate(cur, user_id)
+    return True
+
+@_retrying
+def delete_semester(semester_id: int) -> bool:
+    """Delete a semester and its courses; later semesters' CGPAs are recomputed."""
+    with writer() as conn:
+        cur = conn.cursor()
+        row = cur.execute("SELECT user_id, academic_year, semester_num FROM semesters WHERE id=?",
+                          (semester_id,)).fetchone()
+        if row is None:
+            return False
+        cur.execute("DELETE FROM courses WHERE semester_id=?", (semester_id,))
+        cur.execute("DELETE FROM semesters WHERE id=?", (semester_id,))
+        _recompute_cgpa(cur, row[0], after=(row[1], row[2], 0))
+        _refresh_user_aggregate(cur, row[0])
+    return True
+
+# UPDATE ... FROM needs SQLite 3.33; older builds (e.g. a bundled Python's) take the fallback.
+_UPDATE_FROM = sqlite3.sqlite_version_info >= (3, 33, 0)
+
+# Running CGPA per semester of one user, over the same window as get_cgpa_trajectory.
+_RUNNING_CGPA_SQL = """
+    SELECT id, academic_year, semester_num,
+           cgpa_trunc(SUM(CAST(ROUND(gpa * 100) AS INTEGER) * total_cu) OVER w, SUM(total_cu) OVER w) AS cgpa
+    FROM semesters WHERE user_id = ?
+    WINDOW w AS (ORDER BY academic_year, semester_num, id ROWS UNBOUNDED PRECEDING)"""
+
+def _recompute_cgpa(cur, user_id: int, after: Tuple[int, int, int] = (0, 0, 0),
+                    keep_ids: Tuple[int, int] = (0, -1)) -> int:
+    """Rewrite stored running CGPAs of semesters ordered after `after`.
+
+    `after` is an (academic_year, semester_num, id) position; (year, sem, 0)
+    covers that whole term. Ids in the inclusive `keep_ids` range keep their
+    stored value unless it is NULL. One set-based UPDATE ... FROM over the same window as
+    get_cgpa_trajectory (on SQLite < 3.33, the window is read and the changed
+    rows updated by id), run inside the caller's write transaction; only rows
+    whose value changes are written. Returns the number of rows updated.
+    """
+    params = (user_id,) + tuple(after) + tuple(keep_ids)
+    if not _UPDATE_FROM:
+        rows = cur.execute(
+            f"""SELECT t.cgpa, t.id FROM ({_RUNNING_CGPA_SQL}) AS t JOIN semesters s ON s.id = t.id
+                WHERE (t.academic_year, t.semester_num, t.id) > (?, ?, ?)
+                  AND NOT (t.id BETWEEN ? AND ? AND s.cgpa IS NOT NULL) AND s.cgpa IS NOT t.cgpa""",
+            params
+        ).fetchall()
+        cur.executemany("UPDATE semesters SET cgpa = ? WHERE id = ?", rows)
+        return len(rows)
+    cur.execute(
+        f"""UPDATE semesters SET cgpa = t.cgpa
+            FROM ({_RUNNING_CGPA_SQL}) AS t
+            WHERE semesters.id = t.id AND (t.academic_year, t.semester_num, t.id) > (?, ?, ?)
+              AND NOT (semesters.id BETWEEN ? AND ? AND semesters.cgpa IS NOT NULL)
+              AND semesters.cgpa IS NOT t.cgpa""",
+        params
+    )
+    return cur.rowcount
+
+def _refresh_user_aggregate(cur, user_id: int):
+    """Recompute a user's `user_aggregates` row inside the caller's write transaction.
+
+    Both reads are answered from idx_semesters_user_term, so this stays cheap
+    however many users the vault holds. Weighted points are integer hundredths
+    (round(gpa * 100) * total_cu), the same scaling as `CGPAAccumulator`.
+    """
+    total_cu, points100, count = cur.execute(
+        """SELECT COALESCE(SUM(total_cu), 0),
+                  COALESCE(SUM(CAST(ROUND(gpa * 100) AS INTEGER) * total_cu), 0),
+                  COUNT(*)
+           FROM semesters WHERE user_id=?""",
+        (user_id,)
+    ).fetchone()
+    latest = cur.execute(
+        """SELECT id, academic_year, semester_num FROM semesters WHERE user_id=?
+           ORDER BY academic_year DESC, semester_num DESC, id DESC LIMIT 1""",
+        (user_id,)
+    ).fetchone()
+    latest = tuple(latest) if latest else (None, None, None)
+    cur.execute(
+        """INSERT INTO user_aggregates (user_id, total_cu, points100, semester_count,
+                                        latest_semester_id, latest_year, latest_semester, data_version)
+           VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+           ON CONFLICT(user_id) DO UPDATE SET
+               total_cu=excluded.total_cu, points100=excluded.points100,
+               semester_count=excluded.semester_count, latest_semester_id=excluded.latest_semester_id,
+               latest_year=excluded.latest_year, latest_semester=excluded.latest_semester,
+               data_version=user_aggregates.data_version + 1""",
+        (user_id, total_cu, points100, count) + latest
+    )
+
+_EMPTY_AGGREGATE = {'total_cu': 0, 'points100': 0, 'semester_count': 0, 'latest_semester_id': None,
+                    'latest_year': None, 'latest_semester': None, 'data_version': 0}
+
+@_user_cached
+def get_user_aggregates(user_id: int) -> dict:
+    """Single-row read of a user's materialized totals (zeros if nothing saved yet)."""
+    with reader() as conn:
+        row = conn.execute("SELECT * FROM user_aggregates WHERE user_id=?", (user_id,)).fetchone()
+    return dict(row) if row else dict(_EMPTY_AGGREGATE, user_id=user_id)
+
+@_retrying
+def rebuild_user_aggregates() -> int:
+    """Recompute every user's aggregates from semesters; returns how many rows drifted."""
+    fields = ('total_cu', 'points100', 'semester_count', 'latest_semester_id', 'latest_year', 'latest_semester')
+    changed = 0
+    with writer() as conn:
+        cur = conn.cursor()
+        before = {r['user_id']: tuple(r[f] for f in fields) for r in cur.execute("SELECT * FROM user_aggregates")}
+        user_ids = {r[0] for r in cur.execute("SELECT DISTINCT user_id FROM semesters")} | set(before)
+        for user_id in sorted(user_ids):
+            _refresh_user_aggregate(cur, user_id)
+            row = cur.execute("SELECT * FROM user_aggregates WHERE user_id=?", (user_id,)).fetchone()
+            if before.get(user_id) != tuple(row[f] for f in fields):
+                changed += 1
+    return changed
+
+def save_semesters_bulk(semesters: Iterable[dict], user_id: int = None, scale=None) -> List[int]:
+    """Save many semesters (and their courses) in one transaction; returns the new ids.
+
+    Each item is a dict with academic_year, semester_num, total_cu, gpa and
+    optionally cgpa (computed from the user's semesters before it when None or
+    missing), courses [(name, cu, letter)] and user_id (defaults to `user_id`).
+    Ids are reserved up front under the write lock so both tables are written
+    with a single executemany each, and aggregates are refreshed once per user.
+    Every semester is graded on, and records, `scale`.
+    """
+    scale = get_scale(scale)
+    sem_rows, course_rows = [], []
+    first_terms = {}  # user_id -> earliest term written, where CGPA recompute starts
+    for sem in semesters:
+        uid = sem.get('user_id', user_id)
+        if uid is None:
+            raise ValueError("user_id is required for every semester")
+        sem_rows.append([uid, sem['academic_year'], sem['semester_num'], sem['total_cu'], sem['gpa'], sem.get('cgpa'),
+                         scale.name])
+        course_rows.append(_course_rows(sem.get('courses') or (), scale))
+        term = (sem['academic_year'], sem['semester_num'])
+        if uid not in first_terms or term < first_terms[uid]:
+            first_terms[uid] = term
+    if not sem_rows:
+        return []
+    return _write_semesters_bulk(sem_rows, course_rows, first_terms)
+
+@_retrying
+def _write_semesters_bulk(sem_rows, course_rows, first_terms) -> List[int]:
+    with writer() as conn:
+        cur = conn.cursor()
+        if not conn.in_transaction:
+            cur.execute("BEGIN IMMEDIATE")
+        next_id = cur.execute(
+            """SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name='semesters'), 0),
+                          COALESCE((SELECT MAX(id) FROM semesters), 0)) + 1"""
+        ).fetchone()[0]
+        ids = list(range(next_id, next_id + len(sem_rows)))
+        cur.executemany(
+            """INSERT INTO semesters (id, user_id, academic_year, semester_num, total_cu, gpa, cgpa, scale)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            ([sem_id] + row for sem_id, row in zip(ids, sem_rows))
+        )
+        cur.executemany(
+            "INSERT INTO courses (semester_id, name, credit_units, grade_letter, grade_points2) VALUES (?, ?, ?, ?, ?)",
+            ((sem_id,) + c for sem_id, courses in zip(ids, course_rows) for c in courses)
+        )
+        for uid, term in first_terms.items():
+            # New rows keep a CGPA they were given; the rest of the window is recomputed.
+            _recompute_cgpa(cur, uid, after=term + (0,), keep_ids=(ids[0], ids[-1]))
+            _refresh_user_aggregate(cur, uid)
+    return ids
+
+@_user_cached
 def get_semesters_for_user(user_id: int):
     """Get all semesters for a user ordered by academic year and semester."""
-    conn = get_connection()
-    try:
+    with reader() as conn:
         cur = conn.cursor()
         cur.execute(
             "SELECT * FROM semesters WHERE user_id=? ORDER BY academic_year, semester_num",
@@ -172,132 +904,396 @@ def get_semesters_for_user(user_id: int):
         )
         rows = cur.fetchall()
         return [dict(r) for r in rows]
-    finally:
-        conn.close()
 
+@_user_cached
 def get_latest_semester(user_id: int):
     """Get the latest semester for a user."""
-    conn = get_connection()
-    try:
+    with reader() as conn:
         cur = conn.cursor()
         cur.execute(
-            "SELECT * FROM semesters WHERE user_id=? ORDER BY academic_year DESC, semester_num DESC LIMIT 1",
+            """SELECT s.* FROM user_aggregates a JOIN semesters s ON s.id = a.latest_semester_id
+               WHERE a.user_id=?""",
             (user_id,)
         )
         row = cur.fetchone()
         return dict(row) if row else None
-    finally:
-        conn.close()
 
 def get_courses_for_semester(semester_id: int):
     """Get all courses for a semester."""
-    conn = get_connection()
-    try:
+    with reader() as conn:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM courses WHERE semester_id=?", (semester_id,))
+        cur.execute("SELECT * FROM courses WHERE semester_id=? ORDER BY id", (semester_id,))
         rows = cur.fetchall()
         return [dict(r) for r in rows]
-    finally:
-        conn.close()
 
-def save_scenario(user_id: int, name: str, params: dict) -> int:
-    """Save a what-if scenario."""
-    conn = get_connection()
-    try:
+def scenario_params_hash(params: dict) -> str:
+    """SHA-256 of the canonical JSON of `params` (sorted keys, no whitespace),
+    so equal parameter sets share one key whatever their key order."""
+    canonical = json.dumps(params, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def _store_result(cur, params_hash: str, fingerprint: str, result_json: str):
+    cur.execute(
+        """INSERT INTO scenario_results (params_hash, scale_fingerprint, simulator_version, result)
+           VALUES (?, ?, ?, ?)
+           ON CONFLICT(params_hash, scale_fingerprint, simulator_version) DO UPDATE SET
+               result=excluded.result, created_at=CURRENT_TIMESTAMP""",
+        (params_hash, fingerprint, SIMULATOR_VERSION, result_json)
+    )
+    # Size cap: a rowid range delete, so it stays cheap however many rows there are.
+    cur.execute("DELETE FROM scenario_results WHERE id <= (SELECT MAX(id) FROM scenario_results) - ?",
+                (SCENARIO_RESULTS_MAX_ROWS,))
+
+def get_scenario_result(params: dict, scale=None):
+    """Stored result of a simulation with exactly these `params` under `scale`, or None."""
+    with reader() as conn:
+        row = conn.execute(
+            """SELECT result FROM scenario_results
+               WHERE params_hash=? AND scale_fingerprint=? AND simulator_version=?""",
+            (scenario_params_hash(params), get_scale(scale).fingerprint, SIMULATOR_VERSION)
+        ).fetchone()
+    return json.loads(row[0]) if row else None
+
+@_retrying
+def save_scenario_result(params: dict, result, scale=None) -> str:
+    """Store a JSON-serializable simulation `result` for `params`; returns the params hash."""
+    params_hash = scenario_params_hash(params)
+    with writer() as conn:
+        _store_result(conn.cursor(), params_hash, get_scale(scale).fingerprint, json.dumps(result))
+    return params_hash
+
+def cached_scenario_result(params: dict, compute, scale=None):
+    """Return the stored result for `params`, or run `compute()` and store it.
+
+    `params` must describe everything the result depends on except the
+    grading scale and the simulator, which are keyed separately by scale
+    fingerprint and SIMULATOR_VERSION. Results come back JSON-shaped (tuples
+    become lists) whether or not they were stored. The store keeps the newest
+    SCENARIO_RESULTS_MAX_ROWS results, none older than
+    SCENARIO_RESULTS_MAX_AGE_DAYS.
+    """
+    result = get_scenario_result(params, scale)
+    if result is not None:
+        return result
+    result = json.loads(json.dumps(compute()))
+    if not get_pool().immutable:
+        save_scenario_result(params, result, scale)
+    return result
+
+@_retrying
+def purge_scenario_results() -> int:
+    """Drop stored results computed under grading scales that are no longer
+    registered or another simulator version, or older than
+    SCENARIO_RESULTS_MAX_AGE_DAYS."""
+    with writer() as conn:
+        return _purge_scenario_results(conn.cursor())
+
+def _purge_scenario_results(cur) -> int:
+    fingerprints = sorted({s.fingerprint for s in SCALES.values()})
+    cur.execute(f"""DELETE FROM scenario_results
+                    WHERE scale_fingerprint NOT IN ({', '.join('?' * len(fingerprints))})
+                       OR simulator_version != ? OR created_at < datetime('now', ?)""",
+                (*fingerprints, SIMULATOR_VERSION, f'-{SCENARIO_RESULTS_MAX_AGE_DAYS} days'))
+    return cur.rowcount
+
+def save_scenario(user_id: int, name: str, params: dict, result=None, scale=None) -> int:
+    """Save a what-if scenario (through the write queue when active).
+
+    A computed `result` is stored alongside under the params hash, so
+    reopening the scenario (or running the same simulation) reuses it.
+    """
+    return _queued_result(save_scenario_async(user_id, name, params, result, scale))
+
+def save_scenario_async(user_id: int, name: str, params: dict, result=None, scale=None) -> Future:
+    return _queued(_save_scenario, user_id, name, params, result, scale)
+
+@_retrying
+def _save_scenario(user_id: int, name: str, params: dict, result=None, scale=None) -> int:
+    params_hash = scenario_params_hash(params)
+    with writer() as conn:
         cur = conn.cursor()
         cur.execute(
-            "INSERT INTO scenarios (user_id, name, params) VALUES (?, ?, ?)",
-            (user_id, name, json.dumps(params))
+            "INSERT INTO scenarios (user_id, name, params, params_hash) VALUES (?, ?, ?, ?)",
+            (user_id, name, json.dumps(params), params_hash)
         )
-        sid = cur.lastrowid
-        conn.commit()
+        sid = cur.lastrowid  # before _store_result's own insert moves lastrowid
+        if result is not None:
+            _store_result(cur, params_hash, get_scale(scale).fingerprint, json.dumps(result))
         return sid
-    finally:
-        conn.close()
 
-def get_scenarios(user_id: int):
-    """Get all scenarios for a user."""
-    conn = get_connection()
-    try:
+def get_scenario(scenario_id: int, scale=None, decode_params: bool = True):
+    """One scenario with its stored 'result' under `scale` (None if never
+    computed, or computed under a different scale); None if it doesn't exist."""
+    with reader() as conn:
+        row = conn.execute(
+            """SELECT s.*, r.result FROM scenarios s
+               LEFT JOIN scenario_results r ON r.params_hash = s.params_hash AND r.scale_fingerprint = ?
+                                            AND r.simulator_version = ?
+               WHERE s.id = ?""",
+            (get_scale(scale).fingerprint, SIMULATOR_VERSION, scenario_id)
+        ).fetchone()
+    if row is None:
+        return None
+    scenario = dict(row)
+    if decode_params:
+        scenario['params'] = json.loads(scenario['params'])
+    if scenario['result'] is not None:
+        scenario['result'] = json.loads(scenario['result'])
+    return scenario
+
+def get_scenarios(user_id: int, decode_params: bool = True):
+    """Get all scenarios for a user (params left as JSON text unless `decode_params`)."""
+    with reader() as conn:
         cur = conn.cursor()
         cur.execute("SELECT * FROM scenarios WHERE user_id=?", (user_id,))
         rows = cur.fetchall()
         scenarios = []
         for r in rows:
             row_dict = dict(r)
-            row_dict['params'] = json.loads(row_dict['params'])
+            if decode_params:
+                row_dict['params'] = json.loads(row_dict['params'])
             scenarios.append(row_dict)
         return scenarios
-    finally:
-        conn.close()
+
+_SCENARIO_COLUMNS = ('id', 'user_id', 'name', 'params', 'params_hash', 'created_at')
+
+def _encode_cursor(kind: str, key: tuple) -> str:
+    """Opaque page cursor: the last row's sort key, tagged with what it pages."""
+    raw = json.dumps([kind, *key], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(kind: str, cursor: str, size: int) -> tuple:
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if value[0] == kind and len(value) == size + 1 and all(isinstance(v, int) for v in value[1:]):
+            return tuple(value[1:])
+    except (ValueError, TypeError, IndexError):
+        pass
+    raise ValueError("Invalid cursor")
+
+def _select_fields(fields, allowed: tuple, key: tuple) -> Tuple[list, list]:
+    """(requested fields, columns to select): sort-key columns are always read."""
+    fields = list(allowed) if fields is None else list(fields)
+    unknown = [f for f in fields if f not in allowed]
+    if unknown or not fields:
+        raise ValueError(f"Unknown or empty fields: {', '.join(unknown)} (expected any of {', '.join(allowed)})")
+    return fields, list(dict.fromkeys(list(key) + fields))
+
+def _page(sql_select: str, where: list, params: list, order: tuple, kind: str, cursor: str,
+          limit: int, fields: list, columns: list, decode=None) -> dict:
+    """Run one keyset page: rows after `cursor` in `order`, plus the next cursor."""
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    if cursor:
+        key = _decode_cursor(kind, cursor, len(order))
+        where = where + [f"({', '.join(order)}) > ({', '.join('?' * len(order))})"]
+        params = params + list(key)
+    sql = (f"SELECT {', '.join(columns)} FROM {sql_select}"
+           + (f" WHERE {' AND '.join(where)}" if where else '')
+           + f" ORDER BY {', '.join(order)} LIMIT ?")
+    with reader() as conn:
+        rows = conn.execute(sql, params + [limit + 1]).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    items = []
+    for r in rows:
+        item = {f: r[f] for f in fields}
+        if decode:
+            decode(item)
+        items.append(item)
+    next_cursor = _encode_cursor(kind, tuple(rows[-1][c] for c in order)) if more else None
+    return {'items': items, 'next_cursor': next_cursor}
+
+def get_semesters_page(user_id: int = None, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE,
+                       fields: Iterable[str] = None) -> dict:
+    """One page of semesters, in (academic_year, semester_num, id) order.
+
+    Returns {'items', 'next_cursor'}; pass `next_cursor` back for the next page
+    (None on the last). Without `user_id` it pages every user's semesters
+    (ordered by user first), for admin views. `fields` limits the returned
+    columns. Each page is one range seek on idx_semesters_user_term_id, which
+    is in exactly this order, so no sort step runs however long the history.
+    """
+    fields, columns = _select_fields(fields, _SEMESTER_COLUMNS,
+                                     ('academic_year', 'semester_num', 'id') + (('user_id',) if user_id is None else ()))
+    if user_id is None:
+        return _page('semesters', [], [], ('user_id', 'academic_year', 'semester_num', 'id'),
+                     'semesters:all', cursor, limit, fields, columns)
+    return _page('semesters', ['user_id = ?'], [user_id], ('academic_year', 'semester_num', 'id'),
+                 f'semesters:{user_id}', cursor, limit, fields, columns)
+
+def _decode_params(item: dict):
+    if 'params' in item:
+        item['params'] = json.loads(item['params'])
+
+def get_scenarios_page(user_id: int = None, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE,
+                       fields: Iterable[str] = None) -> dict:
+    """One page of scenarios in id order (all users' without `user_id`).
+
+    Same contract as `get_semesters_page`; params are only decoded when
+    selected.
+    """
+    fields, columns = _select_fields(fields, _SCENARIO_COLUMNS, ('id',))
+    where, params = (['user_id = ?'], [user_id]) if user_id is not None else ([], [])
+    kind = f'scenarios:{user_id}' if user_id is not None else 'scenarios:all'
+    return _page('scenarios', where, params, ('id',), kind, cursor, limit, fields, columns, _decode_params)
 
 def calculate_current_cgpa(user_id: int) -> float:
     """Calculate cumulative CGPA from all semesters."""
-    semesters = get_semesters_for_user(user_id)
-    if not semesters:
-        return 0.0
-    
-    total_gpa_weighted = 0.0
-    total_cu = 0
-    for sem in semesters:
-        total_gpa_weighted += sem['gpa'] * sem['total_cu']
-        total_cu += sem['total_cu']
-    
-    cgpa = total_gpa_weighted / total_cu if total_cu > 0 else 0.0
-    from .utils import truncate
-    return truncate(cgpa, 2)
+    agg = get_user_aggregates(user_id)
+    return CGPAAccumulator.from_totals(agg['points100'], agg['total_cu']).cgpa
 
 def calculate_current_cgpa_with_new_semester(user_id: int, new_gpa: float, new_cu: int) -> float:
     """Calculate CGPA if a new semester is added (preview calculation)."""
-    semesters = get_semesters_for_user(user_id)
-    
-    total_gpa_weighted = new_gpa * new_cu
-    total_cu = new_cu
-    
-    for sem in semesters:
-        total_gpa_weighted += sem['gpa'] * sem['total_cu']
-        total_cu += sem['total_cu']
-    
-    cgpa = total_gpa_weighted / total_cu if total_cu > 0 else 0.0
-    from .utils import truncate
-    return truncate(cgpa, 2)
+    agg = get_user_aggregates(user_id)
+    return CGPAAccumulator.from_totals(agg['points100'], agg['total_cu']).preview(new_gpa, new_cu)
+
+# Running totals in term order; points100 matches _refresh_user_aggregate's scaling.
+_TRAJECTORY_SQL = """
+    SELECT id, user_id, academic_year, semester_num, total_cu, gpa, cgpa AS stored_cgpa,
+           SUM(total_cu) OVER w AS cumulative_cu,
+           cgpa_trunc(SUM(CAST(ROUND(gpa * 100) AS INTEGER) * total_cu) OVER w, SUM(total_cu) OVER w) AS cgpa
+    FROM semesters WHERE {where}
+    WINDOW w AS (PARTITION BY user_id ORDER BY academic_year, semester_num, id ROWS UNBOUNDED PRECEDING)
+    ORDER BY user_id, academic_year, semester_num, id
+"""
+
+@_user_cached
+def get_cgpa_trajectory(user_id: int) -> List[dict]:
+    """A user's semesters in term order with the running CGPA computed in SQL.
+
+    `cgpa` is the cumulative CGPA up to each semester (window sums over
+    idx_semesters_user_term); `stored_cgpa` is the value saved with the row.
+    """
+    with reader() as conn:
+        rows = conn.execute(_TRAJECTORY_SQL.format(where='user_id = ?'), (user_id,)).fetchall()
+    return [dict(r) for r in rows]
+
+# compute_gpa over course rows, done in SQL. Courses with unknown letters (NULL points) are left out.
+_COURSE_GPA_SUMS = """COALESCE(SUM(c.credit_units), 0) AS total_cu,
+                      COALESCE(SUM(c.credit_units * c.grade_points2), 0) AS points2,
+                      gpa_round(SUM(c.credit_units * c.grade_points2), SUM(c.credit_units)) AS gpa"""
+
+def get_course_gpa_by_semester(user_id: int) -> List[dict]:
+    """Per-semester GPA computed from course rows (semesters without courses are omitted)."""
+    with reader() as conn:
+        rows = conn.execute(
+            f"""SELECT s.id AS semester_id, s.academic_year, s.semester_num, {_COURSE_GPA_SUMS}
+                FROM semesters s JOIN courses c ON c.semester_id = s.id
+                WHERE s.user_id = ? AND c.grade_points2 IS NOT NULL
+                GROUP BY s.id ORDER BY s.academic_year, s.semester_num, s.id""",
+            (user_id,)
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+def get_course_gpa_for_user(user_id: int) -> dict:
+    """GPA over every course a user has saved, as if taken in one semester."""
+    with reader() as conn:
+        row = conn.execute(
+            f"""SELECT {_COURSE_GPA_SUMS}
+                FROM semesters s JOIN courses c ON c.semester_id = s.id
+                WHERE s.user_id = ? AND c.grade_points2 IS NOT NULL""",
+            (user_id,)
+        ).fetchone()
+    return dict(row, user_id=user_id)
+
+def get_cohort_gpa(program: str = None, academic_year: int = None, semester_num: int = None,
+                   scale=None) -> List[dict]:
+    """Course-level GPA per (program, academic_year, semester_num) cohort, with student counts.
+
+    Only semesters graded on `scale` (default grading scale when omitted) are
+    counted, since grade points from different scales don't add up.
+    """
+    where, params = ['c.grade_points2 IS NOT NULL', 's.scale = ?'], [get_scale(scale).name]
+    for column, value in (('u.program', program), ('s.academic_year', academic_year),
+                          ('s.semester_num', semester_num)):
+        if value is not None:
+            where.append(f'{column} = ?')
+            params.append(value)
+    with reader() as conn:
+        rows = conn.execute(
+            f"""SELECT u.program, s.academic_year, s.semester_num,
+                       COUNT(DISTINCT s.user_id) AS students, {_COURSE_GPA_SUMS}
+                FROM semesters s
+                JOIN users u ON u.id = s.user_id
+                JOIN courses c ON c.semester_id = s.id
+                WHERE {' AND '.join(where)}
+                GROUP BY u.program, s.academic_year, s.semester_num
+                ORDER BY u.program, s.academic_year, s.semester_num""",
+            params
+        ).fetchall()
+    return [dict(r) for r in rows]
 
 def get_total_cu_completed(user_id: int) -> int:
     """Get total credit units completed across all semesters for a user."""
-    semesters = get_semesters_for_user(user_id)
-    return sum(sem['total_cu'] for sem in semesters)
+    return get_user_aggregates(user_id)['total_cu']
 
+@_user_cached
 def get_semesters_summary(user_id: int):
     """Get a summary of all semesters for a user (for quick display and loading).
     
     Returns list of dicts with: {id, year, semester, gpa, cgpa, cu, course_count}
     """
-    semesters = get_semesters_for_user(user_id)
-    summary = []
-    for sem in semesters:
-        courses = get_courses_for_semester(sem['id'])
-        summary.append({
-            'id': sem['id'],
-            'academic_year': sem['academic_year'],
-            'semester_num': sem['semester_num'],
-            'gpa': sem['gpa'],
-            'cgpa': sem['cgpa'],
-            'total_cu': sem['total_cu'],
-            'course_count': len(courses) if courses else 0
-        })
-    return summary
+    with reader() as conn:
+        cur = conn.execute(
+            """SELECT s.id, s.academic_year, s.semester_num, s.gpa, s.cgpa, s.total_cu,
+                      COUNT(c.id) AS course_count
+               FROM semesters s LEFT JOIN courses c ON c.semester_id = s.id
+               WHERE s.user_id=?
+               GROUP BY s.id
+               ORDER BY s.academic_year, s.semester_num, s.id""",
+            (user_id,)
+        )
+        return [dict(r) for r in cur.fetchall()]
+
+_SEMESTER_COLUMNS = ('id', 'user_id', 'academic_year', 'semester_num', 'total_cu', 'gpa', 'cgpa', 'created_at',
+                     'scale')
+_COURSE_COLUMNS = ('id', 'semester_id', 'name', 'credit_units', 'grade_letter', 'grade_points2')
 
+def _semesters_with_courses(conn, where: str, params: tuple, order: str):
+    """Yield semester dicts (with a 'courses' list) from one ordered LEFT JOIN."""
+    sem_cols = ', '.join(f's.{c}' for c in _SEMESTER_COLUMNS)
+    course_cols = ', '.join(f'c.{c}' for c in _COURSE_COLUMNS)
+    cur = conn.execute(
+        f"""SELECT {sem_cols}, {course_cols}
+            FROM semesters s LEFT JOIN courses c ON c.semester_id = s.id
+            WHERE {where}
+            ORDER BY {order}, c.id""",
+        params
+    )
+    n = len(_SEMESTER_COLUMNS)
+    for _sem_id, rows in groupby(cur, key=lambda r: r[0]):
+        first = next(rows)
+        sem = dict(zip(_SEMESTER_COLUMNS, first[:n]))
+        courses = [] if first[n] is None else [dict(zip(_COURSE_COLUMNS, first[n:]))]
+        courses.extend(dict(zip(_COURSE_COLUMNS, r[n:])) for r in rows)
+        sem['courses'] = courses
+        yield sem
+
+def iter_transcript(user_id: int):
+    """Stream a user's semesters in order, each with its courses under 'courses'.
+
+    One query replaces a get_courses_for_semester call per semester. The
+    pooled connection is held until the generator is exhausted or closed.
+    """
+    with reader() as conn:
+        yield from _semesters_with_courses(
+            conn, 's.user_id=?', (user_id,), 's.academic_year, s.semester_num, s.id')
+
+@_user_cached
 def get_last_complete_semester_data(user_id: int) -> dict:
     """Get the most recently saved semester with all its courses.
     
     Returns: {id, academic_year, semester_num, gpa, cgpa, total_cu, courses: [...]}
     Or None if no semesters exist.
     """
-    latest = get_latest_semester(user_id)
+    with reader() as conn:
+        latest = next(_semesters_with_courses(
+            conn,
+            "s.id = (SELECT latest_semester_id FROM user_aggregates WHERE user_id=?)",
+            (user_id,), 's.id'), None)
     if not latest:
         return None
-    
-    courses = get_courses_for_semester(latest['id'])
     return {
         'id': latest['id'],
         'academic_year': latest['academic_year'],
@@ -305,5 +1301,5 @@ def get_last_complete_semester_data(user_id: int) -> dict:
         'gpa': latest['gpa'],
         'cgpa': latest['cgpa'],
         'total_cu': latest['total_cu'],
-        'courses': courses if courses else []
+        'courses': latest['courses']
     }
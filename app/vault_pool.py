@@ -0,0 +1,260 @@
+"""Pooled SQLite connections for the vault.
+
+One writer connection (serialized by a lock) and up to N read-only reader
+connections (`mode=ro`). PRAGMAs run once when a connection is opened, and a
+thread that nests `reader()`/`writer()` blocks reuses the connection it
+already holds. Reads inside a `writer()` block go through the writer so they
+see the transaction's own changes. A separate watcher connection answers
+`data_version()` for cache invalidation.
+
+`timeout` bounds both SQLite's busy handler and the wait for the in-process
+writer lock; either way the caller gets "database is locked" and can retry
+(see `vault_retry`). Read-only connections use `read_timeout` (default
+`timeout`) instead, since reads are usually not retried. With `immutable` the pool only opens readers
+(`immutable=1`: no locking or change detection, for databases nothing
+writes to while the pool is open) and `writer()` is refused.
+
+A path of ':memory:' or 'memory:NAME' selects a shared-cache in-memory
+database that lives as long as the pool's writer connection. Shared-cache
+readers fail with SQLITE_LOCKED (not busy-wait) while a write is open, so in
+that mode reads go through the writer under its lock. Reads wait for the
+lock as long as it takes (writes are short); long reads such as a backup
+call `yield_writer()` between steps so writers and other reads get a turn.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+from urllib.request import pathname2url
+
+MEMORY_PREFIX = 'memory:'
+
+
+def is_memory_path(path: str) -> bool:
+    return path == ':memory:' or path.startswith(MEMORY_PREFIX)
+
+
+class ConnectionPool:
+    """Process-local pool: one writer, `readers` read-only connections."""
+
+    def __init__(self, path: str, readers: int = 4, timeout: float = 5.0, init=None,
+                 immutable: bool = False, read_timeout: float = None):
+        if readers < 1:
+            raise ValueError("readers must be >= 1")
+        self.path = path
+        self.pid = os.getpid()
+        self.max_readers = readers
+        self.timeout = timeout
+        self.read_timeout = timeout if read_timeout is None else read_timeout
+        self.immutable = immutable
+        self.memory = is_memory_path(path)
+        if self.memory and immutable:
+            raise ValueError("an in-memory vault cannot be immutable")
+        # Called with every new connection, e.g. to register SQL functions.
+        self.init = init
+        self._writer = None
+        self._writer_lock = threading.RLock()
+        self._free = []
+        self._free_lock = threading.Lock()
+        self._reader_slots = threading.BoundedSemaphore(readers)
+        self._local = threading.local()
+        self._watch = None
+        self._watch_lock = threading.Lock()
+        self._closed = False
+        self._stats = {'opened': 0, 'reads': 0, 'writes': 0, 'reused': 0,
+                       'commits': 0, 'rollbacks': 0, 'reader_waits': 0, 'version_checks': 0,
+                       'writer_lock_timeouts': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def _memory_uri(self) -> str:
+        name = 'vault' if self.path == ':memory:' else self.path[len(MEMORY_PREFIX):]
+        return f"file:{quote(name, safe='')}?mode=memory&cache=shared"
+
+    def _open(self, readonly: bool) -> sqlite3.Connection:
+        timeout = self.read_timeout if readonly else self.timeout
+        if self.memory:
+            conn = sqlite3.connect(self._memory_uri(), uri=True, timeout=timeout, check_same_thread=False)
+            if readonly:
+                conn.execute("PRAGMA query_only = 1;")
+        elif readonly:
+            uri = 'file:' + pathname2url(os.path.abspath(self.path)) + '?mode=ro'
+            if self.immutable:
+                uri += '&immutable=1'
+            conn = sqlite3.connect(uri, uri=True, timeout=timeout, check_same_thread=False)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=timeout, check_same_thread=False)
+            # journal_mode is persistent in the file, so only the writer sets it.
+            conn.execute("PRAGMA journal_mode=WAL;")
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(timeout * 1000)};")
+        if self.init is not None:
+            self.init(conn)
+        self._count('opened')
+        return conn
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a standalone read-write connection outside the pool (caller closes it)."""
+        if self.immutable:
+            return self._open(readonly=True)
+        return self._open(readonly=False)
+
+    def _get_writer(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("connection pool is closed")
+        if self.immutable:
+            raise sqlite3.OperationalError("attempt to write a readonly database (immutable vault)")
+        if self._writer is None:
+            self._writer = self._open(readonly=False)
+        return self._writer
+
+    @contextmanager
+    def writer(self):
+        """Yield the writer connection inside a transaction.
+
+        The outermost block commits on success and rolls back on error; nested
+        blocks in the same thread join the enclosing transaction. Raises
+        sqlite3.OperationalError if another thread holds the writer longer
+        than `timeout`.
+        """
+        if not self._writer_lock.acquire(timeout=self.timeout):
+            self._count('writer_lock_timeouts')
+            raise sqlite3.OperationalError("database is locked (writer busy in this process)")
+        try:
+            local = self._local
+            depth = getattr(local, 'writer_depth', 0)
+            conn = self._get_writer()
+            local.writer_depth = depth + 1
+            self._count('writes')
+            try:
+                yield conn
+                if depth == 0:
+                    conn.commit()
+                    self._count('commits')
+            except BaseException:
+                if depth == 0:
+                    conn.rollback()
+                    self._count('rollbacks')
+                raise
+            finally:
+                local.writer_depth = depth
+        finally:
+            self._writer_lock.release()
+
+    @contextmanager
+    def reader(self):
+        """Yield a read-only connection (or the writer inside a write block)."""
+        local = self._local
+        self._count('reads')
+        if getattr(local, 'writer_depth', 0):
+            yield self._writer
+            return
+        conn = getattr(local, 'reader', None)
+        if conn is not None:
+            self._count('reused')
+            yield conn
+            return
+        if self.memory:
+            # Reads don't time out here: nothing would retry them.
+            with self._writer_lock:
+                conn = self._get_writer()
+                local.reader = conn
+                try:
+                    yield conn
+                finally:
+                    local.reader = None
+            return
+        if not self._reader_slots.acquire(blocking=False):
+            self._count('reader_waits')
+            self._reader_slots.acquire()
+        try:
+            with self._free_lock:
+                conn = self._free.pop() if self._free else None
+            if conn is None:
+                # The database file (and its WAL) must exist before a mode=ro open.
+                if not self.immutable:
+                    with self._writer_lock:
+                        self._get_writer()
+                conn = self._open(readonly=True)
+            else:
+                self._count('reused')
+            local.reader = conn
+            try:
+                yield conn
+            finally:
+                local.reader = None
+                if self._closed:
+                    conn.close()
+                else:
+                    with self._free_lock:
+                        self._free.append(conn)
+        finally:
+            self._reader_slots.release()
+
+    def yield_writer(self, pause: float = 0.001):
+        """Let other threads use the writer for `pause` seconds.
+
+        For long reads in memory mode, which hold the writer lock; call it
+        between steps, outside any transaction. Elsewhere it only sleeps.
+        """
+        if not self.memory or self.in_writer() or getattr(self._local, 'reader', None) is None:
+            time.sleep(pause)
+            return
+        self._writer_lock.release()
+        try:
+            time.sleep(pause)
+        finally:
+            self._writer_lock.acquire()
+
+    def in_writer(self) -> bool:
+        """True while the calling thread is inside a `writer()` block."""
+        return getattr(self._local, 'writer_depth', 0) > 0
+
+    def data_version(self) -> int:
+        """`PRAGMA data_version` of the watcher connection.
+
+        It changes whenever any other connection commits, including this pool's
+        writer and other processes, and costs no table reads.
+        """
+        with self._watch_lock:
+            if self._watch is None:
+                if self._closed:
+                    raise RuntimeError("connection pool is closed")
+                if not self.immutable:
+                    with self._writer_lock:
+                        self._get_writer()
+                self._watch = self._open(readonly=True)
+            self._count('version_checks')
+            return self._watch.execute("PRAGMA data_version").fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            out = dict(self._stats)
+        with self._free_lock:
+            out['idle_readers'] = len(self._free)
+        out['max_readers'] = self.max_readers
+        out['path'] = self.path
+        out['memory'] = self.memory
+        return out
+
+    def close(self):
+        self._closed = True
+        with self._free_lock:
+            free, self._free = self._free, []
+        for conn in free:
+            conn.close()
+        with self._watch_lock:
+            if self._watch is not None:
+                self._watch.close()
+                self._watch = None
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
@@ -0,0 +1,187 @@
+"""Group-commit write queue for the vault.
+
+Callers submit write operations and get a `Future`; one worker thread drains
+the queue, runs everything that arrived within `max_delay` seconds (up to
+`max_batch` operations) in a single transaction and then resolves the
+futures. Each operation runs under its own SAVEPOINT, so one failing
+operation is rolled back and reported without failing the rest of its batch.
+If `retry` is given, the batch transaction runs through it, so a batch that
+hits a busy database is rolled back and re-run as a whole. Callers should
+wait with `wait()`, which gives up if the worker stops; if the worker exits
+for any reason, operations still queued fail instead of hanging.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Callable
+
+_STOP = object()
+
+
+class WriteQueue:
+    """Single-threaded batching writer. `writer` is a context manager factory
+    yielding a connection inside a transaction (e.g. `vault_manager.writer`);
+    `retry(fn)` optionally wraps each batch (e.g. `RetryPolicy.call`)."""
+
+    def __init__(self, writer: Callable, max_batch: int = 64, max_delay: float = 0.005,
+                 maxsize: int = 10000, retry: Callable = None):
+        if max_batch < 1 or max_delay < 0:
+            raise ValueError("max_batch must be >= 1 and max_delay >= 0")
+        self._writer = writer
+        self._retry = retry
+        self.pid = os.getpid()
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue(maxsize)
+        self._stats = {'submitted': 0, 'batches': 0, 'ops': 0, 'failed_ops': 0,
+                       'failed_batches': 0, 'largest_batch': 0}
+        self._stats_lock = threading.Lock()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='vault-write-queue', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue `fn(*args, **kwargs)` to run inside the next batch transaction."""
+        if self._stopped:
+            raise RuntimeError("write queue is stopped")
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        with self._stats_lock:
+            self._stats['submitted'] += 1
+        return future
+
+    def in_worker(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def alive(self) -> bool:
+        """True while the worker accepts and runs operations."""
+        return not self._stopped and self._thread.is_alive()
+
+    def wait(self, future: Future, timeout: float):
+        """`future.result()`, but raise TimeoutError after `timeout` seconds and
+        RuntimeError as soon as the worker is gone with the future unresolved."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return future.result(timeout=max(0.0, min(0.1, deadline - time.monotonic())))
+            except FutureTimeout:
+                if not self._thread.is_alive() and not future.done():
+                    raise RuntimeError("write queue worker stopped before running the operation") from None
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"write queue did not finish the operation within {timeout:g}s") from None
+
+    def stop(self, timeout: float = None):
+        """Run everything already queued, then stop the worker thread."""
+        if not self._stopped:
+            self._stopped = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            out = dict(self._stats)
+        out['pending'] = self._queue.qsize()
+        out['avg_batch'] = round(out['ops'] / out['batches'], 2) if out['batches'] else 0.0
+        return out
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is _STOP:
+                break
+        return batch
+
+    def _run(self):
+        ops = []
+        try:
+            while True:
+                batch = self._collect(self._queue.get())
+                stop = batch[-1] is _STOP
+                ops = [item for item in batch if item is not _STOP]
+                if ops:
+                    self._run_batch(ops)
+                if stop:
+                    return
+        finally:
+            self._stopped = True
+            self._fail_pending(ops)
+
+    def _fail_pending(self, ops: list):
+        """Fail futures the worker won't resolve: those of a batch it died in
+        and whatever is still queued (e.g. submitted just before stop)."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                ops.append(item)
+        error = RuntimeError("write queue is stopped")
+        for future, *_ in ops:
+            if future.done():
+                continue
+            if future.running() or future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+    def _run_batch(self, ops: list):
+        ops = [op for op in ops if op[0].set_running_or_notify_cancel()]
+        if not ops:
+            return
+        try:
+            if self._retry is not None:
+                outcomes = self._retry(self._transaction, ops)
+            else:
+                outcomes = self._transaction(ops)
+        except Exception as e:
+            # The commit (or BEGIN) failed: nothing in this batch was saved.
+            for future, *_ in ops:
+                future.set_exception(e)
+            with self._stats_lock:
+                self._stats['failed_batches'] += 1
+                self._stats['failed_ops'] += len(ops)
+            return
+        failed = 0
+        for (future, *_), (ok, value) in zip(ops, outcomes):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+                failed += 1
+        with self._stats_lock:
+            self._stats['batches'] += 1
+            self._stats['ops'] += len(ops)
+            self._stats['failed_ops'] += failed
+            self._stats['largest_batch'] = max(self._stats['largest_batch'], len(ops))
+
+    def _transaction(self, ops: list) -> list:
+        """Run `ops` in one transaction; returns (ok, result or exception) per op.
+
+        Futures are only resolved after the commit, so a retried batch never
+        reports results from a rolled-back attempt.
+        """
+        outcomes = []
+        with self._writer() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            for future, fn, args, kwargs in ops:
+                conn.execute("SAVEPOINT queued_op")
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO queued_op")
+                    conn.execute("RELEASE queued_op")
+                    outcomes.append((False, e))
+                else:
+                    conn.execute("RELEASE queued_op")
+                    outcomes.append((True, result))
+        return outcomes
@@ -0,0 +1,172 @@
+"""Vault-wide integrity check and repair.
+
+Semester GPAs and credit-unit totals are recomputed from their course rows,
+each course's stored grade_points2 from its letter (under the grading scale
+recorded on its semester), and running CGPAs from
+the corrected GPAs and totals, all with SQL aggregation (`gpa_round`/
+`cgpa_trunc` give the same results as the Python calculators). Users are
+processed in id-ordered chunks: each chunk is checked with a short read, and
+its corrections are written in one short transaction, so the job can run
+against a live vault without holding the write lock for long.
+"""
+
+import csv
+from typing import Optional, TextIO
+
+from . import vault_manager as vault
+from .grading import SCALES, get_scale
+
+DEFAULT_CHUNK_USERS = 500
+
+REPORT_FIELDS = ('user_id', 'semester_id', 'academic_year', 'semester_num', 'field', 'stored', 'computed',
+                 'course_id')
+
+
+def _scale_filter(scales) -> str:
+    return f"s.scale IN ({', '.join(vault._sql_text(s.name) for s in scales)})"
+
+
+def _check_sql(scales) -> str:
+    """Semester discrepancies for a user id range: course-derived total CU and
+    GPA for semesters graded on one of `scales`, then CGPA over the corrected
+    values of all of them."""
+    # Map letters directly rather than trusting grade_points2, so hand-edited letters are caught.
+    points2 = vault._scaled_points2_case('c.grade_letter', 's.scale', scales)
+    return f"""
+        WITH from_courses AS (
+            SELECT c.semester_id,
+                   SUM(({points2}) IS NULL) AS invalid,
+                   SUM(c.credit_units) AS total_cu,
+                   CASE WHEN SUM(({points2}) IS NULL) = 0
+                        THEN gpa_round(SUM(c.credit_units * ({points2})), SUM(c.credit_units)) END AS gpa
+            FROM semesters s JOIN courses c ON c.semester_id = s.id
+            WHERE s.user_id BETWEEN :lo AND :hi AND {_scale_filter(scales)}
+            GROUP BY c.semester_id
+        ), resolved AS (
+            SELECT s.id, s.user_id, s.academic_year, s.semester_num,
+                   s.total_cu AS stored_total_cu, COALESCE(f.total_cu, s.total_cu) AS total_cu,
+                   s.gpa AS stored_gpa, s.cgpa AS stored_cgpa, COALESCE(f.invalid, 0) AS invalid,
+                   CASE WHEN f.invalid = 0 THEN f.gpa ELSE s.gpa END AS gpa
+            FROM semesters s LEFT JOIN from_courses f ON f.semester_id = s.id
+            WHERE s.user_id BETWEEN :lo AND :hi
+        ), checked AS (
+            SELECT *, cgpa_trunc(COALESCE(SUM(CAST(ROUND(gpa * 100) AS INTEGER) * total_cu) OVER w, 0),
+                                 SUM(total_cu) OVER w) AS cgpa
+            FROM resolved
+            WINDOW w AS (PARTITION BY user_id ORDER BY academic_year, semester_num, id ROWS UNBOUNDED PRECEDING)
+        )
+        SELECT * FROM checked
+        WHERE invalid > 0 OR stored_total_cu IS NOT total_cu OR stored_gpa IS NOT gpa OR stored_cgpa IS NOT cgpa
+        ORDER BY user_id, academic_year, semester_num, id"""
+
+
+def _course_check_sql(scales) -> str:
+    """Course rows in a user id range whose grade_points2 disagrees with their
+    letter under their semester's scale (one of `scales`)."""
+    points2 = vault._scaled_points2_case('c.grade_letter', 's.scale', scales)
+    return f"""
+        SELECT c.id AS course_id, c.grade_letter, c.grade_points2 AS stored, ({points2}) AS computed,
+               s.id, s.user_id, s.academic_year, s.semester_num
+        FROM semesters s JOIN courses c ON c.semester_id = s.id
+        WHERE s.user_id BETWEEN :lo AND :hi AND {_scale_filter(scales)} AND c.grade_points2 IS NOT ({points2})
+        ORDER BY s.user_id, s.academic_year, s.semester_num, s.id, c.id"""
+
+
+def _user_chunks(chunk_users: int):
+    """Yield (first, last, count) user id ranges covering every user with semesters."""
+    last = 0
+    while True:
+        with vault.reader() as conn:
+            ids = [r[0] for r in conn.execute(
+                "SELECT DISTINCT user_id FROM semesters WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                (last, chunk_users)
+            )]
+        if not ids:
+            return
+        yield ids[0], ids[-1], len(ids)
+        last = ids[-1]
+
+
+def _write_fixes(fixes: list, course_fixes: list, users: list) -> tuple:
+    """Apply one chunk's corrections in a single transaction; returns
+    (semester rows, course rows) updated."""
+    with vault.writer() as conn:
+        cur = conn.cursor()
+        # Only overwrite rows nobody changed since the chunk was read.
+        cur.executemany("UPDATE courses SET grade_points2=? WHERE id=? AND grade_points2 IS ? AND grade_letter IS ?",
+                        course_fixes)
+        fixed_courses = cur.rowcount if course_fixes else 0
+        cur.executemany("""UPDATE semesters SET total_cu=?, gpa=?, cgpa=?
+                           WHERE id=? AND total_cu IS ? AND gpa IS ? AND cgpa IS ?""", fixes)
+        fixed = cur.rowcount if fixes else 0
+        # Also bumps each user's data_version, so cached reads reload.
+        for user_id in users:
+            vault._refresh_user_aggregate(cur, user_id)
+    return fixed, fixed_courses
+
+
+def repair_vault(dry_run: bool = False, chunk_users: int = DEFAULT_CHUNK_USERS, scale=None,
+                 report: Optional[TextIO] = None) -> dict:
+    """Check (and unless `dry_run`, fix) stored semester totals, GPAs and CGPAs
+    and course grade points.
+
+    Semesters with course rows get their total_cu and GPA recomputed from
+    them under the grading scale recorded on the semester; semesters with
+    unknown grade letters are reported as 'invalid_grade' and keep their GPA.
+    Course grade_points2 values that disagree with their letter are reported
+    as 'grade_points2' (with the course id). With `scale`, only semesters
+    graded on that scale are recomputed from their courses; otherwise every
+    semester on a registered scale is (others keep their stored values). Stored CGPAs are compared with the running CGPA
+    over the corrected values. Every discrepancy is written to `report` as CSV
+    if given. A fix is skipped if the row changed after the chunk was read
+    (live saves recompute their own CGPAs). Returns counts of users, chunks,
+    total_cu, gpa, cgpa, invalid_grade and grade_points2 discrepancies, and of
+    fixed, fixed_courses and skipped rows.
+    """
+    scales = [get_scale(scale)] if scale is not None else list(SCALES.values())
+    if chunk_users < 1:
+        raise ValueError("chunk_users must be >= 1")
+    check_sql = _check_sql(scales)
+    course_sql = _course_check_sql(scales)
+    out = csv.writer(report) if report is not None else None
+    if out:
+        out.writerow(REPORT_FIELDS)
+    counts = {'users': 0, 'chunks': 0, 'total_cu': 0, 'gpa': 0, 'cgpa': 0, 'invalid_grade': 0,
+              'grade_points2': 0, 'fixed': 0, 'fixed_courses': 0, 'skipped': 0}
+
+    def record(r, field, stored, computed, course_id=None):
+        counts[field] += 1
+        if out:
+            out.writerow((r['user_id'], r['id'], r['academic_year'], r['semester_num'], field, stored, computed,
+                          course_id))
+
+    for lo, hi, n_users in _user_chunks(chunk_users):
+        counts['chunks'] += 1
+        counts['users'] += n_users
+        with vault.reader() as conn:
+            courses = conn.execute(course_sql, {'lo': lo, 'hi': hi}).fetchall()
+            rows = conn.execute(check_sql, {'lo': lo, 'hi': hi}).fetchall()
+        for c in courses:
+            record(c, 'grade_points2', c['stored'], c['computed'], c['course_id'])
+        for r in rows:
+            if r['stored_total_cu'] != r['total_cu']:
+                record(r, 'total_cu', r['stored_total_cu'], r['total_cu'])
+            if r['invalid']:
+                record(r, 'invalid_grade', r['stored_gpa'], None)
+            elif r['stored_gpa'] != r['gpa']:
+                record(r, 'gpa', r['stored_gpa'], r['gpa'])
+            if r['stored_cgpa'] != r['cgpa']:
+                record(r, 'cgpa', r['stored_cgpa'], r['cgpa'])
+        changed = [r for r in rows if (r['stored_total_cu'], r['stored_gpa'], r['stored_cgpa'])
+                   != (r['total_cu'], r['gpa'], r['cgpa'])]
+        fixes = [(r['total_cu'], r['gpa'], r['cgpa'], r['id'], r['stored_total_cu'], r['stored_gpa'],
+                  r['stored_cgpa']) for r in changed]
+        course_fixes = [(c['computed'], c['course_id'], c['stored'], c['grade_letter']) for c in courses]
+        if dry_run or not (fixes or course_fixes):
+            continue
+        users = sorted({r['user_id'] for r in changed})
+        fixed, fixed_courses = vault._retry.call(_write_fixes, fixes, course_fixes, users)
+        counts['fixed'] += fixed
+        counts['fixed_courses'] += fixed_courses
+        counts['skipped'] += len(fixes) - fixed + len(course_fixes) - fixed_courses
+    return counts
@@ -0,0 +1,119 @@
+"""Bounded retry of vault operations that hit a locked database.
+
+Connections use a short `busy_timeout`, so SQLite gives up quickly when
+another connection (or process) holds the write lock. `RetryPolicy.call`
+then re-runs the whole operation after a jittered exponential backoff until
+the operation's deadline passes, and raises `VaultBusyError` instead of
+letting one stuck writer stall every caller for half a minute. Retries and
+the time spent waiting on locks are counted for `stats()`.
+"""
+
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Result codes of "database is locked" / "database table is locked".
+_SQLITE_BUSY = 5
+_SQLITE_LOCKED = 6
+
+
+class VaultBusyError(sqlite3.OperationalError):
+    """The vault stayed locked for the whole operation deadline."""
+
+
+def is_busy(error: BaseException) -> bool:
+    """True for SQLITE_BUSY / SQLITE_LOCKED errors (including extended codes)."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xFF in (_SQLITE_BUSY, _SQLITE_LOCKED)
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class RetryPolicy:
+    """Retry busy errors with full-jitter exponential backoff within a deadline.
+
+    Attempt n (from 0) sleeps a random time in [0, min(max_delay, base_delay * 2**n)],
+    never past the deadline. The deadline can be tightened per thread with
+    `deadline()`, e.g. for request handlers.
+    """
+
+    def __init__(self, deadline: float = 5.0, base_delay: float = 0.005, max_delay: float = 0.25):
+        if deadline <= 0 or base_delay <= 0 or max_delay < base_delay:
+            raise ValueError("deadline and base_delay must be > 0 and max_delay >= base_delay")
+        self.deadline_seconds = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._local = threading.local()
+        self._stats = {'operations': 0, 'retried_operations': 0, 'retries': 0, 'gave_up': 0,
+                       'lock_wait_seconds': 0.0, 'max_lock_wait_seconds': 0.0}
+        self._stats_lock = threading.Lock()
+
+    @contextmanager
+    def deadline(self, seconds: float):
+        """Run the enclosed operations with a deadline of `seconds` each."""
+        previous = getattr(self._local, 'deadline', None)
+        self._local.deadline = seconds
+        try:
+            yield
+        finally:
+            self._local.deadline = previous
+
+    def call(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)`, retrying busy errors until the deadline."""
+        seconds = getattr(self._local, 'deadline', None) or self.deadline_seconds
+        started = time.monotonic()
+        give_up_at = started + seconds
+        attempt = 0
+        waited = 0.0
+        while True:
+            attempt_started = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_busy(e) or isinstance(e, VaultBusyError):
+                    self._record(attempt, waited, gave_up=False)
+                    raise
+                now = time.monotonic()
+                waited += now - attempt_started
+                remaining = give_up_at - now
+                if remaining <= 0:
+                    self._record(attempt, waited, gave_up=True)
+                    raise VaultBusyError(
+                        f"{e} (gave up after {attempt + 1} attempts in {now - started:.2f}s)") from e
+                pause = min(remaining, random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+                time.sleep(pause)
+                waited += pause
+                attempt += 1
+                continue
+            self._record(attempt, waited, gave_up=False)
+            return result
+
+    def _record(self, retries: int, waited: float, gave_up: bool):
+        with self._stats_lock:
+            s = self._stats
+            s['operations'] += 1
+            if retries:
+                s['retried_operations'] += 1
+                s['retries'] += retries
+            if gave_up:
+                s['gave_up'] += 1
+            s['lock_wait_seconds'] += waited
+            s['max_lock_wait_seconds'] = max(s['max_lock_wait_seconds'], waited)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            out = dict(self._stats)
+        out['lock_wait_seconds'] = round(out['lock_wait_seconds'], 4)
+        out['max_lock_wait_seconds'] = round(out['max_lock_wait_seconds'], 4)
+        out['deadline_seconds'] = self.deadline_seconds
+        return out
+
+    def reset_stats(self):
+        with self._stats_lock:
+            for key in self._stats:
+                self._stats[key] = 0 if isinstance(self._stats[key], int) else 0.0
@@ -2,12 +2,28 @@
 Usage:
     python main.py --cli      # interactive CLI
     python main.py --init-db  # initialize sqlite vault
+    python main.py --bulk-gpa results.csv [--scale 4.0]  # GPA/CGPA for many students
+    python main.py --rebuild-aggregates  # repair per-user CGPA totals from semesters
+    python main.py --import transcripts.csv [--batch-rows N] [--no-resume]  # load course rows into the vault
+    python main.py --export vault.ndjson [--table semesters] [--user-id N]  # stream tables out (.csv: one table)
+    python main.py --repair [--dry-run] [--report fixes.csv]  # recompute stored GPA/CGPA vault-wide
+    python main.py --maintenance [--vacuum auto|always|never]  # ANALYZE, optimize, WAL checkpoint, VACUUM
+    python main.py --profile server ...  # connection tuning profile (desktop, server, kiosk)
+    python main.py --backup copy.db | --snapshot [DIR] [--keep 7]  # online backup / rotating snapshots
 """
 import argparse
-from app.gpa_calculator import compute_gpa
-from app.cgpa_calculator import update_cgpa, required_gpa_for_target
+import csv
+import sys
+from app.gpa_calculator import compute_gpa, compute_gpa_bulk
+from app.grading import get_scale
+from app.cgpa_calculator import update_cgpa, required_gpa_for_target, CGPAAccumulator
 from app.simulator import generate_grade_combinations
 from app import vault_manager as vault
+from app.vault_import import import_transcripts
+from app.vault_export import export as export_vault
+from app.vault_repair import repair_vault
+from app.vault_maintenance import VACUUM_MODES, run_maintenance
+from app.vault_backup import DEFAULT_KEEP, backup as backup_vault, snapshot as snapshot_vault
 from app.session_context import get_session, reset_session
 from app.onboarding import onboard_first_time_user
 from app.constants import GRADE_POINTS
@@ -375,10 +391,7 @@ def calculate_cgpa_from_scratch_with_vault(user_id: int) -> float:
         while True:
             c = input('\nSelect (1 or 2): ').strip()
             if c == '1':
-                wt, cu = 0.0, 0
-                for s in saved:
-                    wt += s['gpa'] * s['total_cu']
-                    cu += s['total_cu']
+                acc = CGPAAccumulator.from_semesters(saved)
                 print_success(f'✅ Loaded {len(saved)} semester(s) from vault')
                 if input('\nAdd new semesters? (y/n): ').strip().lower() == 'y':
                     while input('\nAdd semester? (y/n): ').strip().lower() == 'y':
@@ -390,11 +403,12 @@ def calculate_cgpa_from_scratch_with_vault(user_id: int) -> float:
                             c_cu = sum(prompt_positive_int(f'  Course {i} CU: ', 'CU') for i in range(1, n+1))
                         else:
                             c_cu = prompt_positive_int('Total CU: ', 'CU')
-                        wt += g * c_cu
-                        cu += c_cu
-                        r = round(wt / cu, DECIMAL_PLACES) if cu > 0 else 0.0
-                        print_success(f'CGPA: {r}')
-                return round(wt / cu, DECIMAL_PLACES) if cu > 0 else 0.0
+                        if (y, s) in acc:
+                            acc.replace((y, s), g, c_cu)
+                        else:
+                            acc.add((y, s), g, c_cu)
+                        print_success(f'CGPA: {acc.cgpa}')
+                return acc.cgpa
             elif c == '2':
                 break
             print_warning('Enter 1 or 2.')
@@ -510,6 +524,38 @@ def prompt_completed_semesters_total_cu():
     print(f'Total historical credit units = {total_cu}')
     return total_cu
 
+def bulk_gpa_report(path: str, scale=None, out=None):
+    """Print semester GPA and running CGPA for every student in a CSV file.
+
+    The CSV needs a header with: student, academic_year, semester_num,
+    credit_units, grade. Rows must be grouped by student, then semester.
+    """
+    scale = get_scale(scale)
+    out = out or sys.stdout
+    cus, codes, offsets, groups, keys = [], [], [0], [0], []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            student = row['student'].strip()
+            key = (student, int(row['academic_year']), int(row['semester_num']))
+            if not keys or key != keys[-1]:
+                if keys:
+                    offsets.append(len(cus))
+                    if student != keys[-1][0]:
+                        groups.append(len(keys))
+                keys.append(key)
+            cus.append(int(row['credit_units']))
+            codes.append(scale.code(row['grade']))
+    offsets.append(len(cus))
+    groups.append(len(keys))
+    if not keys:
+        offsets, groups = [0], [0]
+    gpas, cgpas = compute_gpa_bulk(cus, codes, offsets, scale, groups)
+    writer = csv.writer(out)
+    writer.writerow(['student', 'academic_year', 'semester_num', 'total_cu', 'gpa', 'cgpa'])
+    for i, (student, year, sem) in enumerate(keys):
+        writer.writerow([student, year, sem, sum(cus[offsets[i]:offsets[i + 1]]), gpas[i], cgpas[i]])
+    return len(keys)
+
 def cli():
     print_header("GPA & CGPA Simulator (CLI)")
     print_info('Please check your curriculum for accurate Credit Unit (CU) information.')
@@ -781,7 +827,7 @@ def cli():
                     print_success('Vault DB initialized at app/database/vault.db')
                 else:
                     print_header('View Academic History')
-                    semesters = vault.get_semesters_for_user(current_user['id'])
+                    semesters = list(vault.iter_transcript(current_user['id']))
                     if not semesters:
                         print_info('No academic records found. Start by saving a semester.')
                     else:
@@ -793,8 +839,7 @@ def cli():
                             print(f"  Semester GPA: {sem['gpa']}")
                             print(f"  Cumulative CGPA: {sem['cgpa']}")
                             
-                            # Get courses for this semester
-                            courses = vault.get_courses_for_semester(sem['id'])
+                            courses = sem['courses']
                             if courses:
                                 print(f"  Courses ({len(courses)}):")
                                 for course in courses:
@@ -892,8 +937,91 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--cli', action='store_true', help='Run interactive CLI')
     parser.add_argument('--init-db', action='store_true', help='Initialize local sqlite DB')
+    parser.add_argument('--bulk-gpa', metavar='CSV', help='Compute semester GPA and CGPA for every student in a CSV file')
+    parser.add_argument('--scale', default=None, help='Grading scale name (default 5.0)')
+    parser.add_argument('--rebuild-aggregates', action='store_true', help='Recompute per-user totals from saved semesters')
+    parser.add_argument('--import', dest='import_path', metavar='FILE',
+                        help='Import course rows (CSV or JSONL: user, academic_year, semester_num, course, credit_units, grade)')
+    parser.add_argument('--batch-rows', type=int, default=20000, help='Input rows per import transaction')
+    parser.add_argument('--no-resume', action='store_true', help='Ignore the import checkpoint and start from the first row')
+    parser.add_argument('--export', metavar='FILE', help='Export vault tables to NDJSON (or CSV by extension)')
+    parser.add_argument('--table', action='append', help='Table to export (repeatable; default all for NDJSON, semesters for CSV)')
+    parser.add_argument('--user-id', type=int, default=None, help="Export only this user's rows")
+    parser.add_argument('--repair', action='store_true', help='Recompute semester GPA/CGPA from courses and fix drifted rows')
+    parser.add_argument('--dry-run', action='store_true', help='With --repair: report discrepancies without writing')
+    parser.add_argument('--report', metavar='CSV', help='With --repair: write every discrepancy to this CSV file')
+    parser.add_argument('--maintenance', action='store_true', help='Run vault housekeeping and report file sizes')
+    parser.add_argument('--vacuum', choices=VACUUM_MODES, default='auto',
+                        help='With --maintenance: when to VACUUM (auto: if enough pages are free)')
+    parser.add_argument('--profile', choices=sorted(vault.PROFILES), default=None,
+                        help='Connection tuning profile (default: $VAULT_PROFILE or desktop)')
+    parser.add_argument('--backup', metavar='FILE', help='Copy the vault to FILE while it stays in use')
+    parser.add_argument('--snapshot', metavar='DIR', nargs='?', const='',
+                        help='Back up into a timestamped file in DIR (default: snapshots next to the vault)')
+    parser.add_argument('--keep', type=int, default=DEFAULT_KEEP, help='With --snapshot: newest snapshots to keep')
     args = parser.parse_args()
-    if args.init_db:
+    if args.profile:
+        vault.set_profile(args.profile)
+    if args.backup or args.snapshot is not None:
+        vault.init_db()
+        if args.backup:
+            result = backup_vault(args.backup)
+        else:
+            result = snapshot_vault(args.snapshot or None, keep=args.keep)
+            for path in result['pruned']:
+                print_info(f'Removed old snapshot {path}')
+        print_success(f"Backed up {result['pages']} pages ({result['bytes']} bytes) to {result['path']} "
+                      f"in {result['seconds']:.2f}s ({result['pages_per_sec']:.0f} pages/s)")
+    elif args.maintenance:
+        vault.init_db()
+        try:
+            result = run_maintenance(vacuum=args.vacuum)
+        except RuntimeError as e:
+            print_warning(f'Maintenance failed: {e}')
+            sys.exit(1)
+        for step, info in result['steps'].items():
+            print_info(f"{step}: {info['seconds']:.3f}s")
+        before, after = result['before'], result['after']
+        print_success(f"Database {before['db_bytes']} -> {after['db_bytes']} bytes, "
+                      f"WAL {before['wal_bytes']} -> {after['wal_bytes']} bytes, "
+                      f"free pages {before['freelist_count']} -> {after['freelist_count']}")
+    elif args.repair:
+        vault.init_db()
+        report = open(args.report, 'w', newline='', encoding='utf-8') if args.report else None
+        try:
+            counts = repair_vault(dry_run=args.dry_run, scale=args.scale, report=report)
+        finally:
+            if report:
+                report.close()
+        print_info(f"Checked {counts['users']} users: {counts['total_cu']} total-CU, {counts['gpa']} GPA, "
+                   f"{counts['cgpa']} CGPA, {counts['grade_points2']} grade-point and "
+                   f"{counts['invalid_grade']} invalid-grade discrepancies")
+        if not args.dry_run:
+            print_success(f"Fixed {counts['fixed']} semesters and {counts['fixed_courses']} courses "
+                          f"({counts['skipped']} skipped: changed during repair)")
+    elif args.export:
+        vault.init_db()
+        fmt = 'csv' if args.export.lower().endswith('.csv') else 'ndjson'
+        count = export_vault(args.export, fmt, args.table, args.user_id)
+        print_success(f'Exported {count} rows to {args.export}')
+    elif args.import_path:
+        vault.init_db()
+        stats = import_transcripts(
+            args.import_path, scale=args.scale, batch_rows=args.batch_rows, resume=not args.no_resume,
+            progress=lambda s: print(f"  {s['rows']} rows, {s['semesters']} semesters committed", file=sys.stderr)
+        )
+        if stats['skipped_rows']:
+            print_info(f"Resumed after {stats['skipped_rows']} previously imported rows")
+        if stats['existing_semesters']:
+            print_info(f"Skipped {stats['existing_semesters']} semesters already in the vault")
+        print_success(f"Imported {stats['semesters']} semesters for {stats['users']} users ({stats['rows']} rows)")
+    elif args.bulk_gpa:
+        bulk_gpa_report(args.bulk_gpa, args.scale)
+    elif args.rebuild_aggregates:
+        vault.init_db()
+        changed = vault.rebuild_user_aggregates()
+        print(f'User aggregates rebuilt ({changed} corrected)')
+    elif args.init_db:
         vault.init_db()
         print('DB initialized at app/database/vault.db')
     elif args.cli:
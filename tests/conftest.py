@@ -0,0 +1,23 @@
+import uuid
+
+import pytest
+
+from app import vault_manager as vault
+
+
+@pytest.fixture
+def tmp_vault(monkeypatch):
+    """An initialized in-memory vault private to this test."""
+    monkeypatch.setattr(vault, 'DB_PATH', f'memory:test-{uuid.uuid4().hex}')
+    vault.init_db()
+    yield vault
+    vault.close_pool()
+
+
+@pytest.fixture
+def file_vault(tmp_path, monkeypatch):
+    """An initialized on-disk vault, for tests that need WAL files or other connections."""
+    monkeypatch.setattr(vault, 'DB_PATH', str(tmp_path / 'vault.db'))
+    vault.init_db()
+    yield vault
+    vault.close_pool()
@@ -0,0 +1,75 @@
+import random
+from fractions import Fraction
+from math import floor
+
+import pytest
+
+from app.cgpa_calculator import update_cgpa, update_cgpa_bulk
+from app.gpa_calculator import compute_gpa, compute_gpa_bulk
+from app.grading import get_scale
+
+
+def _random_transcript(rng, n_semesters):
+    scale = get_scale()
+    cus, codes, offsets = [], [], [0]
+    for _ in range(n_semesters):
+        for _ in range(rng.randint(1, 7)):
+            cus.append(rng.randint(1, 5))
+            codes.append(rng.randrange(len(scale.letters)))
+        offsets.append(len(cus))
+    return cus, codes, offsets
+
+
+def test_bulk_gpa_matches_scalar():
+    rng = random.Random(7)
+    scale = get_scale()
+    cus, codes, offsets = _random_transcript(rng, 200)
+    gpas, cgpas = compute_gpa_bulk(cus, codes, offsets)
+    points, weights = Fraction(0), 0
+    for i in range(len(offsets) - 1):
+        courses = [(cus[j], scale.letters[codes[j]]) for j in range(offsets[i], offsets[i + 1])]
+        gpa = compute_gpa(courses)
+        assert gpas[i] == gpa
+        cu = sum(c for c, _ in courses)
+        points += Fraction(str(gpa)) * cu
+        weights += cu
+        assert cgpas[i] == floor(points / weights * 100) / 100
+
+
+def test_bulk_cgpa_matches_update_cgpa_and_vault(tmp_vault):
+    # Exact boundaries: 6501 / 3300 must truncate to 1.97, not the float 1.9699...
+    assert update_cgpa(2.47, 23, 0.82, 10) == 1.97
+    rng = random.Random(5)
+    for _ in range(2000):
+        cus, codes, offsets = _random_transcript(rng, 2)
+        gpas, cgpas = compute_gpa_bulk(cus, codes, offsets)
+        first, second = sum(cus[:offsets[1]]), sum(cus[offsets[1]:])
+        assert cgpas[1] == update_cgpa(gpas[0], first, gpas[1], second)
+
+    uid = tmp_vault.create_user('ann')
+    cus, codes, offsets = _random_transcript(rng, 40)
+    gpas, cgpas = compute_gpa_bulk(cus, codes, offsets)
+    for i in range(len(gpas)):
+        tmp_vault.save_semester(uid, i + 1, 1, sum(cus[offsets[i]:offsets[i + 1]]), gpas[i])
+        assert tmp_vault.calculate_current_cgpa(uid) == cgpas[i]
+
+
+def test_bulk_groups_restart_running_cgpa():
+    cus = [3, 3, 3]
+    codes = [get_scale().code(g) for g in ('A', 'C', 'B')]
+    gpas, cgpas = compute_gpa_bulk(cus, codes, [0, 1, 2, 3], groups=[0, 2, 3])
+    assert list(gpas) == [5.0, 3.0, 4.0]
+    assert list(cgpas) == [5.0, 4.0, 4.0]
+
+
+def test_bulk_rejects_bad_offsets():
+    with pytest.raises(ValueError):
+        compute_gpa_bulk([3, 3], [0, 1], [0, 1])
+
+
+def test_update_cgpa_bulk_matches_scalar():
+    rng = random.Random(3)
+    rows = [(round(rng.uniform(0, 5), 2), rng.randint(0, 150), round(rng.uniform(0, 5), 2), rng.randint(1, 30))
+            for _ in range(500)]
+    result = update_cgpa_bulk(*zip(*rows))
+    assert list(result) == [update_cgpa(*r) for r in rows]
@@ -0,0 +1,76 @@
+import random
+from fractions import Fraction
+
+import pytest
+
+from app.cgpa_calculator import CGPAAccumulator, required_gpa_for_target, required_gpa_grid
+from app.gpa_calculator import compute_gpa
+
+
+def test_matches_truncate_of_weighted_mean():
+    rng = random.Random(11)
+    acc = CGPAAccumulator()
+    rows = []
+    for i in range(60):
+        gpa, cu = round(rng.uniform(0, 5), 2), rng.randint(1, 30)
+        acc.add(i, gpa, cu)
+        rows.append((gpa, cu))
+        exact = Fraction(sum(round(g * 100) * c for g, c in rows), sum(c for _, c in rows) * 100)
+        assert acc.cgpa == int(exact * 100) / 100
+
+
+def test_remove_and_replace_are_inverse():
+    acc = CGPAAccumulator()
+    acc.add((1, 1), 4.2, 18)
+    acc.add((1, 2), 3.1, 21)
+    before = acc.cgpa
+    acc.add((2, 1), 2.0, 20)
+    acc.remove((2, 1))
+    assert acc.cgpa == before
+    acc.replace((1, 2), 4.2, 21)
+    assert acc.cgpa == 4.2 and acc.total_cu == 39
+    with pytest.raises(KeyError):
+        acc.add((1, 1), 3.0, 10)
+
+
+def test_retake_replaces_old_grade():
+    acc = CGPAAccumulator()
+    acc.add_courses((1, 1), [(3, 'A'), (3, 'F')])
+    acc.retake((1, 1), 3, 'F', 'B')
+    assert acc.semester_gpa((1, 1)) == compute_gpa([(3, 'A'), (3, 'B')])
+    assert acc.cgpa == 4.5
+
+
+def test_preview_does_not_mutate():
+    acc = CGPAAccumulator()
+    acc.add('a', 4.0, 20)
+    assert acc.preview(3.0, 20) == 3.5
+    assert acc.cgpa == 4.0 and len(acc) == 1
+
+
+def test_required_gpa_grid_matches_scalar():
+    cells = required_gpa_grid(3.5, 60, [18, 21], max_semesters=3)
+    assert len(cells) == 4 * 2 * 3
+    for c in cells:
+        assert c['required_gpa'] == required_gpa_for_target(3.5, 60, c['new_cu'] * c['semesters'], c['target_cgpa'])
+        assert (c['status'] == 'infeasible') == (c['required_gpa'] > 5.0)
+
+    rng = random.Random(5)
+    for _ in range(200):
+        old_cgpa, old_cu = rng.randint(0, 500) / 100, rng.randint(0, 200)
+        loads = [rng.randint(1, 30) for _ in range(rng.randint(1, 3))]
+        for c in required_gpa_grid(old_cgpa, old_cu, loads, max_semesters=4):
+            assert c['required_gpa'] == required_gpa_for_target(old_cgpa, old_cu, c['new_cu'] * c['semesters'],
+                                                                c['target_cgpa'])
+
+
+def test_from_semesters_keys_by_term_and_skips_malformed_rows():
+    rows = [{'id': 7, 'academic_year': 1, 'semester_num': 1, 'gpa': 4.0, 'total_cu': 20},
+            {'id': 9, 'academic_year': 1, 'semester_num': 2, 'gpa': 3.0, 'total_cu': 20},
+            {'id': 11, 'academic_year': 2, 'semester_num': 1, 'gpa': None, 'total_cu': 20},
+            {'id': 12, 'academic_year': 2, 'semester_num': 2, 'gpa': 5.0, 'total_cu': 0}]
+    acc = CGPAAccumulator.from_semesters(rows)
+    assert (1, 2) in acc and len(acc) == 2 and acc.total_cu == 40
+    # Re-entering a saved term replaces it instead of counting its credit units twice.
+    acc.replace((1, 2), 5.0, 20)
+    assert acc.total_cu == 40 and acc.cgpa == 4.5
@@ -0,0 +1,38 @@
+import pytest
+
+from app.constants import GRADE_POINTS
+from app.gpa_calculator import compute_gpa
+from app.grading import get_scale, POINT_SCALE
+from app.simulator import generate_grade_combinations
+
+
+def test_default_scale_matches_grade_points():
+    scale = get_scale()
+    assert scale.as_dict() == GRADE_POINTS
+    assert scale.max_points == 5.0 and scale.min_points == 0.0
+    assert [scale.points2[c] for c in range(len(scale.letters))] == [int(p * POINT_SCALE) for p in GRADE_POINTS.values()]
+    assert scale.code(' b+ ') == scale.codes['B+']
+
+
+def test_compute_gpa_on_four_point_scale():
+    assert compute_gpa([(3, 'A'), (3, 'B')], '4.0') == 3.5
+    assert compute_gpa([(3, 'A'), (3, 'B')]) == 4.5
+
+
+def test_classify_uses_scale_thresholds():
+    assert get_scale('5.0').classify(4.45) == 'First Class'
+    assert get_scale('4.0').classify(3.2) == 'Second Class Upper'
+    assert get_scale('4.0').classify(1.0) is None
+
+
+def test_unknown_scale_and_grade_rejected():
+    with pytest.raises(ValueError):
+        get_scale('10.0')
+    with pytest.raises(ValueError):
+        compute_gpa([(3, 'Z')], '4.0')
+
+
+def test_simulator_respects_scale():
+    for grades, gpa in generate_grade_combinations(3, [3, 3, 3], 3.0, scale='4.0'):
+        assert gpa <= 4.0
+        assert compute_gpa(list(zip([3, 3, 3], grades)), '4.0') >= gpa
@@ -0,0 +1,30 @@
+import pytest
+
+from app.gpa_calculator import compute_gpa
+from app.transcript import Transcript
+
+
+def test_semester_view_matches_tuple_gpa():
+    t = Transcript()
+    courses = [('Math', 3, 'A'), ('Physics', 4, 'b+'), (None, 2, 'C')]
+    view = t.add_semester(1, 1, courses)
+    assert list(view) == [(3, 'A'), (4, 'B+'), (2, 'C')]
+    assert view.gpa == compute_gpa([(cu, g) for _n, cu, g in courses])
+    assert compute_gpa(view) == view.gpa
+    assert view.total_cu == 9
+    assert [tuple(c) for c in view.courses()] == [('Math', 3, 'A'), ('Physics', 4, 'B+'), (None, 2, 'C')]
+
+
+def test_semester_view_gpa_follows_an_explicit_scale():
+    t = Transcript(scale='5.0')
+    view = t.add_semester(1, 1, [('Math', 3, 'A'), ('Physics', 4, 'B+')])
+    pairs = [(3, 'A'), (4, 'B+')]
+    assert compute_gpa(view, scale='5.0') == compute_gpa(view) == compute_gpa(pairs, scale='5.0')
+    assert compute_gpa(view, scale='4.0') == compute_gpa(pairs, scale='4.0') != compute_gpa(view)
+
+
+def test_rejected_course_keeps_columns_aligned():
+    t = Transcript()
+    with pytest.raises(ValueError):
+        t.add_semester(1, 1, [('Math', 3, 'A'), ('Bad', 3, 'Z')])
+    assert len(t) == 0 and len(t.cus) == len(t.codes) == len(t.names) == 0
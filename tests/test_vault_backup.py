@@ -0,0 +1,127 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app import vault_manager as vault
+from app.vault_backup import (backup, flush_status, list_snapshots, restore, snapshot, start_flush,
+                              stop_flush)
+
+
+def _seed(n=50):
+    uid = vault.create_user('ann')
+    vault.save_semesters_bulk(({'academic_year': i, 'semester_num': 1, 'total_cu': 20, 'gpa': 4.0, 'cgpa': 4.0,
+                                'courses': [(f'Course {c}', 4, 'A') for c in range(5)]}
+                               for i in range(1, n + 1)), user_id=uid)
+    return uid
+
+
+def _count(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_backup_is_a_standalone_verified_copy(tmp_vault, tmp_path):
+    _seed()
+    steps = []
+    report = backup(str(tmp_path / 'out' / 'copy.db'), pages=2, progress=steps.append)
+    assert report['steps'] == len(steps) > 1
+    assert report['pages'] > 0 and report['pages_per_sec'] > 0
+    assert steps[-1]['remaining'] == 0
+    assert _count(report['path'], 'semesters') == 50 and _count(report['path'], 'courses') == 250
+    conn = sqlite3.connect(report['path'])
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == vault.SCHEMA_VERSION
+    conn.close()
+    assert not (tmp_path / 'out' / 'copy.db.partial').exists()
+
+
+def test_backup_does_not_block_writers(file_vault, tmp_path):
+    uid = _seed()
+    written = []
+
+    def on_step(_):
+        # Commits between steps go ahead; the copy stays the vault as of its start.
+        written.append(vault.save_semester(uid, 100 + len(written), 1, 20, 4.0))
+
+    report = backup(str(tmp_path / 'copy.db'), pages=1, progress=on_step)
+    assert len(written) == report['steps'] > 3
+    assert _count(report['path'], 'semesters') == 50
+    assert len(vault.get_semesters_for_user(uid)) == 50 + len(written)
+
+
+def test_backup_gives_up_at_its_deadline(file_vault, tmp_path):
+    _seed()
+    with pytest.raises(TimeoutError):
+        backup(str(tmp_path / 'copy.db'), pages=1, deadline=0.05, progress=lambda _: time.sleep(0.02))
+    assert not (tmp_path / 'copy.db').exists() and not (tmp_path / 'copy.db.partial').exists()
+
+
+def test_memory_backup_hands_the_writer_back_between_steps(tmp_vault, tmp_path):
+    uid = _seed()
+    written = []
+    writer = threading.Thread(target=lambda: written.append(vault.save_semester(uid, 100, 1, 20, 4.0)))
+    landed = []
+
+    def on_step(_):
+        if not writer.is_alive() and not written:
+            writer.start()
+        landed.append(bool(written))
+
+    backup(str(tmp_path / 'copy.db'), pages=1, progress=on_step)
+    writer.join()
+    # The write committed while the copy was still running.
+    assert written and any(landed[:-1])
+
+
+def test_snapshots_rotate(tmp_vault, tmp_path):
+    _seed(5)
+    directory = tmp_path / 'snaps'
+    for _ in range(4):
+        report = snapshot(str(directory), keep=2)
+    assert report['kept'] == 2 and len(report['pruned']) == 1
+    snaps = list_snapshots(str(directory))
+    assert len(snaps) == 2 and snaps[-1] == report['path']
+    assert _count(snaps[0], 'semesters') == 5
+    with pytest.raises(ValueError):
+        snapshot(str(directory), keep=0)
+
+
+def test_memory_vault_restores_and_flushes(tmp_vault, tmp_path, monkeypatch):
+    uid = _seed(3)
+    target = tmp_path / 'kiosk.db'
+    start_flush(str(target), interval=60)
+    assert not flush_status()['flushes']
+    stop_flush()  # writes the final copy
+    assert _count(str(target), 'semesters') == 3
+
+    # A fresh in-memory vault picks up the flushed file, keeps flushing and is isolated from the first.
+    monkeypatch.setattr(vault, 'DB_PATH', 'memory:kiosk-reload')
+    start_flush(str(target), interval=0.05)
+    try:
+        assert vault.pool_stats()['memory']
+        assert len(vault.get_semesters_for_user(uid)) == 3
+        vault.save_semester(uid, 9, 1, 20, 4.0)
+        for _ in range(100):
+            if _count(str(target), 'semesters') == 4:
+                break
+            time.sleep(0.02)
+    finally:
+        stop_flush(final=False)
+        vault.close_pool()
+    assert _count(str(target), 'semesters') == 4
+
+
+def test_restore_replaces_contents(file_vault, tmp_path):
+    _seed(4)
+    copy = backup(str(tmp_path / 'copy.db'))['path']
+    uid = vault.create_user('bob')
+    vault.save_semester(uid, 1, 1, 20, 4.0)
+    assert vault.get_semesters_for_user(uid)
+    restore(copy)
+    assert vault.get_user(uid) is None
+    assert vault.get_semesters_for_user(uid) == []
@@ -0,0 +1,73 @@
+import sqlite3
+
+from app import vault_manager as vault
+
+
+def _reads():
+    return vault.pool_stats()['reads']
+
+
+def test_repeat_reads_cost_no_queries(tmp_vault):
+    uid = vault.create_user('ann')
+    vault.save_semester(uid, 1, 1, 20, 4.0, 4.0)
+    first = vault.get_semesters_for_user(uid)
+    vault.get_cgpa_trajectory(uid)
+    before = _reads()
+    for _ in range(5):
+        assert vault.get_semesters_for_user(uid) == first
+        vault.get_cgpa_trajectory(uid)
+        vault.get_total_cu_completed(uid)
+    assert _reads() - before == 2  # only the first aggregates miss: version check + load
+    first[0]['gpa'] = 0.0  # callers get copies
+    assert vault.get_semesters_for_user(uid)[0]['gpa'] == 4.0
+
+
+def test_request_scope_checks_the_version_once(tmp_vault):
+    uid = vault.create_user('ann')
+    vault.save_semester(uid, 1, 1, 20, 4.0, 4.0)
+    vault.get_semesters_for_user(uid)
+    with vault.request_scope():
+        before = vault.pool_stats()['version_checks']
+        for _ in range(5):
+            vault.get_semesters_for_user(uid)
+            vault.get_total_cu_completed(uid)
+        assert vault.pool_stats()['version_checks'] - before == 1
+        vault.save_semester(uid, 1, 2, 10, 5.0)  # own writes are seen at once
+        assert len(vault.get_semesters_for_user(uid)) == 2
+
+
+def test_writes_invalidate_per_user(tmp_vault):
+    ann, bob = vault.create_user('ann'), vault.create_user('bob')
+    vault.save_semester(ann, 1, 1, 20, 4.0, 4.0)
+    vault.save_semester(bob, 1, 1, 20, 3.0, 3.0)
+    vault.get_semesters_for_user(ann), vault.get_semesters_for_user(bob)
+
+    vault.save_semester(ann, 1, 2, 10, 5.0)
+    assert len(vault.get_semesters_for_user(ann)) == 2
+    stats = vault.user_cache_stats()
+    assert len(vault.get_semesters_for_user(bob)) == 1
+    assert vault.user_cache_stats()['revalidated'] == stats['revalidated'] + 1
+
+
+def test_other_connection_writes_are_seen(file_vault):
+    uid = vault.create_user('ann')
+    vault.save_semester(uid, 1, 1, 20, 4.0, 4.0)
+    assert vault.get_total_cu_completed(uid) == 20
+    # Another process: commits through its own connection and bumps the version as saves do.
+    other = sqlite3.connect(vault.DB_PATH)
+    other.execute("UPDATE user_aggregates SET total_cu = 25, data_version = data_version + 1 WHERE user_id = ?", (uid,))
+    other.commit()
+    other.close()
+    assert vault.get_total_cu_completed(uid) == 25
+
+
+def test_lru_is_bounded_and_writer_reads_bypass(tmp_vault, monkeypatch):
+    monkeypatch.setattr(vault, 'USER_CACHE_SIZE', 2)
+    ids = [vault.create_user(f'u{i}') for i in range(4)]
+    for uid in ids:
+        vault.get_semesters_for_user(uid)
+    assert vault.user_cache_stats()['entries'] == 2
+    with vault.writer():
+        vault.save_semester(ids[0], 1, 1, 20, 4.0, 4.0)
+        assert len(vault.get_semesters_for_user(ids[0])) == 1
+    assert vault.user_cache_stats()['entries'] == 2
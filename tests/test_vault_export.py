@@ -0,0 +1,43 @@
+import csv
+import json
+
+import pytest
+
+from app import vault_export
+
+
+def _seed(vault):
+    ids = []
+    for name in ('ann', 'bob'):
+        uid = vault.create_user(name)
+        ids.append(uid)
+        vault.save_semester(uid, 1, 1, 6, 4.0, 4.0, courses=[('Math', 3, 'A'), ('Bio', 3, 'C')])
+        vault.save_semester(uid, 1, 2, 3, 3.0, 3.67, courses=[('Chem', 3, 'B')])
+        vault.save_scenario(uid, 'plan', {'target': 4.4})
+    return ids
+
+
+def test_ndjson_export_pages_through_every_table(tmp_vault, tmp_path):
+    _seed(tmp_vault)
+    path = tmp_path / 'out.ndjson'
+    count = vault_export.export(str(path), page_size=1)
+    lines = [json.loads(l) for l in path.read_text().splitlines()]
+    assert count == len(lines) == 2 + 4 + 6 + 2
+    assert [l['id'] for l in lines if l['table'] == 'courses'] == list(range(1, 7))
+    assert all('password' not in l for l in lines)
+    assert next(l for l in lines if l['table'] == 'scenarios')['params'] == {'target': 4.4}
+
+
+def test_user_scoped_csv_export(tmp_vault, tmp_path):
+    ann, bob = _seed(tmp_vault)
+    path = tmp_path / 'courses.csv'
+    assert vault_export.export(str(path), 'csv', ['courses'], user_id=bob, page_size=2) == 3
+    rows = list(csv.DictReader(path.open()))
+    bob_sems = {s['id'] for s in tmp_vault.get_semesters_for_user(bob)}
+    assert {int(r['semester_id']) for r in rows} == bob_sems
+    assert ''.join(vault_export.iter_csv('semesters', user_id=ann)).count('\n') == 3
+
+
+def test_export_rejects_unknown_table(tmp_vault, tmp_path):
+    with pytest.raises(ValueError):
+        vault_export.export(str(tmp_path / 'x.csv'), 'csv', ['passwords'])
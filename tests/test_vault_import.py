@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from app.gpa_calculator import compute_gpa
+from app.vault_import import get_checkpoint, import_transcripts
+
+
+HEADER = 'user,academic_year,semester_num,course,credit_units,grade\n'
+ROWS = [
+    ('ann', 1, 1, 'Math', 3, 'A'), ('ann', 1, 1, 'Bio', 4, 'b+'),
+    ('ann', 1, 2, 'Chem', 3, 'C'), ('ann', 1, 2, 'Phys', 3, 'B'),
+    ('bob', 1, 1, 'Math', 4, 'D'), ('bob', 1, 1, 'Art', 2, 'A'),
+    ('bob', 2, 1, 'Law', 3, 'B+'),
+]
+
+
+def _write_csv(path, rows):
+    path.write_text(HEADER + ''.join(','.join(map(str, r)) + '\n' for r in rows))
+    return str(path)
+
+
+def test_import_computes_gpa_and_running_cgpa(tmp_vault, tmp_path):
+    batches = []
+    stats = import_transcripts(_write_csv(tmp_path / 'in.csv', ROWS), batch_rows=2, progress=batches.append)
+    assert stats['semesters'] == 4 and stats['users'] == 2 and stats['rows'] == len(ROWS)
+    assert len(batches) > 1
+
+    ann = tmp_vault.login_user('ann', 'guest')
+    sems = tmp_vault.get_semesters_for_user(ann['id'])
+    assert [s['gpa'] for s in sems] == [compute_gpa([(3, 'A'), (4, 'B+')]), compute_gpa([(3, 'C'), (3, 'B')])]
+    assert sems[-1]['cgpa'] == tmp_vault.calculate_current_cgpa(ann['id'])
+    assert [c['grade_letter'] for c in tmp_vault.get_courses_for_semester(sems[0]['id'])] == ['A', 'B+']
+
+
+def test_import_resumes_from_checkpoint(tmp_vault, tmp_path):
+    path = tmp_path / 'in.jsonl'
+    keys = ('user', 'academic_year', 'semester_num', 'course', 'credit_units', 'grade')
+    bad = ROWS[:4] + [('bob', 1, 1, 'Math', 4, 'Z')] + ROWS[5:]
+    path.write_text(''.join(json.dumps(dict(zip(keys, r))) + '\n' for r in bad))
+    with pytest.raises(ValueError, match='row 5'):
+        import_transcripts(str(path), batch_rows=1)
+    assert get_checkpoint(str(path)) == 2  # ann's first semester committed before the bad row
+
+    path.write_text(''.join(json.dumps(dict(zip(keys, r))) + '\n' for r in ROWS))
+    stats = import_transcripts(str(path))
+    assert stats['skipped_rows'] == 2 and stats['semesters'] == 3
+    ann = tmp_vault.login_user('ann', 'guest')
+    assert len(tmp_vault.get_semesters_for_user(ann['id'])) == 2
+    assert get_checkpoint(str(path)) == len(ROWS)
+
+
+def test_import_without_resume_skips_saved_semesters(tmp_vault, tmp_path):
+    path = _write_csv(tmp_path / 'in.csv', ROWS[:4])
+    import_transcripts(path)
+    ann = tmp_vault.login_user('ann', 'guest')
+    before = tmp_vault.get_semesters_for_user(ann['id'])
+
+    stats = import_transcripts(_write_csv(tmp_path / 'in.csv', ROWS), resume=False)
+    assert stats['existing_semesters'] == 2 and stats['semesters'] == 2
+    assert tmp_vault.get_semesters_for_user(ann['id']) == before
+    assert tmp_vault.calculate_current_cgpa(ann['id']) == before[-1]['cgpa']
+    bob = tmp_vault.login_user('bob', 'guest')
+    assert len(tmp_vault.get_semesters_for_user(bob['id'])) == 2
+
+
+def test_imported_terms_before_saved_ones_get_the_running_cgpa(tmp_vault, tmp_path):
+    uid = tmp_vault.create_user('ann')
+    tmp_vault.save_semester(uid, 2, 1, 3, 5.0, 5.0, [('Law', 3, 'A')])
+    import_transcripts(_write_csv(tmp_path / 'in.csv', [('ann', 1, 1, 'Math', 3, 'F')]))
+    trajectory = tmp_vault.get_cgpa_trajectory(uid)
+    assert [(t['academic_year'], t['cgpa']) for t in trajectory] == [(1, 0.0), (2, 2.5)]
+    assert all(t['stored_cgpa'] == t['cgpa'] for t in trajectory)
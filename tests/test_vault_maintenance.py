@@ -0,0 +1,106 @@
+import shutil
+import sqlite3
+import time
+
+import pytest
+
+from app import vault_manager as vault
+from app.vault_maintenance import last_run, run_maintenance, start_maintenance, stop_maintenance, maintenance_status
+
+
+@pytest.fixture
+def restore_profile():
+    yield
+    vault.set_profile('desktop')
+
+
+def test_profile_pragmas_apply_to_every_pooled_connection(file_vault, restore_profile):
+    vault.set_profile('server')
+    uid = vault.create_user('ann')
+    with vault.writer() as conn:
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == vault.PROFILES['server']['cache_size']
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA wal_autocheckpoint").fetchone()[0] == 4000
+    with vault.reader() as conn:
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == vault.PROFILES['server']['cache_size']
+    assert vault.get_user(uid)['username'] == 'ann'
+    assert vault.pool_stats()['profile'] == 'server'
+    with pytest.raises(ValueError):
+        vault.set_profile('turbo')
+
+
+def test_kiosk_profile_reads_an_immutable_copy(file_vault, tmp_path, monkeypatch, restore_profile):
+    uid = vault.create_user('ann')
+    vault.save_semester(uid, 1, 1, 20, 4.0, 4.0, [('Math', 4, 'A')])
+    run_maintenance(vacuum='never')
+    vault.close_pool()
+    copy = tmp_path / 'kiosk.db'
+    shutil.copy(vault.DB_PATH, copy)
+    monkeypatch.setattr(vault, 'DB_PATH', str(copy))
+    vault.set_profile('kiosk')
+    vault.init_db()  # only checks the schema version
+    assert vault.get_semesters_for_user(uid)[0]['gpa'] == 4.0
+    assert vault.pool_stats()['immutable']
+    with pytest.raises(sqlite3.OperationalError):
+        vault.create_user('bob')
+    with pytest.raises(RuntimeError):
+        run_maintenance()
+
+
+def test_maintenance_reports_sizes_and_vacuums_free_pages(file_vault):
+    uid = vault.create_user('ann')
+    ids = vault.save_semesters_bulk(({'academic_year': i, 'semester_num': 1, 'total_cu': 20, 'gpa': 4.0,
+                                      'cgpa': 4.0, 'courses': [(f'Course {c} ' + 'x' * 200, 4, 'A')
+                                                               for c in range(5)]}
+                                     for i in range(1, 200)), user_id=uid)
+    for sem_id in ids[:-1]:
+        vault.delete_semester(sem_id)
+    result = run_maintenance(vacuum='auto', vacuum_threshold=0.1)
+    assert {'analyze', 'optimize', 'vacuum', 'checkpoint'} <= set(result['steps'])
+    assert result['after']['wal_bytes'] == 0
+    assert result['after']['freelist_count'] == 0
+    assert result['after']['page_count'] < result['before']['page_count']
+    assert len(vault.get_semesters_for_user(uid)) == 1
+
+    result = run_maintenance(vacuum='auto')
+    assert 'vacuum' not in result['steps']
+    with pytest.raises(ValueError):
+        run_maintenance(vacuum='sometimes')
+
+
+def test_scheduled_maintenance(tmp_vault):
+    start_maintenance(interval=0.05, vacuum='never')
+    try:
+        for _ in range(100):
+            status = maintenance_status()
+            if status['last_report']:
+                break
+            time.sleep(0.02)
+    finally:
+        stop_maintenance()
+    assert status['last_error'] is None and 'checkpoint' in status['last_report']['steps']
+    assert maintenance_status() is None
+
+
+def test_scheduler_runs_at_once_only_when_the_last_run_is_overdue(tmp_vault):
+    assert last_run() is None
+    start_maintenance(interval=3600, vacuum='never')
+    try:
+        for _ in range(100):
+            if maintenance_status()['last_report']:
+                break
+            time.sleep(0.02)
+        first = maintenance_status()
+    finally:
+        stop_maintenance()
+    assert first['last_error'] is None and first['last_report'] is not None
+    assert last_run() == pytest.approx(time.time(), abs=60)
+
+    # Ran recently: the restarted schedule waits for the interval instead.
+    start_maintenance(interval=3600, vacuum='never')
+    try:
+        time.sleep(0.2)
+        assert maintenance_status()['last_report'] is None
+    finally:
+        stop_maintenance()
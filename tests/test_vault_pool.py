@@ -0,0 +1,67 @@
+import sqlite3
+import threading
+
+import pytest
+
+from app import vault_manager as vault
+
+
+def test_readers_are_read_only(file_vault):
+    with vault.reader() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO users (username, password) VALUES ('x', 'y')")
+
+
+def test_writer_rolls_back_whole_block(file_vault):
+    with pytest.raises(RuntimeError):
+        with vault.writer() as conn:
+            conn.execute("INSERT INTO users (username, password) VALUES ('a', 'p')")
+            with vault.writer() as inner:
+                assert inner is conn
+            raise RuntimeError('boom')
+    assert vault.login_user('a', 'p') is None
+
+
+def test_connections_are_reused_across_threads(file_vault, monkeypatch):
+    # Exercise the pool itself, not the per-user cache in front of it.
+    monkeypatch.setattr(vault, 'USER_CACHE_SIZE', 0)
+    uid = vault.create_user('ann')
+    vault.save_semester(uid, 1, 1, 20, 4.0, 4.0)
+    errors = []
+
+    def work():
+        try:
+            for _ in range(50):
+                assert vault.get_total_cu_completed(uid) == 20
+        except Exception as e:  # pragma: no cover - surfaced below
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    stats = vault.pool_stats()
+    assert stats['opened'] <= 1 + vault.POOL_READERS
+    assert stats['reads'] >= 400
+
+
+def test_memory_reads_wait_out_a_long_write(tmp_vault, monkeypatch):
+    monkeypatch.setattr(vault, 'USER_CACHE_SIZE', 0)
+    uid = vault.create_user('ann')
+    held = threading.Event()
+
+    def hold():
+        with vault.writer():
+            held.set()
+            threading.Event().wait(0.6)
+
+    t = threading.Thread(target=hold)
+    t.start()
+    held.wait(5)
+    try:
+        assert vault.get_user(uid)['username'] == 'ann'
+        assert vault.get_semesters_for_user(uid) == []
+    finally:
+        t.join()
@@ -0,0 +1,255 @@
+import sqlite3
+
+import pytest
+
+from app import vault_manager as vault
+from app.cgpa_calculator import CGPAAccumulator
+
+
+def _seed():
+    uid = vault.create_user('ann')
+    vault.save_semester(uid, 1, 2, 6, 4.5, 4.5, [('Art', 3, 'A'), ('Bio', 3, 'B')])
+    vault.save_semester(uid, 1, 1, 20, 3.5, 3.5)
+    vault.save_semester(uid, 2, 1, 3, 5.0, 4.0, [('Chem', 3, 'A')])
+    return uid
+
+
+def test_summary_counts_courses_in_order(tmp_vault):
+    uid = _seed()
+    summary = vault.get_semesters_summary(uid)
+    assert [(s['academic_year'], s['semester_num'], s['course_count']) for s in summary] == [(1, 1, 0), (1, 2, 2), (2, 1, 1)]
+    assert set(summary[0]) == {'id', 'academic_year', 'semester_num', 'gpa', 'cgpa', 'total_cu', 'course_count'}
+
+
+def test_iter_transcript_matches_per_semester_queries(tmp_vault):
+    uid = _seed()
+    streamed = list(vault.iter_transcript(uid))
+    expected = vault.get_semesters_for_user(uid)
+    assert [{k: v for k, v in s.items() if k != 'courses'} for s in streamed] == expected
+    for sem in streamed:
+        assert sem['courses'] == vault.get_courses_for_semester(sem['id'])
+
+
+def test_last_complete_semester_includes_courses(tmp_vault):
+    uid = _seed()
+    last = vault.get_last_complete_semester_data(uid)
+    assert (last['academic_year'], last['semester_num']) == (2, 1)
+    assert [c['name'] for c in last['courses']] == ['Chem']
+    assert vault.get_last_complete_semester_data(uid + 99) is None
+
+
+def test_init_db_migrates_and_is_idempotent(tmp_vault):
+    assert vault.get_schema_version() == vault.SCHEMA_VERSION
+    vault.init_db()
+    assert vault.get_schema_version() == vault.SCHEMA_VERSION
+    with vault.reader() as conn:
+        indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    assert {'idx_semesters_user_term', 'idx_semesters_user_term_id', 'idx_courses_semester_points'} <= indexes
+
+
+def test_aggregates_follow_writes_and_rebuild_repairs_drift(tmp_vault):
+    uid = _seed()
+    agg = vault.get_user_aggregates(uid)
+    assert (agg['total_cu'], agg['semester_count']) == (29, 3)
+    assert (agg['latest_year'], agg['latest_semester']) == (2, 1)
+    assert vault.calculate_current_cgpa(uid) == (450 * 6 + 350 * 20 + 500 * 3) // 29 / 100
+    assert vault.get_latest_semester(uid)['academic_year'] == 2
+    with vault.writer() as conn:
+        conn.execute("UPDATE user_aggregates SET total_cu = 1 WHERE user_id=?", (uid,))
+    assert vault.rebuild_user_aggregates() == 1
+    assert vault.get_total_cu_completed(uid) == 29
+    assert vault.get_user_aggregates(uid + 99)['total_cu'] == 0
+
+
+def test_bulk_save_assigns_ids_and_courses(tmp_vault):
+    uid = _seed()
+    other = vault.create_user('bob')
+    ids = vault.save_semesters_bulk([
+        {'academic_year': 2, 'semester_num': 2, 'total_cu': 6, 'gpa': 4.0, 'cgpa': 4.0,
+         'courses': [('Math', 3, 'b'), ('Bio', 3, 'B')]},
+        {'user_id': other, 'academic_year': 1, 'semester_num': 1, 'total_cu': 20, 'gpa': 3.0, 'cgpa': 3.0},
+    ], user_id=uid)
+    assert len(ids) == 2 and ids[0] > max(s['id'] for s in vault.get_semesters_for_user(uid)[:-1])
+    assert [c['grade_letter'] for c in vault.get_courses_for_semester(ids[0])] == ['B', 'B']
+    assert vault.get_user_aggregates(uid)['semester_count'] == 4
+    assert vault.get_total_cu_completed(other) == 20
+    # ids keep increasing for the next single save
+    assert vault.save_semester(other, 1, 2, 10, 3.0, 3.0) > ids[1]
+
+
+def test_trajectory_running_cgpa_matches_accumulator(tmp_vault):
+    uid = _seed()
+    trajectory = vault.get_cgpa_trajectory(uid)
+    assert [(t['academic_year'], t['semester_num']) for t in trajectory] == [(1, 1), (1, 2), (2, 1)]
+    acc = CGPAAccumulator()
+    for t in trajectory:
+        acc.add(t['id'], t['gpa'], t['total_cu'])
+        assert (t['cgpa'], t['cumulative_cu']) == (acc.cgpa, acc.total_cu)
+    assert trajectory[-1]['cgpa'] == vault.calculate_current_cgpa(uid)
+    assert vault.get_cgpa_trajectory(uid + 99) == []
+
+
+def _stored_matches_trajectory(uid, skip=()):
+    return all(t['stored_cgpa'] == t['cgpa'] for t in vault.get_cgpa_trajectory(uid) if t['id'] not in skip)
+
+
+@pytest.fixture(params=[True, False], ids=['update-from', 'pre-3.33'])
+def update_from(request, monkeypatch):
+    """Run a cascade test with UPDATE ... FROM and with the fallback for older SQLite."""
+    monkeypatch.setattr(vault, '_UPDATE_FROM', request.param and vault._UPDATE_FROM)
+
+
+def test_out_of_order_insert_recomputes_later_cgpa(tmp_vault, update_from):
+    uid = vault.create_user('ann')
+    vault.save_semester(uid, 1, 1, 20, 4.0, 4.0)
+    later = vault.save_semester(uid, 2, 1, 20, 3.0, 3.5)
+    vault.save_semester(uid, 1, 2, 10, 5.0)
+    assert _stored_matches_trajectory(uid)
+    stored = {s['id']: s['cgpa'] for s in vault.get_semesters_for_user(uid)}
+    assert stored[later] == (400 * 20 + 500 * 10 + 300 * 20) // 50 / 100
+
+    new_ids = vault.save_semesters_bulk([{'academic_year': 1, 'semester_num': 1, 'total_cu': 5, 'gpa': 2.0,
+                                          'cgpa': 2.0}], user_id=uid)
+    assert _stored_matches_trajectory(uid, skip=new_ids)
+    assert {s['id']: s['cgpa'] for s in vault.get_semesters_for_user(uid)}[new_ids[0]] == 2.0
+
+
+def test_update_and_delete_semester_cascade(tmp_vault, update_from):
+    uid = vault.create_user('ann')
+    first = vault.save_semester(uid, 1, 1, 20, 4.0, 4.0)
+    vault.save_semester(uid, 1, 2, 20, 3.0, 3.5)
+    last = vault.save_semester(uid, 2, 1, 20, 5.0, 4.0)
+
+    assert vault.update_semester(first, courses=[('Math', 3, 'a'), ('Art', 3, 'C')])
+    sems = vault.get_semesters_for_user(uid)
+    assert (sems[0]['gpa'], sems[0]['total_cu']) == (4.0, 6)
+    assert sems[0]['cgpa'] == 4.0 and _stored_matches_trajectory(uid)
+    assert [c['grade_letter'] for c in vault.get_courses_for_semester(first)] == ['A', 'C']
+
+    assert vault.update_semester(last, academic_year=1, semester_num=1)
+    assert _stored_matches_trajectory(uid)
+    assert vault.delete_semester(first) and not vault.delete_semester(first)
+    assert vault.get_courses_for_semester(first) == []
+    assert _stored_matches_trajectory(uid)
+    assert vault.calculate_current_cgpa(uid) == vault.get_cgpa_trajectory(uid)[-1]['cgpa']
+
+
+def test_course_gpa_aggregates_match_compute_gpa(tmp_vault):
+    from app.gpa_calculator import compute_gpa
+    uid = _seed()
+    with vault.writer() as conn:
+        conn.execute("UPDATE users SET program = 'BSc' WHERE id = ?", (uid,))
+    by_sem = vault.get_course_gpa_by_semester(uid)
+    assert [(s['academic_year'], s['semester_num'], s['gpa']) for s in by_sem] == [
+        (1, 2, compute_gpa([(3, 'A'), (3, 'B')])), (2, 1, compute_gpa([(3, 'A')]))]
+    overall = vault.get_course_gpa_for_user(uid)
+    assert (overall['total_cu'], overall['gpa']) == (9, compute_gpa([(3, 'A'), (3, 'B'), (3, 'A')]))
+    assert vault.get_course_gpa_for_user(uid + 99)['gpa'] == 0.0
+    cohort = vault.get_cohort_gpa(program='BSc', academic_year=1)
+    assert [(c['semester_num'], c['students'], c['points2']) for c in cohort] == [(2, 1, 3 * 10 + 3 * 8)]
+
+
+def test_grade_points_migration_backfills(tmp_vault):
+    uid = _seed()
+    with vault.writer() as conn:
+        conn.execute("UPDATE courses SET grade_points2 = NULL")
+        conn.execute("PRAGMA user_version = 3")
+    vault.init_db()
+    assert [c['grade_points2'] for c in vault.get_courses_for_semester(vault.get_semesters_for_user(uid)[1]['id'])] == [10, 8]
+
+
+def _all_pages(fetch, **kwargs):
+    items, cursor, pages = [], None, 0
+    while True:
+        page = fetch(cursor=cursor, **kwargs)
+        items.extend(page['items'])
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            return items, pages
+
+
+def test_semester_pages_follow_term_order_with_ties(tmp_vault):
+    uid = _seed()
+    vault.save_semester(uid, 1, 1, 12, 4.0)  # same term as an existing row: ordered by id
+    other = vault.create_user('bob')
+    vault.save_semester(other, 1, 1, 20, 3.0, 3.0)
+    items, pages = _all_pages(vault.get_semesters_page, user_id=uid, limit=2)
+    expected = sorted(vault.get_semesters_for_user(uid), key=lambda s: (s['academic_year'], s['semester_num'], s['id']))
+    assert [s['id'] for s in items] == [s['id'] for s in expected] and pages == 2
+    assert items[0] == expected[0]
+
+    items, _ = _all_pages(vault.get_semesters_page, limit=3, fields=['gpa'])
+    assert len(items) == 5 and all(set(s) == {'gpa'} for s in items)
+    assert [s['gpa'] for s in items][-1] == 3.0  # other user's rows come after ann's
+
+    page = vault.get_semesters_page(user_id=uid, limit=1)
+    with pytest.raises(ValueError):
+        vault.get_semesters_page(user_id=other, cursor=page['next_cursor'])
+    for bad in ({'cursor': 'garbage'}, {'limit': 0}, {'limit': vault.MAX_PAGE_SIZE + 1}, {'fields': ['password']}):
+        with pytest.raises(ValueError):
+            vault.get_semesters_page(user_id=uid, **bad)
+
+
+def test_scenario_pages_decode_params_only_when_selected(tmp_vault):
+    uid = vault.create_user('ann')
+    ids = [vault.save_scenario(uid, f'plan {i}', {'target': 4.0 + i / 10}) for i in range(5)]
+    items, pages = _all_pages(vault.get_scenarios_page, user_id=uid, limit=2)
+    assert [s['id'] for s in items] == ids and pages == 3
+    assert items[1]['params'] == {'target': 4.1}
+    names = vault.get_scenarios_page(limit=10, fields=['name'])
+    assert names == {'items': [{'name': f'plan {i}'} for i in range(5)], 'next_cursor': None}
+
+
+def test_semester_pages_seek_without_sorting(tmp_vault):
+    sql = ("SELECT id, gpa FROM semesters WHERE user_id = ? AND (academic_year, semester_num, id) > (?, ?, ?) "
+           "ORDER BY academic_year, semester_num, id LIMIT ?")
+    with vault.reader() as conn:
+        plan = ' '.join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, (1, 1, 1, 1, 50)))
+    assert 'idx_semesters_user_term_id' in plan and 'TEMP B-TREE' not in plan
+
+
+def test_reads_migrate_a_vault_that_never_ran_init_db(tmp_path, monkeypatch):
+    # The schema as the app created it before versioned migrations existed.
+    path = tmp_path / 'old.db'
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+                            password TEXT NOT NULL, email TEXT, full_name TEXT, program TEXT, duration INTEGER,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE semesters (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+                                academic_year INTEGER, semester_num INTEGER, total_cu INTEGER, gpa REAL, cgpa REAL,
+                                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE courses (id INTEGER PRIMARY KEY AUTOINCREMENT, semester_id INTEGER NOT NULL, name TEXT,
+                              credit_units INTEGER, grade_letter TEXT);
+        CREATE TABLE scenarios (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, name TEXT,
+                                params TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        INSERT INTO users (username, password) VALUES ('ann', 'x');
+        INSERT INTO semesters (user_id, academic_year, semester_num, total_cu, gpa, cgpa) VALUES (1, 1, 1, 20, 4.0, 4.0);
+    """)
+    conn.close()
+    monkeypatch.setattr(vault, 'DB_PATH', str(path))
+    vault.close_pool()
+    try:
+        assert [s['gpa'] for s in vault.get_semesters_for_user(1)] == [4.0]
+        assert vault.calculate_current_cgpa(1) == 4.0
+        assert vault.get_schema_version() == vault.SCHEMA_VERSION
+    finally:
+        vault.close_pool()
+
+
+def test_semesters_record_their_grading_scale(tmp_vault):
+    uid = vault.create_user('ann')
+    with vault.writer() as conn:
+        conn.execute("UPDATE users SET program = 'BSc' WHERE id = ?", (uid,))
+    sid = vault.save_semester(uid, 1, 1, 6, 3.5, 3.5, [('Math', 3, 'A'), ('Bio', 3, 'B')], scale='4.0')
+    vault.save_semester(uid, 1, 2, 3, 5.0, None, [('Chem', 3, 'A')])
+    assert [s['scale'] for s in vault.get_semesters_for_user(uid)] == ['4.0', '5.0']
+
+    # Editing courses without a scale keeps grading them on the semester's own one.
+    assert vault.update_semester(sid, courses=[('Math', 3, 'A'), ('Bio', 3, 'A')])
+    assert vault.get_semesters_for_user(uid)[0]['gpa'] == 4.0
+    assert [c['grade_points2'] for c in vault.get_courses_for_semester(sid)] == [8, 8]
+
+    assert [(c['semester_num'], c['points2']) for c in vault.get_cohort_gpa(program='BSc')] == [(2, 30)]
+    assert [(c['semester_num'], c['points2']) for c in vault.get_cohort_gpa(program='BSc', scale='4.0')] == [(1, 48)]
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from app import vault_manager as vault
+
+
+@pytest.fixture
+def write_queue(tmp_vault):
+    q = vault.start_write_queue(max_batch=32, max_delay=0.02)
+    yield q
+    vault.stop_write_queue()
+
+
+def test_concurrent_saves_share_batches(write_queue):
+    uids = [vault.create_user(f'u{i}') for i in range(20)]
+    ids = {}
+
+    def save(uid):
+        ids[uid] = vault.save_semester(uid, 1, 1, 20, 4.0, 4.0, [('Math', 4, 'A')])
+
+    threads = [threading.Thread(target=save, args=(uid,)) for uid in uids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(ids.values())) == 20
+    for uid, sem_id in ids.items():
+        assert vault.get_semesters_for_user(uid)[0]['id'] == sem_id
+    stats = vault.write_queue_stats()
+    assert stats['ops'] == 20 and stats['batches'] < 20
+
+
+def test_failed_op_does_not_sink_its_batch(write_queue):
+    uid = vault.create_user('ann')
+    bad = vault.save_semester_async(uid, 1, 1, 3, 4.0, 4.0, [('Math', 3, 'Z')])
+    good = vault.save_scenario_async(uid, 'plan', {'target': 4.0})
+    with pytest.raises(ValueError):
+        bad.result(timeout=5)
+    assert good.result(timeout=5) > 0
+    assert vault.get_semesters_for_user(uid) == []
+    assert [s['name'] for s in vault.get_scenarios(uid)] == ['plan']
+
+
+def test_direct_mode_and_nested_writes(write_queue):
+    uid = vault.create_user('ann')
+    with vault.writer():
+        # Inside an open transaction the save runs inline instead of deadlocking on the queue.
+        sem_id = vault.save_semester(uid, 1, 1, 20, 4.0, 4.0)
+    vault.stop_write_queue()
+    assert vault.write_queue_stats() is None
+    assert vault.save_semester_async(uid, 1, 2, 20, 4.0).result() > sem_id
+
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_saves_fall_back_inline_when_the_worker_dies(write_queue, monkeypatch):
+    uid = vault.create_user('ann')
+    # A worker that dies mid-batch still fails the batch's futures on its way out.
+    monkeypatch.setattr(write_queue, '_run_batch', lambda ops: (_ for _ in ()).throw(SystemExit))
+    future = write_queue.submit(vault._save_semester, uid, 1, 1, 20, 4.0)
+    with pytest.raises(RuntimeError):
+        write_queue.wait(future, 5)
+    assert not write_queue.alive()
+    # Later saves don't hang on the dead worker.
+    sem_id = vault.save_semester(uid, 1, 2, 20, 3.0)
+    assert vault.get_semesters_for_user(uid)[-1]['id'] == sem_id
+
+
+def test_wait_is_bounded(write_queue, monkeypatch):
+    monkeypatch.setattr(vault, 'QUEUE_WAIT', 0.2)
+    release = threading.Event()
+    blocked = write_queue.submit(release.wait, 5)
+    uid_future = write_queue.submit(lambda: None)
+    try:
+        with pytest.raises(vault.VaultBusyError):
+            vault._queued_result(uid_future)
+    finally:
+        release.set()
+    assert blocked.result(5) is True
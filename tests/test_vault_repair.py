@@ -0,0 +1,77 @@
+import csv
+import io
+
+from app.vault_repair import repair_vault
+
+
+def _drift(vault):
+    uid = vault.create_user('ann')
+    first = vault.save_semester(uid, 1, 1, 6, 4.5, 4.5, [('Math', 3, 'A'), ('Bio', 3, 'B')])
+    second = vault.save_semester(uid, 1, 2, 20, 3.5, 3.9)
+    bad = vault.save_semester(uid, 2, 1, 3, 4.0, 4.0, [('Chem', 3, 'A')])
+    with vault.writer() as conn:
+        # Hand edits: a GPA that disagrees with its courses and an unknown grade letter.
+        conn.execute("UPDATE semesters SET gpa = 3.0 WHERE id = ?", (first,))
+        conn.execute("UPDATE courses SET grade_letter = 'Q' WHERE semester_id = ?", (bad,))
+    return uid, first, second, bad
+
+
+def test_dry_run_reports_without_writing(tmp_vault):
+    uid, first, second, bad = _drift(tmp_vault)
+    before = tmp_vault.get_semesters_for_user(uid)
+    report = io.StringIO()
+    counts = repair_vault(dry_run=True, chunk_users=1, report=report)
+    assert (counts['gpa'], counts['invalid_grade'], counts['fixed']) == (1, 1, 0)
+    rows = list(csv.DictReader(io.StringIO(report.getvalue())))
+    assert {(int(r['semester_id']), r['field']) for r in rows} >= {(first, 'gpa'), (bad, 'invalid_grade'),
+                                                                   (second, 'cgpa')}
+    assert tmp_vault.get_semesters_for_user(uid) == before
+
+
+def test_repair_fixes_gpa_and_running_cgpa(tmp_vault):
+    uid, first, second, bad = _drift(tmp_vault)
+    other = tmp_vault.create_user('bob')
+    tmp_vault.save_semester(other, 1, 1, 20, 4.0, 4.0)
+    counts = repair_vault(chunk_users=1)
+    assert counts['users'] == 2 and counts['chunks'] == 2 and counts['fixed'] >= 2
+    sems = {s['id']: s for s in tmp_vault.get_semesters_for_user(uid)}
+    assert sems[first]['gpa'] == 4.5 and sems[bad]['gpa'] == 4.0
+    assert all(t['stored_cgpa'] == t['cgpa'] for t in tmp_vault.get_cgpa_trajectory(uid))
+    assert tmp_vault.calculate_current_cgpa(uid) == tmp_vault.get_cgpa_trajectory(uid)[-1]['cgpa']
+    assert repair_vault()['fixed'] == 0
+
+
+def test_repair_fixes_total_cu_and_grade_points(tmp_vault):
+    uid = tmp_vault.create_user('ann')
+    first = tmp_vault.save_semester(uid, 1, 1, 6, 4.5, 4.5, [('Math', 3, 'A'), ('Bio', 3, 'B')])
+    tmp_vault.save_semester(uid, 1, 2, 4, 5.0, 4.7, [('Chem', 4, 'A')])
+    with tmp_vault.writer() as conn:
+        conn.execute("UPDATE semesters SET total_cu = 9 WHERE id = ?", (first,))
+        conn.execute("UPDATE courses SET grade_points2 = 2 WHERE semester_id = ? AND grade_letter = 'B'", (first,))
+        bio = conn.execute("SELECT id FROM courses WHERE grade_letter = 'B'").fetchone()[0]
+    report = io.StringIO()
+    counts = repair_vault(report=report)
+    assert (counts['total_cu'], counts['grade_points2'], counts['fixed_courses']) == (1, 1, 1)
+    rows = {(r['field'], r['course_id']) for r in csv.DictReader(io.StringIO(report.getvalue()))}
+    assert ('total_cu', '') in rows and ('grade_points2', str(bio)) in rows
+    assert tmp_vault.get_semesters_for_user(uid)[0]['total_cu'] == 6
+    assert tmp_vault.get_courses_for_semester(first)[1]['grade_points2'] == 8
+    assert tmp_vault.calculate_current_cgpa(uid) == tmp_vault.get_cgpa_trajectory(uid)[-1]['cgpa']
+    assert all(t['stored_cgpa'] == t['cgpa'] for t in tmp_vault.get_cgpa_trajectory(uid))
+    counts = repair_vault()
+    assert counts['fixed'] + counts['fixed_courses'] == 0
+
+
+def test_semesters_are_checked_on_their_own_scale(tmp_vault):
+    uid = tmp_vault.create_user('ann')
+    sid = tmp_vault.save_semester(uid, 1, 1, 6, 3.5, 3.5, [('Math', 3, 'A'), ('Bio', 3, 'B')], scale='4.0')
+    tmp_vault.save_semester(uid, 1, 2, 3, 5.0, None, [('Chem', 3, 'A')])
+    counts = repair_vault(dry_run=True)
+    assert (counts['gpa'], counts['cgpa'], counts['grade_points2']) == (0, 0, 0)
+
+    # Only 5.0-scale semesters are recomputed from courses when asked for that scale.
+    with tmp_vault.writer() as conn:
+        conn.execute("UPDATE semesters SET gpa = 2.0 WHERE id = ?", (sid,))
+    assert repair_vault(dry_run=True, scale='5.0')['gpa'] == 0
+    assert repair_vault()['gpa'] == 1
+    assert tmp_vault.get_semesters_for_user(uid)[0]['gpa'] == 3.5
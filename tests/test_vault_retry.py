@@ -0,0 +1,132 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app import vault_manager as vault
+from app.vault_import import import_transcripts
+from app.vault_repair import repair_vault
+from app.vault_retry import RetryPolicy, VaultBusyError, is_busy
+
+
+def _locked():
+    return sqlite3.OperationalError("database is locked")
+
+
+def test_policy_retries_busy_errors_then_succeeds():
+    policy = RetryPolicy(deadline=2.0, base_delay=0.001, max_delay=0.01)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise _locked()
+        return 'ok'
+
+    assert policy.call(flaky) == 'ok'
+    stats = policy.stats()
+    assert stats['retries'] == 2 and stats['retried_operations'] == 1 and stats['gave_up'] == 0
+
+
+def test_policy_gives_up_at_deadline_and_skips_other_errors():
+    policy = RetryPolicy(deadline=0.05, base_delay=0.001, max_delay=0.01)
+
+    def always_locked():
+        raise _locked()
+
+    start = time.monotonic()
+    with pytest.raises(VaultBusyError):
+        policy.call(always_locked)
+    assert time.monotonic() - start < 0.5
+    assert policy.stats()['gave_up'] == 1
+
+    def broken():
+        raise sqlite3.OperationalError("no such table: nope")
+
+    with pytest.raises(sqlite3.OperationalError) as info:
+        policy.call(broken)
+    assert not is_busy(info.value)
+    assert policy.stats()['retries'] > 0 and policy.stats()['operations'] == 2
+
+
+def test_write_is_bounded_while_another_process_holds_the_lock(file_vault):
+    blocker = sqlite3.connect(vault.DB_PATH, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        start = time.monotonic()
+        with vault.operation_deadline(0.4):
+            with pytest.raises(VaultBusyError):
+                vault.create_user('ann')
+        assert time.monotonic() - start < 0.4 + vault.BUSY_TIMEOUT + 0.5
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+    assert vault.retry_stats()['gave_up'] >= 1
+
+
+def test_write_succeeds_once_the_lock_is_released(file_vault):
+    before = vault.retry_stats()['retries']
+    blocker = sqlite3.connect(vault.DB_PATH, isolation_level=None, check_same_thread=False)
+    blocker.execute("BEGIN IMMEDIATE")
+    release = threading.Timer(0.6, lambda: blocker.execute("ROLLBACK"))
+    release.start()
+    try:
+        uid = vault.create_user('ann')
+    finally:
+        release.join()
+        blocker.close()
+    assert vault.get_user(uid)['username'] == 'ann'
+    stats = vault.retry_stats()
+    assert stats['retries'] > before and stats['max_lock_wait_seconds'] > 0
+
+
+def test_in_process_writer_wait_is_bounded(tmp_vault):
+    held = threading.Event()
+    done = threading.Event()
+
+    def hold():
+        with vault.writer():
+            held.set()
+            done.wait(5)
+
+    t = threading.Thread(target=hold)
+    t.start()
+    held.wait(5)
+    try:
+        with vault.operation_deadline(0.3):
+            with pytest.raises(VaultBusyError):
+                vault.create_user('ann')
+    finally:
+        done.set()
+        t.join()
+    assert vault.pool_stats()['writer_lock_timeouts'] >= 1
+
+
+def _hold_lock_for(seconds):
+    blocker = sqlite3.connect(vault.DB_PATH, isolation_level=None, check_same_thread=False)
+    blocker.execute("BEGIN IMMEDIATE")
+    release = threading.Timer(seconds, lambda: blocker.execute("ROLLBACK"))
+    release.start()
+    return release, blocker
+
+
+def test_import_and_repair_wait_out_another_writer(file_vault, tmp_path):
+    path = tmp_path / 'in.csv'
+    path.write_text('user,academic_year,semester_num,course,credit_units,grade\nann,1,1,Math,3,A\n')
+    release, blocker = _hold_lock_for(0.6)
+    try:
+        assert import_transcripts(str(path))['semesters'] == 1
+    finally:
+        release.join()
+        blocker.close()
+
+    uid = vault.login_user('ann', 'guest')['id']
+    with vault.writer() as conn:
+        conn.execute("UPDATE semesters SET gpa = 1.0 WHERE user_id = ?", (uid,))
+    release, blocker = _hold_lock_for(0.6)
+    try:
+        assert repair_vault()['fixed'] == 1
+    finally:
+        release.join()
+        blocker.close()
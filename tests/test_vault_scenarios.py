@@ -0,0 +1,101 @@
+import sqlite3
+
+import pytest
+
+from app import vault_manager as vault
+from app.grading import GradingScale, SCALES, register_scale
+from app.simulator import generate_grade_combinations
+
+
+def test_params_hash_is_canonical():
+    a = vault.scenario_params_hash({'cus': [3, 4], 'target_gpa': 4.0})
+    assert a == vault.scenario_params_hash({'target_gpa': 4.0, 'cus': [3, 4]})
+    assert a != vault.scenario_params_hash({'cus': [4, 3], 'target_gpa': 4.0})
+
+
+def test_identical_simulation_reuses_stored_result(tmp_vault):
+    params = {'simulation': 'grades', 'cus': [3, 3, 2], 'target_gpa': 3.5}
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return generate_grade_combinations(3, [3, 3, 2], 3.5)
+
+    first = vault.cached_scenario_result(params, compute)
+    again = vault.cached_scenario_result(dict(reversed(list(params.items()))), compute)
+    assert len(calls) == 1 and first == again
+    assert first == [[list(grades), gpa] for grades, gpa in generate_grade_combinations(3, [3, 3, 2], 3.5)]
+    # Keyed by scale too: the same params on another scale compute afresh.
+    vault.cached_scenario_result(params, compute, scale='4.0')
+    assert len(calls) == 2
+
+
+def test_reopened_scenario_carries_its_result(tmp_vault):
+    uid = vault.create_user('ann')
+    params = {'simulation': 'grades', 'cus': [3], 'target_gpa': 4.0}
+    sid = vault.save_scenario(uid, 'plan', params, result=[['B+', 4.0]])
+    scenario = vault.get_scenario(sid)
+    assert scenario['params'] == params and scenario['result'] == [['B+', 4.0]]
+    assert scenario['params_hash'] == vault.scenario_params_hash(params)
+    assert vault.get_scenario_result(params) == [['B+', 4.0]]
+    assert vault.get_scenario(sid, scale='4.0')['result'] is None
+    assert vault.get_scenario(sid + 1) is None
+    raw = vault.get_scenarios(uid, decode_params=False)[0]['params']
+    assert isinstance(raw, str)
+
+
+def test_save_scenario_returns_the_scenario_id_when_results_exist(tmp_vault):
+    uid = vault.create_user('ann')
+    for i in range(5):
+        vault.cached_scenario_result({'simulation': 'grades', 'cus': [i + 1]}, lambda: [i])
+    sid = vault.save_scenario(uid, 'a', {'simulation': 'grades', 'cus': [9]}, result=[1, 2])
+    assert sid == vault.get_scenarios(uid)[0]['id'] == 1
+    assert vault.get_scenario(sid)['result'] == [1, 2]
+
+
+def test_changed_scale_invalidates_results(tmp_vault, monkeypatch):
+    monkeypatch.setitem(SCALES, 'lab', GradingScale('lab', {'A': 4.0, 'B': 3.0}, {'Pass': (3.0, 4.0)}))
+    params = {'simulation': 'grades', 'cus': [3], 'target_gpa': 3.0}
+    vault.save_scenario_result(params, [['B', 3.0]], scale='lab')
+    vault.save_scenario_result(params, [['C', 3.0]], scale='5.0')
+    assert vault.get_scenario_result(params, scale='lab') == [['B', 3.0]]
+
+    # Same name, different points: a new fingerprint, so the old result is never served.
+    changed = register_scale(GradingScale('lab', {'A': 5.0, 'B': 3.0}, {'Pass': (3.0, 5.0)}))
+    assert vault.get_scenario_result(params, scale=changed) is None
+    assert vault.purge_scenario_results() == 1
+    vault.init_db()  # purges on startup too; results for current scales survive
+    assert vault.get_scenario_result(params, scale='5.0') == [['C', 3.0]]
+
+
+def test_migration_hashes_existing_scenarios(tmp_vault):
+    uid = vault.create_user('ann')
+    sid = vault.save_scenario(uid, 'plan', {'target': 4.5})
+    with vault.writer() as conn:
+        conn.execute("UPDATE scenarios SET params_hash = NULL")
+        conn.execute("DROP TABLE scenario_results")
+        conn.execute("PRAGMA user_version = 4")
+    vault.init_db()
+    assert vault.get_scenario(sid)['params_hash'] == vault.scenario_params_hash({'target': 4.5})
+    with pytest.raises(sqlite3.IntegrityError):
+        with vault.writer() as conn:
+            conn.execute("INSERT INTO scenario_results (params_hash, scale_fingerprint, result) VALUES ('h', 'f', '1')")
+            conn.execute("INSERT INTO scenario_results (params_hash, scale_fingerprint, result) VALUES ('h', 'f', '2')")
+
+
+def test_results_are_keyed_by_simulator_version_and_capped(tmp_vault, monkeypatch):
+    params = {'simulation': 'grades', 'cus': [3], 'target_gpa': 4.0}
+    vault.save_scenario_result(params, [['B+', 4.0]])
+    monkeypatch.setattr(vault, 'SIMULATOR_VERSION', vault.SIMULATOR_VERSION + 1)
+    assert vault.get_scenario_result(params) is None
+    assert vault.purge_scenario_results() == 1
+
+    monkeypatch.setattr(vault, 'SCENARIO_RESULTS_MAX_ROWS', 3)
+    for i in range(5):
+        vault.save_scenario_result({'n': i}, i)
+    assert [vault.get_scenario_result({'n': i}) for i in range(5)] == [None, None, 2, 3, 4]
+
+    with vault.writer() as conn:
+        conn.execute("UPDATE scenario_results SET created_at = datetime('now', '-100 days') WHERE result = '2'")
+    assert vault.purge_scenario_results() == 1
+    assert vault.get_scenario_result({'n': 2}) is None
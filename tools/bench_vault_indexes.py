@@ -0,0 +1,93 @@
+"""Time the hot vault queries on a large vault without and with the schema indexes.
+
+Usage: python tools/bench_vault_indexes.py [--users 10000] [--semesters 10] [--courses 6]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import vault_manager as vault
+
+
+def seed(n_users, n_semesters, n_courses):
+    rng = random.Random(42)
+    letters = list(vault.get_scale().letters)
+    with vault.writer() as conn:
+        conn.executemany("INSERT INTO users (id, username, password) VALUES (?, ?, 'x')",
+                         ((u, f'user{u}') for u in range(1, n_users + 1)))
+        sem_rows, course_rows = [], []
+        sem_id = 0
+        # Interleave users the way real saves arrive, so a user's rows are scattered.
+        for i in range(n_semesters):
+            for u in range(1, n_users + 1):
+                sem_id += 1
+                sem_rows.append((sem_id, u, i // 2 + 1, i % 2 + 1, 18, round(rng.uniform(2, 5), 2), 3.5))
+                for c in range(n_courses):
+                    course_rows.append((sem_id, f'Course {c + 1}', 3, rng.choice(letters)))
+        conn.executemany("INSERT INTO semesters (id, user_id, academic_year, semester_num, total_cu, gpa, cgpa) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", sem_rows)
+        conn.executemany("INSERT INTO courses (semester_id, name, credit_units, grade_letter) VALUES (?, ?, ?, ?)",
+                         course_rows)
+    return sem_id
+
+
+def time_queries(n_users, rounds):
+    rng = random.Random(7)
+    users = [rng.randint(1, n_users) for _ in range(rounds)]
+    queries = {
+        'get_semesters_for_user': vault.get_semesters_for_user,
+        'get_latest_semester': vault.get_latest_semester,
+        'get_semesters_summary': vault.get_semesters_summary,
+        'calculate_current_cgpa': vault.calculate_current_cgpa,
+    }
+    results = {}
+    for name, fn in queries.items():
+        start = time.perf_counter()
+        for u in users:
+            fn(u)
+        results[name] = (time.perf_counter() - start) / rounds * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--semesters', type=int, default=10)
+    parser.add_argument('--courses', type=int, default=6)
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        vault.DB_PATH = os.path.join(tmp, 'vault.db')
+        # Time the queries themselves, not the per-user cache.
+        vault.USER_CACHE_SIZE = 0
+        vault.init_db()
+        total = seed(args.users, args.semesters, args.courses)
+        vault.rebuild_user_aggregates()
+        print(f'{total} semesters, {total * args.courses} courses, {args.users} users')
+
+        # Time without the migration-created indexes, then with them restored.
+        with vault.writer() as conn:
+            indexes = conn.execute("SELECT name, sql FROM sqlite_master WHERE type='index' AND sql IS NOT NULL "
+                                   "AND tbl_name IN ('semesters', 'courses', 'scenarios')").fetchall()
+            for name, _ in indexes:
+                conn.execute(f'DROP INDEX {name}')
+        before = time_queries(args.users, args.rounds)
+        with vault.writer() as conn:
+            for _, sql in indexes:
+                conn.execute(sql)
+            conn.execute('ANALYZE')
+        print(f'indexes: {", ".join(name for name, _ in indexes)}')
+        after = time_queries(args.users, args.rounds)
+        print(f'\n{"query":<26} {"before ms":>10} {"after ms":>10} {"speedup":>8}')
+        for name in before:
+            print(f'{name:<26} {before[name]:>10.3f} {after[name]:>10.3f} {before[name] / after[name]:>7.0f}x')
+        vault.close_pool()
+
+
+if __name__ == '__main__':
+    main()
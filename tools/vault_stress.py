@@ -0,0 +1,262 @@
+"""Stress the vault with concurrent reader and writer processes.
+
+Each process imports `vault_manager` on its own (like the Flask UI, the
+FastAPI server and CLI sessions do) and runs realistic operations against a
+temporary vault for a fixed duration. The parent samples the WAL size and
+writes a JSON report with per-operation latency histograms, throughput and
+busy/locked error counts. Workers that crash or die without reporting are
+listed under 'failed_workers' instead of hanging the run.
+
+Usage: python tools/vault_stress.py [--readers 4] [--writers 2] [--duration 10] [--out report.json]
+"""
+import argparse
+import json
+import math
+import multiprocessing as mp
+import os
+import platform
+import queue
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import traceback
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import vault_manager as vault
+
+# Latency histogram: bucket i holds samples in [2**(i/4), 2**((i+1)/4)) microseconds.
+BUCKETS_PER_OCTAVE = 4
+
+
+def _bucket(seconds: float) -> int:
+    return max(0, int(math.log2(max(seconds * 1e6, 1.0)) * BUCKETS_PER_OCTAVE))
+
+
+def _bucket_upper_ms(index: int) -> float:
+    return 2 ** ((index + 1) / BUCKETS_PER_OCTAVE) / 1000
+
+
+def _percentile(hist: dict, q: float) -> float:
+    total = sum(hist.values())
+    if not total:
+        return 0.0
+    seen = 0
+    for index in sorted(hist):
+        seen += hist[index]
+        if seen >= q * total:
+            return round(_bucket_upper_ms(index), 3)
+    return round(_bucket_upper_ms(max(hist)), 3)
+
+
+def _classify(error: Exception) -> str:
+    message = str(error).lower()
+    if 'locked' in message:
+        return 'locked'
+    if 'busy' in message:
+        return 'busy'
+    return type(error).__name__
+
+
+def seed(n_users: int, n_semesters: int):
+    letters = list(vault.get_scale().letters)
+    rng = random.Random(1)
+    for u in range(n_users):
+        uid = vault.create_user(f'stress{u}')
+        vault.save_semesters_bulk(({
+            'academic_year': i // 2 + 1, 'semester_num': i % 2 + 1, 'total_cu': 12, 'gpa': 0.0, 'cgpa': 0.0,
+            'courses': [(f'Course {c}', 3, rng.choice(letters)) for c in range(4)],
+        } for i in range(n_semesters)), user_id=uid)
+    return n_users
+
+
+def _reader_ops(rng, n_users):
+    uid = rng.randint(1, n_users)
+    return rng.choice((
+        ('get_semesters_for_user', lambda: vault.get_semesters_for_user(uid)),
+        ('get_cgpa_trajectory', lambda: vault.get_cgpa_trajectory(uid)),
+        ('get_semesters_summary', lambda: vault.get_semesters_summary(uid)),
+        ('calculate_current_cgpa', lambda: vault.calculate_current_cgpa(uid)),
+        ('get_last_complete_semester_data', lambda: vault.get_last_complete_semester_data(uid)),
+    ))
+
+
+def _writer_ops(rng, n_users, letters):
+    uid = rng.randint(1, n_users)
+    pick = rng.random()
+    if pick < 0.6:
+        courses = [(f'Course {c}', 3, rng.choice(letters)) for c in range(rng.randint(3, 7))]
+        return 'save_semester', lambda: vault.save_semester(
+            uid, rng.randint(1, 5), rng.randint(1, 2), sum(c[1] for c in courses), 4.0, None, courses)
+    if pick < 0.8:
+        return 'save_scenario', lambda: vault.save_scenario(uid, 'stress', {'target': round(rng.uniform(2, 5), 2)})
+    return 'update_semester', lambda: vault.update_semester(
+        rng.randint(1, n_users * 4), gpa=round(rng.uniform(2, 5), 2))
+
+
+def worker(role: str, index: int, db_path: str, n_users: int, duration: float, cache: bool, results):
+    hists, counts, errors = {}, {}, {}
+    out = {'role': role, 'index': index, 'hists': hists, 'counts': counts, 'errors': errors,
+           'retry': None, 'crash': None}
+    try:
+        vault.DB_PATH = db_path
+        if not cache:
+            vault.USER_CACHE_SIZE = 0
+        rng = random.Random(f'{role}{index}')
+        letters = list(vault.get_scale().letters)
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            name, op = _reader_ops(rng, n_users) if role == 'reader' else _writer_ops(rng, n_users, letters)
+            start = time.perf_counter()
+            try:
+                op()
+            except Exception as e:
+                kind = _classify(e)
+                errors.setdefault(name, {}).setdefault(kind, 0)
+                errors[name][kind] += 1
+                continue
+            hist = hists.setdefault(name, {})
+            b = _bucket(time.perf_counter() - start)
+            hist[b] = hist.get(b, 0) + 1
+            counts[name] = counts.get(name, 0) + 1
+        out['retry'] = vault.retry_stats()
+        vault.close_pool()
+    except BaseException:
+        out['crash'] = traceback.format_exc()
+    finally:
+        # Always report, so the parent never waits on a worker that is gone.
+        results.put(out)
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def run(readers: int, writers: int, duration: float, users: int, semesters: int,
+        cache: bool = False, sample_every: float = 0.5) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'vault.db')
+        vault.DB_PATH = db_path
+        vault.init_db()
+        seed(users, semesters)
+        vault.close_pool()
+
+        ctx = mp.get_context('spawn')
+        results = ctx.Queue()
+        roles = [(role, i) for role, n in (('reader', readers), ('writer', writers)) for i in range(n)]
+        procs = [ctx.Process(target=worker, args=(role, i, db_path, users, duration, cache, results))
+                 for role, i in roles]
+        for p in procs:
+            p.start()
+        started = time.monotonic()
+        wal = []
+        outputs = []
+        while len(outputs) < len(procs):
+            wal.append({'t': round(time.monotonic() - started, 2),
+                        'wal_bytes': _file_size(db_path + '-wal'), 'db_bytes': _file_size(db_path)})
+            deadline = time.monotonic() + sample_every
+            while len(outputs) < len(procs) and time.monotonic() < deadline:
+                try:
+                    outputs.append(results.get(timeout=max(0.01, deadline - time.monotonic())))
+                except queue.Empty:
+                    pass
+            if all(p.exitcode is not None for p in procs):
+                # Everyone has exited: drain what they managed to send, then stop waiting.
+                try:
+                    while len(outputs) < len(procs):
+                        outputs.append(results.get(timeout=1.0))
+                except queue.Empty:
+                    pass
+                break
+        elapsed = time.monotonic() - started
+        for p in procs:
+            p.join()
+        by_worker = {(o['role'], o['index']): o for o in outputs}
+        failed = []
+        for key, p in zip(roles, procs):
+            out = by_worker.get(key)
+            if out is None or out['crash']:
+                failed.append({'role': key[0], 'index': key[1], 'exitcode': p.exitcode,
+                               'error': out['crash'] if out else 'exited without reporting'})
+
+    ops = {}
+    for out in outputs:
+        for name, hist in out['hists'].items():
+            op = ops.setdefault(name, {'role': out['role'], 'count': 0, 'hist': {}, 'errors': {}})
+            op['count'] += out['counts'][name]
+            for b, n in hist.items():
+                op['hist'][b] = op['hist'].get(b, 0) + n
+        for name, errs in out['errors'].items():
+            op = ops.setdefault(name, {'role': out['role'], 'count': 0, 'hist': {}, 'errors': {}})
+            for kind, n in errs.items():
+                op['errors'][kind] = op['errors'].get(kind, 0) + n
+    report_ops = {}
+    for name, op in sorted(ops.items()):
+        hist = op['hist']
+        report_ops[name] = {
+            'role': op['role'], 'count': op['count'], 'per_sec': round(op['count'] / elapsed, 1),
+            'p50_ms': _percentile(hist, 0.5), 'p90_ms': _percentile(hist, 0.9),
+            'p99_ms': _percentile(hist, 0.99), 'max_ms': round(_bucket_upper_ms(max(hist)), 3) if hist else 0.0,
+            'errors': op['errors'],
+            'histogram_ms': {str(round(_bucket_upper_ms(b), 3)): n for b, n in sorted(hist.items())},
+        }
+    retry = {'retries': 0, 'retried_operations': 0, 'gave_up': 0, 'lock_wait_seconds': 0.0,
+             'max_lock_wait_seconds': 0.0}
+    for out in outputs:
+        if out['retry'] is None:
+            continue
+        for key in retry:
+            if key.startswith('max_'):
+                retry[key] = max(retry[key], out['retry'][key])
+            else:
+                retry[key] = round(retry[key] + out['retry'][key], 4)
+    errors = {}
+    for op in ops.values():
+        for kind, n in op['errors'].items():
+            errors[kind] = errors.get(kind, 0) + n
+    return {
+        'config': {'readers': readers, 'writers': writers, 'duration_s': duration, 'users': users,
+                   'semesters_per_user': semesters, 'user_cache': cache},
+        'environment': {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                        'platform': platform.platform(), 'schema_version': vault.SCHEMA_VERSION,
+                        'busy_timeout_s': vault.BUSY_TIMEOUT, 'retry_deadline_s': vault.RETRY_DEADLINE},
+        'elapsed_s': round(elapsed, 2),
+        'throughput_per_sec': {role: round(sum(o['count'] for o in ops.values() if o['role'] == role) / elapsed, 1)
+                               for role in ('reader', 'writer')},
+        'errors': errors,
+        'retry': retry,
+        'failed_workers': failed,
+        'operations': report_ops,
+        'wal': {'max_bytes': max((s['wal_bytes'] for s in wal), default=0), 'samples': wal},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds each process runs')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--semesters', type=int, default=6, help='Seeded semesters per user')
+    parser.add_argument('--cache', action='store_true', help='Leave the per-user read cache on')
+    parser.add_argument('--out', default=None, help='Write the JSON report here (default: stdout)')
+    args = parser.parse_args()
+
+    report = run(args.readers, args.writers, args.duration, args.users, args.semesters, args.cache)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"readers {report['throughput_per_sec']['reader']}/s, writers {report['throughput_per_sec']['writer']}/s, "
+              f"errors {report['errors'] or 'none'}, max WAL {report['wal']['max_bytes']} bytes, "
+              f"failed workers {len(report['failed_workers'])} -> {args.out}")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
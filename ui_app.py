@@ -1,15 +1,28 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, Response, stream_with_context, g
 import os
 import threading
 import time
-from app import vault_manager
+from app import vault_manager, vault_export, vault_maintenance, vault_backup
 from app.gpa_calculator import compute_gpa
+from app.cgpa_calculator import required_gpa_grid
 from app.simulator import generate_grade_combinations
-from app.constants import GRADE_POINTS
+from app.grading import get_scale
 
 app = Flask(__name__)
 app.secret_key = 'dev-secret-key-change-me'
 
+@app.before_request
+def _open_vault_scope():
+    # Cached vault reads check the database version once per request.
+    g.vault_scope = vault_manager.request_scope()
+    g.vault_scope.__enter__()
+
+@app.teardown_request
+def _close_vault_scope(exc):
+    scope = g.pop('vault_scope', None)
+    if scope is not None:
+        scope.__exit__(None, None, None)
+
 @app.route('/')
 def index():
     user = None
@@ -22,11 +35,8 @@ def login():
     if request.method == 'POST':
         username = request.form.get('username')
         # Very small stub: look up user by username in vault db
-        conn = vault_manager.get_connection()
-        cur = conn.cursor()
-        cur.execute('SELECT id, username, full_name FROM users WHERE username = ?', (username,))
-        row = cur.fetchone()
-        conn.close()
+        with vault_manager.reader() as conn:
+            row = conn.execute('SELECT id, username, full_name FROM users WHERE username = ?', (username,)).fetchone()
         if row:
             session['user_id'] = row['id']
             session['username'] = row['username']
@@ -86,34 +96,22 @@ def option3_load():
     if not session.get('user_id'):
         return jsonify({'error': 'guest', 'message': 'Please log in to load saved semesters.'}), 401
     user_id = session.get('user_id')
-    semesters = vault_manager.get_semesters_for_user(user_id)
-    if not semesters:
+    trajectory = vault_manager.get_cgpa_trajectory(user_id)
+    if not trajectory:
         return jsonify({'error': 'no_data', 'message': 'No saved semesters found.'}), 404
-    wt = 0.0
-    cu = 0
-    for s in semesters:
-        # rows may be sqlite3.Row or dict
-        g = s['gpa'] if isinstance(s, dict) or 'gpa' in s else s['gpa']
-        c = s['total_cu'] if isinstance(s, dict) or 'total_cu' in s else s['total_cu']
-        try:
-            wt += float(g) * int(c)
-            cu += int(c)
-        except Exception:
-            continue
-    cgpa = round(wt / cu, 2) if cu > 0 else 0.0
-    # Normalize semesters into plain dicts for JSON
-    sem_list = []
-    for s in semesters:
-        try:
-            sem_list.append({
-                'academic_year': s.get('academic_year') if hasattr(s, 'get') else s['academic_year'],
-                'semester_num': s.get('semester_num') if hasattr(s, 'get') else s['semester_num'],
-                'gpa': float(s.get('gpa')) if hasattr(s, 'get') else float(s['gpa']),
-                'total_cu': int(s.get('total_cu')) if hasattr(s, 'get') else int(s['total_cu'])
-            })
-        except Exception:
-            continue
-    return jsonify({'cgpa': cgpa, 'total_cu': cu, 'count': len(semesters), 'semesters': sem_list})
+    # Running CGPA and CU come from the query; the last row is the current total.
+    sem_list = [{'academic_year': s['academic_year'], 'semester_num': s['semester_num'],
+                 'gpa': s['gpa'], 'total_cu': s['total_cu'], 'cgpa': s['cgpa']} for s in trajectory]
+    last = trajectory[-1]
+    return jsonify({'cgpa': last['cgpa'], 'total_cu': last['cumulative_cu'], 'count': len(trajectory), 'semesters': sem_list})
+
+
+@app.route('/api/trajectory', methods=['GET'])
+def api_trajectory():
+    """Running CGPA per saved semester for the logged-in user."""
+    if not session.get('user_id'):
+        return jsonify({'error': 'guest', 'message': 'Please log in to see your CGPA trajectory.'}), 401
+    return jsonify({'trajectory': vault_manager.get_cgpa_trajectory(session.get('user_id'))})
 
 
 @app.route('/onboarding', methods=['GET','POST'])
@@ -158,11 +156,29 @@ def history():
         return redirect('/login')
     user_id = session.get('user_id')
     semesters = vault_manager.get_semesters_for_user(user_id)
-    summary = vault_manager.get_semesters_summary(user_id)
-    total_cu = vault_manager.get_total_cu_completed(user_id)
+    # Each row's CGPA is the running value from the trajectory query.
+    summary = vault_manager.get_cgpa_trajectory(user_id)
+    total_cu = summary[-1]['cumulative_cu'] if summary else 0
     user = {'id': user_id, 'username': session.get('username')}
     return render_template('history.html', semesters=semesters, summary=summary, total_cu=total_cu, user=user)
 
+@app.route('/history/export')
+def history_export():
+    """Download the logged-in user's vault data, streamed page by page."""
+    if not session.get('user_id'):
+        return redirect('/login')
+    user_id = session.get('user_id')
+    fmt = request.args.get('format', 'ndjson')
+    table = request.args.get('table', 'semesters')
+    if fmt == 'csv':
+        if table not in vault_export.EXPORT_TABLES:
+            return jsonify({'error': 'unknown table'}), 400
+        body, mimetype, ext = vault_export.iter_csv(table, user_id), 'text/csv', 'csv'
+    else:
+        body, mimetype, ext = vault_export.iter_ndjson(user_id=user_id), 'application/x-ndjson', 'ndjson'
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=vault-export.{ext}'})
+
 @app.route('/init-vault')
 def init_vault():
     return render_template('init-vault.html')
@@ -211,6 +227,10 @@ def api_option1():
         num = int(request.form.get('num_courses', 0))
     except Exception:
         return jsonify({'error': 'Invalid number of courses'}), 400
+    try:
+        scale = get_scale(request.form.get('scale') or None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     courses = []
     for i in range(1, num + 1):
         grade = request.form.get(f'grade_{i}')
@@ -224,11 +244,11 @@ def api_option1():
         if cu_i < 1 or cu_i > 5:
             return jsonify({'error': f'Credit units for course {i} must be between 1 and 5'}), 400
         grade_norm = grade.strip().upper()
-        if grade_norm not in GRADE_POINTS:
+        if grade_norm not in scale.codes:
             return jsonify({'error': f'Unknown grade for course {i}: {grade}'}), 400
         courses.append((cu_i, grade_norm))
     try:
-        result = compute_gpa(courses)
+        result = compute_gpa(courses, scale)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
     return jsonify({'result': result, 'courses': len(courses)})
@@ -365,6 +385,30 @@ def option4():
         user = {'id': session.get('user_id'), 'username': session.get('username')}
     return render_template('option4.html', user=user)
 
+@app.route('/api/required-grid', methods=['POST'])
+def api_required_grid():
+    """Required GPA for every degree class, CU load and 1..N remaining semesters.
+
+    Expects form fields: old_cgpa, old_cu, new_cus (comma-separated) and
+    optional max_semesters (1-10, default 4).
+    """
+    try:
+        old_cgpa = float(request.form.get('old_cgpa', ''))
+        old_cu = int(request.form.get('old_cu', ''))
+        new_cus = [int(x) for x in request.form.get('new_cus', '').split(',') if x.strip()]
+        max_semesters = int(request.form.get('max_semesters', 4))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Provide old_cgpa, old_cu and new_cus'}), 400
+    if old_cgpa < 0 or old_cgpa > 5.0 or old_cu < 0:
+        return jsonify({'error': 'old_cgpa must be 0.0 - 5.0 and old_cu non-negative'}), 400
+    if not new_cus or any(c < 1 or c > 200 for c in new_cus) or not 1 <= max_semesters <= 10:
+        return jsonify({'error': 'new_cus must be 1-200 and max_semesters 1-10'}), 400
+    try:
+        cells = required_gpa_grid(old_cgpa, old_cu, new_cus, max_semesters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'cells': cells})
+
 @app.route('/api/simulate-grades', methods=['POST'])
 def simulate_grades():
     """Generate grade combinations for a target GPA."""
@@ -373,6 +417,10 @@ def simulate_grades():
         num_courses = data.get('num_courses')
         cus = data.get('cus')
         target_gpa = data.get('target_gpa')
+        try:
+            scale = get_scale(data.get('scale'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Validate inputs
         if not isinstance(num_courses, int) or num_courses < 1 or num_courses > 10:
@@ -386,18 +434,20 @@ def simulate_grades():
             if not isinstance(cu, int) or cu < 1 or cu > 5:
                 return jsonify({'error': 'Each CU must be between 1 and 5'}), 400
         
-        if not isinstance(target_gpa, (int, float)) or target_gpa < 0 or target_gpa > 5:
-            return jsonify({'error': 'target_gpa must be between 0 and 5'}), 400
+        if not isinstance(target_gpa, (int, float)) or target_gpa < 0 or target_gpa > scale.max_points:
+            return jsonify({'error': f'target_gpa must be between 0 and {scale.max_points:g}'}), 400
         
         # Calculate achievable range
-        min_gp = min(GRADE_POINTS.values())
-        max_gp = max(GRADE_POINTS.values())
+        min_gp = scale.min_points
+        max_gp = scale.max_points
         total_cu = sum(cus)
         min_possible = sum(c * min_gp for c in cus) / total_cu
         max_possible = sum(c * max_gp for c in cus) / total_cu
         
         # Generate combinations
-        results = generate_grade_combinations(num_courses, cus, target_gpa)
+        params = {'simulation': 'grades', 'cus': cus, 'target_gpa': target_gpa}
+        results = vault_manager.cached_scenario_result(
+            params, lambda: generate_grade_combinations(num_courses, cus, target_gpa, scale=scale), scale=scale)
         
         return jsonify({
             'results': results,
@@ -421,7 +471,19 @@ if __name__ == '__main__':
         except Exception:
             pass
 
+    # Migrate an existing vault before the flush, maintenance or any request touches it.
+    vault_manager.init_db()
+
     threading.Thread(target=_open_browser, daemon=True).start()
 
+    # In-memory vault (VAULT_DB_PATH=:memory:) for lab kiosks: load from and flush back to disk.
+    if vault_manager.get_pool().memory and os.environ.get('VAULT_FLUSH_PATH'):
+        vault_backup.start_flush(os.environ['VAULT_FLUSH_PATH'],
+                                 interval=float(os.environ.get('VAULT_FLUSH_INTERVAL', vault_backup.DEFAULT_FLUSH_INTERVAL)))
+
+    # Daily housekeeping (ANALYZE/optimize, WAL checkpoint, VACUUM when worthwhile).
+    if not vault_manager.get_pool().immutable and not vault_manager.get_pool().memory:
+        vault_maintenance.start_maintenance()
+
     # Run on localhost for offline usage. Disable the reloader for single-file builds.
     app.run(host='127.0.0.1', port=5000, debug=False, use_reloader=False)